@@ -1,5 +1,7 @@
 import os
 
+import pytest
+
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 root_dir_content = os.listdir(BASE_DIR)
 PROJECT_DIR_NAME = 'yatube'
@@ -37,3 +39,25 @@ pytest_plugins = [
     'tests.fixtures.fixture_user',
     'tests.fixtures.fixture_data',
 ]
+
+
+@pytest.fixture(scope='session')
+def django_db_setup(request, django_test_environment, django_db_blocker,
+                    django_db_keepdb, django_db_modify_db_settings):
+    """Тестовая БД из шаблона с миграциями, файлы — в памяти."""
+    from django.test.utils import setup_databases, teardown_databases
+    from core.testing import isolated_settings, use_template_databases
+
+    overrides = isolated_settings()
+    overrides.enable()
+    with django_db_blocker.unblock():
+        use_template_databases()
+        db_cfg = setup_databases(
+            verbosity=request.config.option.verbose,
+            interactive=False,
+            keepdb=django_db_keepdb,
+        )
+    yield
+    with django_db_blocker.unblock():
+        teardown_databases(db_cfg, verbosity=request.config.option.verbose)
+    overrides.disable()
@@ -0,0 +1,36 @@
+from django.contrib import admin
+from django.utils import timezone
+
+from .models import OutboxMessage
+
+
+@admin.register(OutboxMessage)
+class OutboxMessageAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk',
+        'subject',
+        'to',
+        'status',
+        'attempts',
+        'next_attempt',
+        'created',
+    )
+    list_filter = ('status',)
+    search_fields = ('=to',)
+    date_hierarchy = 'created'
+    actions = ('retry',)
+    readonly_fields = (
+        'subject', 'body', 'html_body', 'from_email', 'to', 'cc', 'bcc',
+        'reply_to', 'headers', 'status', 'attempts', 'next_attempt',
+        'sent', 'error',
+    )
+
+    def has_add_permission(self, request):
+        return False
+
+    def retry(self, request, queryset):
+        count = queryset.exclude(status=OutboxMessage.SENT).update(
+            status=OutboxMessage.PENDING, attempts=0,
+            next_attempt=timezone.now())
+        self.message_user(request, f'Поставлено в очередь: {count}')
+    retry.short_description = 'Отправить повторно'
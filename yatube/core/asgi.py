@@ -0,0 +1,201 @@
+"""ASGI-обёртка над WSGI-приложением Django.
+
+Django 2.2 не умеет ни ASGI, ни асинхронных представлений, поэтому
+приложение работает в ограниченном пуле потоков (ASGI_THREADS), а
+медленную сетевую часть берёт на себя цикл событий сервера: тело
+запроса читается до вызова представления, ответ отдаётся клиенту уже
+после освобождения потока. Потоковые ответы (файлы) читаются кусками
+в том же пуле, не блокируя цикл событий. Потоки событий
+(core.sse.EventStreamResponse) ждут новых записей в самом цикле
+событий: ожидающий клиент не занимает ни поток, ни соединение с БД.
+"""
+import asyncio
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from posts import hits
+
+
+async def read_body(receive):
+    """Тело запроса в файле; None, если клиент отключился."""
+    body = tempfile.SpooledTemporaryFile(
+        max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE)
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            body.close()
+            return None
+        body.write(message.get('body', b''))
+        if not message.get('more_body'):
+            break
+    body.seek(0)
+    return body
+
+
+def build_environ(scope, body):
+    """WSGI environ из ASGI scope (PEP 3333: строки в latin-1)."""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode().decode('latin1'),
+        'PATH_INFO': scope['path'].encode().decode('latin1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f'HTTP/{scope.get("http_version", "1.1")}',
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+        # Представления узнают, что ожидание потока событий бесплатно.
+        'core.asgi': True,
+    }
+    for name, value in scope.get('headers', ()):
+        name = name.decode('latin1').upper().replace('-', '_')
+        value = value.decode('latin1')
+        if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            name = f'HTTP_{name}'
+        if name in environ:
+            value = f'{environ[name]},{value}'
+        environ[name] = value
+    return environ
+
+
+class ASGIHandler:
+    def __init__(self, wsgi_application, max_workers=None):
+        self.wsgi_application = wsgi_application
+        self.executor = ThreadPoolExecutor(
+            max_workers or settings.ASGI_THREADS,
+            thread_name_prefix='asgi',
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] != 'http':
+            raise ValueError(f'Протокол {scope["type"]} не поддерживается')
+        body = await read_body(receive)
+        if body is None:
+            return
+        loop = asyncio.get_running_loop()
+        try:
+            status, headers, content, chunks = await loop.run_in_executor(
+                self.executor, self.run_wsgi, build_environ(scope, body))
+        finally:
+            body.close()
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': headers,
+        })
+        if chunks is None:
+            await send({'type': 'http.response.body', 'body': content})
+            return
+        if hasattr(chunks, '__aiter__'):
+            await self.stream_events(chunks, receive, send)
+            return
+        try:
+            while True:
+                chunk = await loop.run_in_executor(
+                    self.executor, next, chunks, None)
+                if chunk is None:
+                    break
+                await send({'type': 'http.response.body', 'body': chunk,
+                            'more_body': True})
+            await send({'type': 'http.response.body'})
+        finally:
+            close = getattr(chunks, 'close', None)
+            if close is not None:
+                await loop.run_in_executor(self.executor, close)
+
+    async def stream_events(self, events, receive, send):
+        """Отдаёт поток событий, пока клиент не отключится."""
+        async def forward():
+            async for chunk in events:
+                await send({'type': 'http.response.body', 'body': chunk,
+                            'more_body': True})
+            await send({'type': 'http.response.body'})
+
+        async def disconnected():
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+
+        tasks = [asyncio.ensure_future(forward()),
+                 asyncio.ensure_future(disconnected())]
+        done, pending = await asyncio.wait(
+            tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        for task in done:
+            task.result()
+
+    def run_wsgi(self, environ):
+        """Вызов Django в потоке пула.
+
+        Обычный ответ собирается и закрывается здесь же: request_finished
+        закрывает соединения с БД того потока, что обрабатывал запрос.
+        """
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started['status'] = int(status.split(' ', 1)[0])
+            started['headers'] = [
+                (name.lower().encode('latin1'), value.encode('latin1'))
+                for name, value in headers
+            ]
+
+        response = self.wsgi_application(environ, start_response)
+        events = getattr(response, 'event_stream', None)
+        if events is not None:
+            # request_finished закрывает соединение с БД уже сейчас:
+            # дальше поток событий читает журнал из памяти.
+            response.close()
+            return started['status'], started['headers'], None, events
+        if getattr(response, 'streaming', False):
+            return (started['status'], started['headers'], None,
+                    ClosingIterator(response))
+        try:
+            content = b''.join(response)
+        finally:
+            response.close()
+        return started['status'], started['headers'], content, None
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                hits.start_flusher()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await asyncio.get_running_loop().run_in_executor(
+                    self.executor, hits.flush_at_exit)
+                self.executor.shutdown(wait=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+class ClosingIterator:
+    """Итератор по потоковому ответу с его close()."""
+
+    def __init__(self, response):
+        self.response = response
+        self.chunks = iter(response)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self.chunks)
+
+    def close(self):
+        self.response.close()
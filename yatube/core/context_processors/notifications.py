@@ -0,0 +1,10 @@
+from django.utils.functional import SimpleLazyObject
+
+from posts.notifications import unread_count
+
+
+def notifications(request):
+    """Число непрочитанных уведомлений; читается, только если выведено."""
+    return {'unread_notifications': SimpleLazyObject(
+        lambda: unread_count(request.user)
+        if request.user.is_authenticated else 0)}
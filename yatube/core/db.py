@@ -0,0 +1,23 @@
+from django.db import connections, router
+
+
+def insert_ignore(model, **values):
+    """INSERT, молча пропускающий конфликт уникальности.
+
+    Один запрос без гонки check-then-act; возвращает True, если строка
+    действительно вставлена.
+    """
+    opts = model._meta
+    connection = connections[router.db_for_write(model)]
+    qn = connection.ops.quote_name
+    columns = [opts.get_field(name).column for name in values]
+    sql = '{} {} ({}) VALUES ({}){}'.format(
+        connection.ops.insert_statement(ignore_conflicts=True),
+        qn(opts.db_table),
+        ', '.join(qn(column) for column in columns),
+        ', '.join(['%s'] * len(columns)),
+        connection.ops.ignore_conflicts_suffix_sql(ignore_conflicts=True),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, list(values.values()))
+        return cursor.rowcount > 0
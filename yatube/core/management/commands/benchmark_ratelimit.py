@@ -0,0 +1,85 @@
+import shutil
+import statistics
+import tempfile
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from django.test.utils import override_settings
+from django.urls import resolve, reverse
+from django.utils.module_loading import import_string
+
+from core.ratelimit import RateLimitMiddleware, view_name
+
+# Бюджет на проверку лимита в запросе, миллисекунды.
+BUDGET = 1.0
+
+
+def measure(requests, count):
+    """Время process_view на count запросах, мс по каждому."""
+    middleware = RateLimitMiddleware(lambda request: None)
+    timings = []
+    for request in requests[:count]:
+        started = time.perf_counter()
+        middleware.process_view(request, None, (), {})
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+class Command(BaseCommand):
+    help = ('Замерить, сколько RateLimitMiddleware добавляет к запросу: '
+            'пропущенному и отклонённому, на кэше RATELIMIT_CACHE')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument(
+            '--check', action='store_true',
+            help=f'Ошибка, если медиана для пропущенных запросов дольше '
+                 f'{BUDGET:g} мс')
+
+    def handle(self, *args, **options):
+        url = reverse('posts:add_comment', args=[1])
+        name = view_name(resolve(url))
+        factory = RequestFactory()
+        requests = []
+        for number in range(options['requests']):
+            request = factory.post(url, REMOTE_ADDR=f'10.0.{number % 200}.1')
+            request.resolver_match = resolve(url)
+            request.user = AnonymousUser()
+            requests.append(request)
+        alias = settings.RATELIMIT_CACHE
+        config = settings.CACHES[alias]
+        directory = None
+        if issubclass(import_string(config['BACKEND']), FileBasedCache):
+            # Тот же файловый кэш, но в своём каталоге: замер не
+            # оставляет счётчиков в рабочем.
+            directory = tempfile.mkdtemp(prefix='yatube-ratelimit-')
+            config = {**config, 'LOCATION': directory}
+        results = {}
+        try:
+            caches = {**settings.CACHES, alias: config}
+            # Отклонённый запрос вместо представления получает ответ 429,
+            # его время — вместе с ответом.
+            for label, rate in (('пропущен', '1000000/h'),
+                                ('429', '1/h')):
+                with override_settings(CACHES=caches, RATELIMIT_ENABLED=True,
+                                       RATELIMITS={name: (rate, ('POST',))}):
+                    # Первые запросы создают счётчики, их не считаем.
+                    measure(requests, 200)
+                    results[label] = measure(requests, len(requests))
+        finally:
+            if directory is not None:
+                shutil.rmtree(directory, ignore_errors=True)
+        self.stdout.write(f'{"запрос":<10} {"медиана, мс":>12} '
+                          f'{"p99, мс":>9}')
+        slow = False
+        for label, timings in results.items():
+            median = statistics.median(timings)
+            p99 = sorted(timings)[int(len(timings) * 0.99)]
+            slow = slow or (label == 'пропущен' and median > BUDGET)
+            self.stdout.write(f'{label:<10} {median:>12.3f} {p99:>9.3f}')
+        if options['check'] and slow:
+            raise CommandError(f'Проверка лимита дольше {BUDGET:g} мс')
@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from core import outbox
+
+
+class Command(BaseCommand):
+    help = ('Отправка писем из очереди исходящих; без --once работает, '
+            'пока не остановят')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Разобрать очередь и выйти',
+        )
+        parser.add_argument(
+            '--batch-size', type=int,
+            help='Писем на одно соединение (по умолчанию '
+                 'OUTBOX_BATCH_SIZE)',
+        )
+        parser.add_argument(
+            '--interval', type=float, default=5,
+            help='Секунд между проверками пустой очереди',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                sent, failed = outbox.deliver(options['batch_size'])
+                if sent or failed:
+                    self.stdout.write(
+                        f'Отправлено: {sent}, ошибок: {failed}, '
+                        f'в очереди: {outbox.pending()}')
+                    continue
+                if options['once']:
+                    return
+                connection.close()
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
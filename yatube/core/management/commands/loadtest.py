@@ -0,0 +1,86 @@
+import statistics
+import threading
+import time
+from urllib.error import URLError
+from urllib.request import urlopen
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+def run(url, concurrency, duration, timeout):
+    """Нагрузка из concurrency соединений в течение duration секунд."""
+    latencies, errors = [], []
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def worker():
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                with urlopen(url, timeout=timeout) as response:
+                    response.read()
+            except (URLError, OSError) as error:
+                with lock:
+                    errors.append(error)
+                continue
+            with lock:
+                latencies.append(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, len(errors), time.perf_counter() - started
+
+
+def percentile(values, share):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+class Command(BaseCommand):
+    help = ('Сравнить пропускную способность развёртываний (WSGI, ASGI) '
+            'при одновременных соединениях')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--target', action='append', required=True,
+            help='имя=адрес сервера, например asgi=http://127.0.0.1:8001; '
+                 'можно указать несколько раз',
+        )
+        parser.add_argument(
+            '--path', action='append',
+            help='Адрес страницы относительно сервера (по умолчанию /)',
+        )
+        parser.add_argument('--concurrency', type=int, nargs='+',
+                            default=[1, 10, 50])
+        parser.add_argument('--duration', type=float, default=10,
+                            help='Секунд на каждый замер')
+        parser.add_argument('--timeout', type=float, default=30)
+
+    def handle(self, *args, **options):
+        targets = []
+        for target in options['target']:
+            name, _, base = target.partition('=')
+            if not base:
+                raise CommandError(f'Ожидалось имя=адрес, получено {target}')
+            targets.append((name, base.rstrip('/')))
+        self.stdout.write(
+            f'{"сервер":<8} {"страница":<24} {"соед.":>5} {"зап/с":>8} '
+            f'{"p50, мс":>8} {"p99, мс":>8} {"ошибок":>6}')
+        for path in options['path'] or ['/']:
+            for concurrency in options['concurrency']:
+                for name, base in targets:
+                    latencies, errors, elapsed = run(
+                        base + path, concurrency, options['duration'],
+                        options['timeout'])
+                    self.stdout.write(
+                        f'{name:<8} {path:<24} {concurrency:>5} '
+                        f'{len(latencies) / elapsed:>8.1f} '
+                        f'{statistics.median(latencies or [0]) * 1000:>8.1f} '
+                        f'{percentile(latencies, 0.99) * 1000:>8.1f} '
+                        f'{errors:>6}')
@@ -0,0 +1,49 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import server
+
+
+class Command(BaseCommand):
+    help = ('Запустить многопроцессный WSGI-сервер с предзагрузкой '
+            'приложения и перезапуском рабочих процессов')
+
+    def add_arguments(self, parser):
+        parser.add_argument('addrport', nargs='?', default='127.0.0.1:8000',
+                            help='Адрес и порт, по умолчанию 127.0.0.1:8000')
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help='Рабочих процессов (по умолчанию — по числу ядер)')
+        parser.add_argument('--threads', type=int, default=4,
+                            help='Потоков в каждом рабочем процессе')
+        parser.add_argument(
+            '--max-requests', type=int, default=1000,
+            help='Перезапускать рабочий процесс после стольких запросов '
+                 '(0 — никогда)')
+        parser.add_argument(
+            '--max-requests-jitter', type=int, default=100,
+            help='Случайная добавка к --max-requests, чтобы процессы не '
+                 'перезапускались одновременно')
+        parser.add_argument(
+            '--graceful-timeout', type=float, default=30,
+            help='Сколько секунд ждать завершения начатых запросов')
+
+    def handle(self, *args, **options):
+        host, _, port = options['addrport'].rpartition(':')
+        if not port.isdigit():
+            raise CommandError(f'Неверный адрес: {options["addrport"]}')
+        host = host.strip('[]') or '127.0.0.1'
+        if options['workers'] < 1 or options['threads'] < 1:
+            raise CommandError('Нужен хотя бы один процесс и один поток')
+        application, templates = server.preload()
+        self.stdout.write(f'Загружено шаблонов: {templates}')
+        server.Arbiter(
+            (host, int(port)), application,
+            workers=options['workers'],
+            threads=options['threads'],
+            max_requests=options['max_requests'],
+            max_requests_jitter=options['max_requests_jitter'],
+            graceful_timeout=options['graceful_timeout'],
+            stdout=self.stdout,
+        ).run()
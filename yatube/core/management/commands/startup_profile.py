@@ -0,0 +1,53 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import startup
+
+
+class Command(BaseCommand):
+    help = ('Замерить запуск процесса в чистом интерпретаторе: импорт и '
+            'ready() приложений, загрузку wsgi.py и первый запрос; '
+            'запрос идёт к временной копии БД')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/',
+                            help='Страница первого запроса')
+        parser.add_argument('--top', type=int, default=10,
+                            help='Сколько самых долгих строк показать')
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Ошибка, если первый запрос дольше '
+                 'STARTUP_FIRST_REQUEST_BUDGET или ленивые модули '
+                 'загружены при запуске')
+
+    def table(self, title, rows):
+        self.stdout.write(f'\n{title}:')
+        for seconds, name in sorted(rows, reverse=True)[:self.top]:
+            self.stdout.write(f'{seconds * 1000:9.1f} мс  {name}')
+
+    def handle(self, *args, **options):
+        self.top = options['top']
+        report = startup.measure(options['path'])
+        apps = report['apps']
+        for kind, title in (('import', 'Импорт приложений'),
+                            ('models', 'Импорт моделей'),
+                            ('ready', 'ready()')):
+            self.table(title, [(seconds, label)
+                               for label, seconds in apps[kind].items()])
+        self.table('Импорты верхнего уровня', report['imports'])
+        budget = settings.STARTUP_FIRST_REQUEST_BUDGET
+        self.stdout.write(
+            f'\nwsgi.py загружен: {report["wsgi_loaded"] * 1000:.0f} мс\n'
+            f'Первый запрос {options["path"]} ({report["status"]}): '
+            f'{report["first_request"] * 1000:.0f} мс '
+            f'(цель {budget * 1000:.0f} мс)')
+        if report['lazy_loaded_at_start']:
+            self.stdout.write('Загружены при запуске: '
+                              + ', '.join(report['lazy_loaded_at_start']))
+        if report['setuptools_loaded']:
+            self.stdout.write(
+                'setuptools загружен при запуске (подмена distutils): '
+                'задайте SETUPTOOLS_USE_DISTUTILS=stdlib в окружении')
+        if options['check'] and (report['first_request'] > budget
+                                 or report['lazy_loaded_at_start']):
+            raise CommandError('Запуск не укладывается в цель')
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import query_budget
+from core.testing import FastTestRunner
+
+
+class Command(BaseCommand):
+    help = ('Пересчитать бюджет SQL-запросов для всех URL проекта '
+            '(core/query_budget.json) на тестовой БД')
+
+    def handle(self, *args, **options):
+        runner = FastTestRunner(verbosity=0, slowest=0)
+        runner.setup_test_environment()
+        old_config = runner.setup_databases()
+        try:
+            results = query_budget.measure_sizes()
+        finally:
+            runner.teardown_databases(old_config)
+            runner.teardown_test_environment()
+        small, large = (results[size] for size in query_budget.SIZES)
+        growing = sorted(route for route in large
+                         if large[route] != small[route])
+        if growing:
+            raise CommandError(
+                'Число запросов растёт с объёмом данных: '
+                + ', '.join(f'{route} ({small[route]} → {large[route]})'
+                            for route in growing))
+        previous = query_budget.load_baseline()
+        query_budget.save_baseline(large)
+        for route, count in sorted(large.items()):
+            was = previous.get(route)
+            change = '' if was in (None, count) else f'  (было {was})'
+            self.stdout.write(f'{count:4d}  {route}{change}')
@@ -0,0 +1,384 @@
+"""Метрики в текстовом формате Prometheus.
+
+Каждый процесс пишет значения в свои файлы в METRICS_DIR, отображённые
+в память: запись — это изменение восьми байт без системных вызовов.
+Страница /metrics читает файлы всех процессов и складывает значения.
+Счётчики умерших процессов продолжают учитываться (перезапуск рабочего
+процесса не обнуляет их): главный процесс сервера переносит их в общий
+файл и удаляет файлы рабочего (fold()), так что файлов не больше, чем
+процессов. Показатели вроде длины очереди учитываются только у живых.
+Каталог очищается при старте сервера (reset()).
+"""
+import fcntl
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+COUNTER = 'counter'
+GAUGE = 'gauge'
+HISTOGRAM = 'histogram'
+
+# Вместо pid в имени файла счётчиков завершившихся процессов.
+EXITED = 'exited'
+
+INITIAL_SIZE = 64 * 1024
+HEADER = struct.Struct('<i4x')
+VALUE = struct.Struct('<d')
+LENGTH = struct.Struct('<i')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+
+
+class MmapedDict:
+    """Словарь «ключ → число» в файле: запись ключа и значение double.
+
+    Записи выровнены по восьми байтам; заголовок хранит занятый объём,
+    и его меняют только после записи новой пары, поэтому читатель из
+    другого процесса всегда видит целые записи.
+    """
+
+    def __init__(self, path):
+        self._file = open(path, 'a+b')
+        size = os.fstat(self._file.fileno()).st_size
+        if size == 0:
+            self._file.truncate(INITIAL_SIZE)
+            size = INITIAL_SIZE
+        self._capacity = size
+        self._map = mmap.mmap(self._file.fileno(), size)
+        self._used = HEADER.unpack_from(self._map, 0)[0]
+        if self._used == 0:
+            self._used = HEADER.size
+            HEADER.pack_into(self._map, 0, self._used)
+        self._positions = {
+            key: position
+            for key, _, position in read_entries(self._map, self._used)
+        }
+
+    def _add_key(self, key):
+        encoded = key.encode()
+        padding = b' ' * ((8 - (LENGTH.size + len(encoded)) % 8) % 8)
+        entry = (LENGTH.pack(len(encoded)) + encoded + padding
+                 + VALUE.pack(0.0))
+        if self._used + len(entry) > self._capacity:
+            while self._used + len(entry) > self._capacity:
+                self._capacity *= 2
+            self._map.close()
+            self._file.truncate(self._capacity)
+            self._map = mmap.mmap(self._file.fileno(), self._capacity)
+        self._map[self._used:self._used + len(entry)] = entry
+        self._used += len(entry)
+        HEADER.pack_into(self._map, 0, self._used)
+        position = self._used - VALUE.size
+        self._positions[key] = position
+        return position
+
+    def add(self, key, amount):
+        position = self._positions.get(key) or self._add_key(key)
+        value = VALUE.unpack_from(self._map, position)[0]
+        VALUE.pack_into(self._map, position, value + amount)
+
+    def set(self, key, value):
+        position = self._positions.get(key) or self._add_key(key)
+        VALUE.pack_into(self._map, position, value)
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+
+def read_entries(data, used=None):
+    """Пары (ключ, значение, смещение значения) из содержимого файла."""
+    if used is None:
+        used = HEADER.unpack_from(data, 0)[0]
+    position = HEADER.size
+    while position < used:
+        length = LENGTH.unpack_from(data, position)[0]
+        start = position + LENGTH.size
+        key = bytes(data[start:start + length]).decode()
+        position = start + length
+        position += (8 - position % 8) % 8
+        yield key, VALUE.unpack_from(data, position)[0], position
+        position += VALUE.size
+
+
+_lock = threading.Lock()
+_stores = {}
+
+
+def store(kind):
+    """Файл процесса для счётчиков или показателей.
+
+    Ключ учитывает pid: после fork потомок пишет в свой файл.
+    """
+    directory = settings.METRICS_DIR
+    key = (kind, directory, os.getpid())
+    if key not in _stores:
+        os.makedirs(directory, exist_ok=True)
+        _stores[key] = MmapedDict(
+            os.path.join(directory, f'{kind}_{os.getpid()}.db'))
+    return _stores[key]
+
+
+def sample_key(name, labels):
+    return json.dumps([name, sorted(labels.items())], ensure_ascii=False)
+
+
+def process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+@contextmanager
+def locked(operation):
+    # Сбор берёт общую блокировку, fold() — исключительную: /metrics не
+    # увидит счётчики рабочего и в его файле, и уже в общем.
+    with open(os.path.join(settings.METRICS_DIR, 'lock'), 'ab') as file:
+        fcntl.flock(file, operation)
+        yield
+
+
+def read_file(path):
+    try:
+        with open(path, 'rb') as file:
+            data = file.read()
+    except FileNotFoundError:
+        return ()
+    if len(data) < HEADER.size:
+        return ()
+    return read_entries(data)
+
+
+def collect_values():
+    """{ключ: сумма по процессам}; показатели — только живых процессов."""
+    totals = defaultdict(float)
+    if not os.path.isdir(settings.METRICS_DIR):
+        return totals
+    with locked(fcntl.LOCK_SH):
+        for name in os.listdir(settings.METRICS_DIR):
+            kind, _, pid = name[:-len('.db')].partition('_')
+            if not name.endswith('.db') or kind not in (COUNTER, GAUGE):
+                continue
+            exited = kind == COUNTER and pid == EXITED
+            if not exited and not pid.isdigit():
+                continue
+            if kind == GAUGE and not process_alive(int(pid)):
+                continue
+            path = os.path.join(settings.METRICS_DIR, name)
+            for key, value, _ in read_file(path):
+                totals[key] += value
+    return totals
+
+
+def fold(pid):
+    """Переносит счётчики завершившегося процесса в общий файл.
+
+    Вызывает главный процесс сервера, убрав рабочего; файлы рабочего
+    удаляются.
+    """
+    directory = settings.METRICS_DIR
+    if not os.path.isdir(directory):
+        return
+    counters = os.path.join(directory, f'{COUNTER}_{pid}.db')
+    with locked(fcntl.LOCK_EX):
+        entries = list(read_file(counters))
+        if entries:
+            exited = MmapedDict(
+                os.path.join(directory, f'{COUNTER}_{EXITED}.db'))
+            try:
+                for key, value, _ in entries:
+                    exited.add(key, value)
+            finally:
+                exited.close()
+        for kind in (COUNTER, GAUGE):
+            try:
+                os.remove(os.path.join(directory, f'{kind}_{pid}.db'))
+            except FileNotFoundError:
+                pass
+
+
+def reset():
+    """Удаляет файлы прошлых запусков; вызывать до старта процессов."""
+    try:
+        names = os.listdir(settings.METRICS_DIR)
+    except FileNotFoundError:
+        return
+    for name in names:
+        if name.endswith('.db'):
+            os.remove(os.path.join(settings.METRICS_DIR, name))
+    _stores.clear()
+
+
+REGISTRY = {}
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        REGISTRY[name] = self
+
+    def _check(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f'{self.name}: ожидались метки {self.labelnames}, '
+                f'получены {tuple(labels)}')
+
+    def _add(self, name, amount, labels, kind=COUNTER):
+        with _lock:
+            store(kind).add(sample_key(name, labels), amount)
+
+
+class Counter(Metric):
+    kind = COUNTER
+
+    def inc(self, amount=1, **labels):
+        self._check(labels)
+        self._add(self.name, amount, labels)
+
+
+class Gauge(Metric):
+    kind = GAUGE
+
+    def set(self, value, **labels):
+        self._check(labels)
+        with _lock:
+            store(GAUGE).set(sample_key(self.name, labels), value)
+
+    def inc(self, amount=1, **labels):
+        self._check(labels)
+        self._add(self.name, amount, labels, GAUGE)
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    kind = HISTOGRAM
+
+    def __init__(self, name, documentation, labelnames=(),
+                 buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        self._check(labels)
+        with _lock:
+            values = store(COUNTER)
+            for bound in self.buckets:
+                if value <= bound:
+                    values.add(sample_key(
+                        f'{self.name}_bucket',
+                        {**labels, 'le': format_value(bound)}), 1)
+            values.add(sample_key(f'{self.name}_sum', labels), value)
+            values.add(sample_key(f'{self.name}_count', labels), 1)
+
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return f'{value:.1f}'
+    return repr(float(value))
+
+
+def escape(value):
+    return (str(value).replace('\\', r'\\').replace('\n', r'\n')
+            .replace('"', r'\"'))
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{escape(value)}"'
+                          for name, value in labels) + '}'
+
+
+def sort_key(sample):
+    name, labels = sample
+    labels = dict(labels)
+    bound = labels.pop('le', None)
+    return (sorted(labels.items()), name,
+            float('inf') if bound == '+Inf' else float(bound or 0))
+
+
+def exposition():
+    """Все метрики в текстовом формате Prometheus 0.0.4."""
+    samples = defaultdict(list)
+    for key, value in collect_values().items():
+        name, labels = json.loads(key)
+        family = name
+        for suffix in ('_bucket', '_sum', '_count'):
+            if name.endswith(suffix) and name[:-len(suffix)] in REGISTRY:
+                family = name[:-len(suffix)]
+        samples[family].append(((name, tuple(map(tuple, labels))), value))
+    lines = []
+    for name, metric in sorted(REGISTRY.items()):
+        lines.append(f'# HELP {name} {escape(metric.documentation)}')
+        lines.append(f'# TYPE {name} {metric.kind}')
+        for (sample, labels), value in sorted(
+                samples.get(name, ()), key=lambda item: sort_key(item[0])):
+            lines.append(f'{sample}{format_labels(labels)} {value!r}')
+    return '\n'.join(lines) + '\n'
+
+
+REQUEST_LATENCY = Histogram(
+    'yatube_request_duration_seconds',
+    'Время обработки запроса по имени представления', ['view'])
+REQUEST_QUERIES = Histogram(
+    'yatube_request_queries',
+    'SQL-запросов на один запрос по имени представления', ['view'],
+    buckets=QUERY_BUCKETS)
+CACHE_REQUESTS = Counter(
+    'yatube_cache_requests_total',
+    'Обращения к кэшу страниц, фрагментов и миниатюр',
+    ['cache', 'result'])
+THUMBNAIL_LATENCY = Histogram(
+    'yatube_thumbnail_duration_seconds', 'Время создания миниатюры')
+QUEUE_DEPTH = Gauge(
+    'yatube_queue_depth', 'Длина очередей фоновой обработки', ['queue'])
+
+
+class MetricsMiddleware:
+    """Время и число SQL-запросов каждого запроса по имени представления.
+
+    Стоит первым, чтобы учитывать и остальные промежуточные слои.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = 0
+
+        def count(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(count))
+            response = self.get_response(request)
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unresolved'
+        REQUEST_LATENCY.observe(time.perf_counter() - started, view=view)
+        REQUEST_QUERIES.observe(queries, view=view)
+        return response
@@ -0,0 +1,45 @@
+# Generated by Django 2.2.16 on 2026-10-19 10:58
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxMessage',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Дата создания')),
+                ('subject', models.TextField(verbose_name='Тема')),
+                ('body', models.TextField(blank=True, verbose_name='Текст')),
+                ('html_body', models.TextField(blank=True, verbose_name='HTML')),
+                ('from_email', models.CharField(max_length=254, verbose_name='Отправитель')),
+                ('to', models.TextField(blank=True, verbose_name='Получатели')),
+                ('cc', models.TextField(blank=True, verbose_name='Копия')),
+                ('bcc', models.TextField(blank=True, verbose_name='Скрытая копия')),
+                ('reply_to', models.TextField(blank=True, verbose_name='Ответить')),
+                ('headers', models.TextField(blank=True, verbose_name='Заголовки')),
+                ('status', models.CharField(choices=[('pending', 'Ждёт отправки'), ('sent', 'Отправлено'), ('failed', 'Не отправлено')], default='pending', max_length=10, verbose_name='Статус')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Попыток')),
+                ('next_attempt', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Следующая попытка')),
+                ('sent', models.DateTimeField(blank=True, null=True, verbose_name='Отправлено')),
+                ('error', models.TextField(blank=True, verbose_name='Ошибка')),
+            ],
+            options={
+                'verbose_name': 'Исходящее письмо',
+                'verbose_name_plural': 'Исходящие письма',
+                'ordering': ['-created'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='outboxmessage',
+            index=models.Index(fields=['status', 'next_attempt'], name='core_outbox_status_246584_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 2.2.16 on 2026-10-19 11:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RateLimitBucket',
+            fields=[
+                ('key', models.CharField(max_length=200, primary_key=True, serialize=False, verbose_name='Ключ')),
+                ('tat', models.FloatField(db_index=True, verbose_name='Следующий запрос')),
+            ],
+            options={
+                'verbose_name': 'Бак ограничения частоты',
+                'verbose_name_plural': 'Баки ограничения частоты',
+            },
+        ),
+    ]
@@ -1,12 +1,57 @@
 from django.db import models
+from django.utils import timezone
 
 
 class CreatedModel(models.Model):
     """Абстрактная модель. Добавляет дату создания."""
     created = models.DateTimeField(
         'Дата создания',
-        auto_now_add=True
+        auto_now_add=True,
+        db_index=True
     )
 
     class Meta:
         abstract = True
+
+
+class OutboxMessage(CreatedModel):
+    """Письмо, записанное в транзакции запроса и ждущее отправки."""
+    PENDING = 'pending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'Ждёт отправки'),
+        (SENT, 'Отправлено'),
+        (FAILED, 'Не отправлено'),
+    )
+    subject = models.TextField(verbose_name='Тема')
+    body = models.TextField(blank=True, verbose_name='Текст')
+    html_body = models.TextField(blank=True, verbose_name='HTML')
+    from_email = models.CharField(max_length=254, verbose_name='Отправитель')
+    to = models.TextField(blank=True, verbose_name='Получатели')
+    cc = models.TextField(blank=True, verbose_name='Копия')
+    bcc = models.TextField(blank=True, verbose_name='Скрытая копия')
+    reply_to = models.TextField(blank=True, verbose_name='Ответить')
+    headers = models.TextField(blank=True, verbose_name='Заголовки')
+    status = models.CharField(
+        max_length=10,
+        choices=STATUSES,
+        default=PENDING,
+        verbose_name='Статус'
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0, verbose_name='Попыток')
+    next_attempt = models.DateTimeField(
+        default=timezone.now, verbose_name='Следующая попытка')
+    sent = models.DateTimeField(
+        blank=True, null=True, verbose_name='Отправлено')
+    error = models.TextField(blank=True, verbose_name='Ошибка')
+
+    class Meta:
+        ordering = ['-created']
+        indexes = [models.Index(fields=['status', 'next_attempt'])]
+        verbose_name = 'Исходящее письмо'
+        verbose_name_plural = 'Исходящие письма'
+
+    def __str__(self):
+        return f'{self.subject[:30]} → {", ".join(self.to.splitlines())}'
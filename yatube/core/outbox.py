@@ -0,0 +1,150 @@
+"""Исходящая почта через таблицу-очередь.
+
+EMAIL_BACKEND = 'core.outbox.OutboxBackend' ничего не отправляет, а
+записывает письма в OutboxMessage в текущей транзакции: откат запроса
+отменяет и письмо, а медленный почтовый сервер не держит рабочий
+процесс. Команда deliver_outbox отправляет письма пачками через
+OUTBOX_EMAIL_BACKEND по одному соединению на пачку и повторяет
+неудачные с экспоненциальной задержкой.
+"""
+import json
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+from django.db.models import F
+from django.utils import timezone
+
+from .metrics import QUEUE_DEPTH
+from .models import OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+
+def join(addresses):
+    return '\n'.join(addresses)
+
+
+def split(addresses):
+    return addresses.splitlines()
+
+
+def to_record(message):
+    """OutboxMessage из EmailMessage; вложения не поддерживаются."""
+    if message.attachments:
+        raise ValueError('Вложения в исходящих письмах не поддерживаются')
+    html_body = ''
+    for content, mimetype in getattr(message, 'alternatives', ()):
+        if mimetype == 'text/html':
+            html_body = content
+    return OutboxMessage(
+        subject=message.subject,
+        body=message.body,
+        html_body=html_body,
+        from_email=message.from_email,
+        to=join(message.to),
+        cc=join(message.cc),
+        bcc=join(message.bcc),
+        reply_to=join(message.reply_to),
+        headers=json.dumps(message.extra_headers) if message.extra_headers
+        else '',
+    )
+
+
+def to_email(record, connection=None):
+    message = EmailMultiAlternatives(
+        subject=record.subject,
+        body=record.body,
+        from_email=record.from_email,
+        to=split(record.to),
+        cc=split(record.cc),
+        bcc=split(record.bcc),
+        reply_to=split(record.reply_to),
+        headers=json.loads(record.headers or '{}'),
+        connection=connection,
+    )
+    if record.html_body:
+        message.attach_alternative(record.html_body, 'text/html')
+    return message
+
+
+class OutboxBackend(BaseEmailBackend):
+    """Почтовый бэкенд, записывающий письма в очередь."""
+
+    def send_messages(self, email_messages):
+        records = [to_record(message) for message in email_messages
+                   if message.recipients()]
+        OutboxMessage.objects.bulk_create(records)
+        return len(records)
+
+
+def retry_delay(attempts):
+    """Задержка перед попыткой номер attempts + 1."""
+    delay = settings.OUTBOX_RETRY_DELAY * 2 ** (attempts - 1)
+    return timedelta(seconds=min(delay, settings.OUTBOX_RETRY_MAX_DELAY))
+
+
+def claim(now, size):
+    """Забирает пачку готовых к отправке писем.
+
+    Письма пачки откладываются на OUTBOX_LEASE секунд: второй рабочий
+    их не возьмёт, а если этот упадёт, они уйдут повторно по истечении
+    срока.
+    """
+    due = OutboxMessage.objects.filter(
+        status=OutboxMessage.PENDING, next_attempt__lte=now)
+    pks = list(due.order_by('next_attempt', 'pk')
+               .values_list('pk', flat=True)[:size])
+    if not pks:
+        return []
+    lease = now + timedelta(seconds=settings.OUTBOX_LEASE)
+    due.filter(pk__in=pks).update(next_attempt=lease)
+    return list(OutboxMessage.objects.filter(pk__in=pks, next_attempt=lease)
+                .order_by('pk'))
+
+
+def deliver(size=None, now=None):
+    """Отправляет одну пачку; возвращает (отправлено, не отправлено)."""
+    now = now or timezone.now()
+    records = claim(now, size or settings.OUTBOX_BATCH_SIZE)
+    if not records:
+        return 0, 0
+    connection = get_connection(settings.OUTBOX_EMAIL_BACKEND)
+    sent, failed = [], []
+    try:
+        for record in records:
+            try:
+                # Повторный open() у открытого соединения ничего не
+                # делает, после ошибки — переподключается.
+                connection.open()
+                connection.send_messages([to_email(record, connection)])
+            except Exception as error:
+                logger.warning('Письмо %s не отправлено: %s', record.pk,
+                               error)
+                connection.close()
+                record.attempts += 1
+                record.error = f'{type(error).__name__}: {error}'
+                if record.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+                    record.status = OutboxMessage.FAILED
+                else:
+                    record.next_attempt = now + retry_delay(record.attempts)
+                failed.append(record)
+            else:
+                sent.append(record.pk)
+    finally:
+        connection.close()
+    OutboxMessage.objects.filter(pk__in=sent).update(
+        status=OutboxMessage.SENT, sent=timezone.now(), error='',
+        attempts=F('attempts') + 1)
+    OutboxMessage.objects.bulk_update(
+        failed, ['attempts', 'error', 'status', 'next_attempt'])
+    return len(sent), len(failed)
+
+
+def pending():
+    count = OutboxMessage.objects.filter(
+        status=OutboxMessage.PENDING).count()
+    QUEUE_DEPTH.set(count, queue='outbox')
+    return count
@@ -0,0 +1,183 @@
+import hashlib
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.core.paginator import EmptyPage, Paginator
+from django.db import connection, connections
+from django.db.models import Max
+from django.utils.functional import cached_property
+
+logger = logging.getLogger(__name__)
+
+# До скольких строк считаем точно: COUNT по подзапросу с LIMIT.
+EXACT_COUNT_LIMIT = 10000
+
+
+def estimate_count(model, using='default'):
+    """Оценка числа строк таблицы без полного COUNT(*).
+
+    Возвращает None, если для СУБД нет дешёвого способа оценки.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE relname = %s',
+                [table],
+            )
+            row = cursor.fetchone()
+        return row[0] if row else None
+    if connection.vendor == 'mysql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT table_rows FROM information_schema.tables '
+                'WHERE table_schema = DATABASE() AND table_name = %s',
+                [table],
+            )
+            row = cursor.fetchone()
+        return row[0] if row else None
+    if connection.vendor == 'sqlite':
+        # Максимальный ключ читается из индекса первичного ключа.
+        return model._default_manager.using(using).aggregate(
+            count=Max('pk'))['count'] or 0
+    return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator, не выполняющий полный COUNT(*) на больших таблицах.
+
+    Небольшие выборки считаются точно. Если строк больше
+    EXACT_COUNT_LIMIT, для выборки без фильтров берётся оценка по
+    статистике таблицы, а для отфильтрованной — нижняя граница
+    EXACT_COUNT_LIMIT + 1. Номера страниц за оценкой не обрезаются:
+    такая страница может существовать.
+    """
+    exact_count_limit = EXACT_COUNT_LIMIT
+    is_estimated = False
+    ELLIPSIS = '…'
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not hasattr(queryset, 'query'):
+            return super().count
+        count, self.is_estimated = self.count_rows(queryset)
+        return count
+
+    def count_rows(self, queryset):
+        """Пара (число строк, оценка ли это)."""
+        capped = queryset.order_by()[:self.exact_count_limit + 1].count()
+        if capped <= self.exact_count_limit:
+            return capped, False
+        if not queryset.query.where:
+            estimate = estimate_count(queryset.model, queryset.db)
+            if estimate is not None:
+                return max(estimate, capped), True
+        return capped, True
+
+    def validate_number(self, number):
+        try:
+            return super().validate_number(number)
+        except EmptyPage:
+            if self.is_estimated and int(number) > 1:
+                return int(number)
+            raise
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if number <= self.num_pages:
+            return super().page(number)
+        bottom = (number - 1) * self.per_page
+        return self._get_page(
+            self.object_list[bottom:bottom + self.per_page], number, self)
+
+    def get_elided_page_range(self, number=1, on_each_side=2, on_ends=1):
+        """Номера страниц вокруг number и по краям, пропуски — ELLIPSIS.
+
+        Перенос Paginator.get_elided_page_range из Django 3.2. У оценки
+        числа страниц последние номера неточны, поэтому края справа
+        не выводятся.
+        """
+        number = self.validate_number(number)
+        num_pages = self.num_pages
+        right_end = 0 if self.is_estimated else on_ends
+        if num_pages <= (on_each_side + on_ends) * 2:
+            yield from self.page_range
+            return
+        if number > 1 + on_each_side + on_ends + 1:
+            yield from range(1, on_ends + 1)
+            yield self.ELLIPSIS
+            yield from range(number - on_each_side, number + 1)
+        else:
+            yield from range(1, number + 1)
+        if number < num_pages - on_each_side - right_end - 1:
+            yield from range(number + 1, number + on_each_side + 1)
+            yield self.ELLIPSIS
+            yield from range(num_pages - right_end + 1, num_pages + 1)
+        else:
+            yield from range(number + 1, num_pages + 1)
+
+
+class CachedCountPaginator(EstimatedCountPaginator):
+    """Paginator лент: большие числа строк берутся из кэша.
+
+    Небольшие выборки, как и раньше, считаются точно на каждом
+    запросе. Число строк большой выборки запоминается в кэше по тексту
+    запроса на PAGINATOR_COUNT_TTL секунд; устаревшее значение ещё
+    отдаётся, а пересчёт идёт в фоновом потоке. Поток выполняет полный
+    COUNT(*) — ради него он и фоновый, — поэтому отфильтрованная лента
+    после первого пересчёта знает настоящее число строк, а не
+    ограничение EXACT_COUNT_LIMIT. Запрос страницы ждёт только
+    ограниченного подсчёта, пока кэш пуст.
+    """
+
+    def count_rows(self, queryset):
+        try:
+            sql = str(queryset.query.sql_with_params())
+        except EmptyResultSet:
+            return 0, False
+        key = 'paginator:count:' + hashlib.md5(sql.encode()).hexdigest()
+        cached = cache.get(key)
+        if cached is not None:
+            count, refresh_at = cached
+            if refresh_at < time.time() and cache.add(f'{key}:lock', 1,
+                                                      60):
+                self.schedule_refresh(key, queryset)
+            return count, True
+        count, estimated = super().count_rows(queryset)
+        if estimated:
+            self.remember(key, count)
+            if (count == self.exact_count_limit + 1
+                    and cache.add(f'{key}:lock', 1, 60)):
+                # Это лишь граница подсчёта: настоящее число — в фоне.
+                self.schedule_refresh(key, queryset)
+        return count, estimated
+
+    def remember(self, key, count):
+        # Запись бессрочна: устаревшее значение отдаётся, пока поток его
+        # пересчитывает, а неиспользуемые ключи вытесняет сам кэш.
+        cache.set(key, (count, time.time() + settings.PAGINATOR_COUNT_TTL),
+                  None)
+
+    def schedule_refresh(self, key, queryset):
+        threading.Thread(target=self.refresh, args=(key, queryset),
+                         daemon=True).start()
+
+    def refresh(self, key, queryset):
+        try:
+            count = queryset.order_by().count()
+            if count > self.exact_count_limit:
+                self.remember(key, count)
+            else:
+                # Выборка стала маленькой: снова считаем точно.
+                cache.delete(key)
+        except Exception:
+            logger.exception('Число строк для %s не пересчитано', key)
+        finally:
+            cache.delete(f'{key}:lock')
+            connection.close()
@@ -0,0 +1,142 @@
+"""Профилирование живых запросов через cProfile.
+
+Запрос профилируется, если сотрудник передал заголовок X-Profile или
+параметр ?profile, либо если он попал в случайную выборку с долей
+PROFILING_SAMPLE_RATE. Профиль охватывает представление и отрисовку
+шаблона и сохраняется в PROFILING_DIR в формате pstats; хранится не
+больше PROFILING_MAX_FILES последних файлов. cProfile и pstats
+импортируются только при первом профилировании.
+"""
+import os
+import random
+import re
+import time
+from datetime import datetime
+
+from django.conf import settings
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+PROFILE_PARAM = 'profile'
+SUFFIX = '.prof'
+NAME_RE = re.compile(r'^[\w.-]+\.prof$')
+
+
+def requested(request):
+    # Пользователя проверяем последним: это запросы к сессии и users.
+    if PROFILE_HEADER not in request.META and PROFILE_PARAM not in request.GET:
+        return False
+    user = getattr(request, 'user', None)
+    return user is not None and user.is_staff
+
+
+def sampled():
+    return random.random() < settings.PROFILING_SAMPLE_RATE
+
+
+def file_name(request, elapsed):
+    path = re.sub(r'[^\w]+', '-', request.path).strip('-') or 'root'
+    return (f'{datetime.now():%Y%m%d-%H%M%S-%f}-{request.method}'
+            f'-{path[:60]}-{elapsed * 1000:.0f}ms{SUFFIX}')
+
+
+def save(profiler, name):
+    os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+    profiler.dump_stats(os.path.join(settings.PROFILING_DIR, name))
+    for old in list_profiles()[settings.PROFILING_MAX_FILES:]:
+        try:
+            os.remove(profile_path(old['name']))
+        except FileNotFoundError:
+            pass
+
+
+def list_profiles():
+    """Сохранённые профили, новые первыми."""
+    try:
+        names = os.listdir(settings.PROFILING_DIR)
+    except FileNotFoundError:
+        return []
+    profiles = []
+    for name in names:
+        if NAME_RE.match(name):
+            stat = os.stat(os.path.join(settings.PROFILING_DIR, name))
+            profiles.append({'name': name, 'size': stat.st_size,
+                             'modified': stat.st_mtime})
+    return sorted(profiles, key=lambda item: item['name'], reverse=True)
+
+
+def profile_path(name):
+    """Путь к профилю; None для чужих и несуществующих имён."""
+    if not NAME_RE.match(name):
+        return None
+    path = os.path.join(settings.PROFILING_DIR, name)
+    return path if os.path.isfile(path) else None
+
+
+def report(path, sort='cumulative', limit=60):
+    import io
+    import pstats
+
+    stream = io.StringIO()
+    stats = pstats.Stats(path, stream=stream)
+    stats.strip_dirs().sort_stats(sort).print_stats(limit)
+    return stream.getvalue()
+
+
+def function_times(path):
+    """{функция: (вызовы, собственное время, полное время)}."""
+    import pstats
+
+    stats = pstats.Stats(path).strip_dirs().stats
+    return {
+        pstats.func_std_string(func): (calls, own, total)
+        for func, (_, calls, own, total, _) in stats.items()
+    }
+
+
+def diff(old_path, new_path, limit=60):
+    """Функции с наибольшим изменением собственного времени."""
+    old, new = function_times(old_path), function_times(new_path)
+    rows = []
+    for func in old.keys() | new.keys():
+        old_calls, old_own, old_total = old.get(func, (0, 0.0, 0.0))
+        new_calls, new_own, new_total = new.get(func, (0, 0.0, 0.0))
+        rows.append({
+            'function': func,
+            'calls': (old_calls, new_calls),
+            'own': (old_own, new_own),
+            'total': (old_total, new_total),
+            'delta': new_own - old_own,
+        })
+    rows.sort(key=lambda row: abs(row['delta']), reverse=True)
+    return rows[:limit]
+
+
+class ProfilingMiddleware:
+    """Профиль запроса по просьбе сотрудника или по выборке.
+
+    Стоит после AuthenticationMiddleware: нужен request.user.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not (requested(request) or sampled()):
+            return self.get_response(request)
+        import cProfile
+
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Профилировщик уже активен в этом потоке.
+            return self.get_response(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.disable()
+        name = file_name(request, time.perf_counter() - started)
+        save(profiler, name)
+        response['X-Profile-Name'] = name
+        return response
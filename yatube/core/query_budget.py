@@ -0,0 +1,101 @@
+"""Проверка числа SQL-запросов на каждый именованный URL проекта.
+
+Каждый маршрут из ROUTE_MODULES открывается на двух объёмах данных.
+Число запросов не должно зависеть от объёма (иначе это N+1) и не
+должно превышать бюджет из query_budget.json. Бюджет пересчитывается
+командой `python manage.py update_query_budget`.
+"""
+import json
+import os
+from importlib import import_module
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+ROUTE_MODULES = ('posts.urls', 'users.urls', 'about.urls')
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'query_budget.json')
+SIZES = (3, 30)
+
+
+def routes():
+    """Пары (имя маршрута, имена его параметров)."""
+    for module_name in ROUTE_MODULES:
+        module = import_module(module_name)
+        for pattern in module.urlpatterns:
+            if pattern.name:
+                yield (f'{module.app_name}:{pattern.name}',
+                       list(pattern.pattern.converters))
+
+
+def seed(size):
+    """Данные объёма size; возвращает зрителя и параметры URL."""
+    from posts import recommendations, tags, trending
+    from posts.models import Post
+    from posts.tests.factories import (create_comments, create_follows,
+                                       create_groups, create_posts,
+                                       create_users)
+
+    viewer, author = create_users(2, prefix=f'budget{size}-')
+    readers = create_users(size, prefix=f'reader{size}-')
+    group = create_groups(1, prefix=f'budget{size}')[0]
+    posts = create_posts(2 * size, [viewer, author], [group],
+                         text=f'#budget{size} @{viewer.username}')
+    tags.index_posts(posts)
+    drafts = create_posts(size, [viewer], text='Черновик')
+    Post.objects.filter(pk__in=[post.pk for post in drafts]).update(
+        status=Post.DRAFT)
+    create_comments(posts[:1], readers, per_post=size)
+    create_follows([viewer], [author] + readers)
+    create_follows(readers, [viewer, author])
+    trending.rebuild()
+    recommendations.refresh()
+    return viewer, {
+        'slug': group.slug,
+        'username': author.username,
+        'post_id': posts[0].pk,
+        'name': f'budget{size}',
+    }
+
+
+def measure(viewer, values):
+    counts = {}
+    for route, params in routes():
+        cache.clear()
+        client = Client()
+        client.force_login(viewer)
+        url = reverse(route, kwargs={name: values[name] for name in params})
+        with CaptureQueriesContext(connection) as queries:
+            client.get(url)
+        counts[route] = len(queries)
+    return counts
+
+
+@override_settings(POST_VIEWS_FLUSH_INTERVAL=float('inf'),
+                   POST_VIEWS_FLUSH_SIZE=float('inf'))
+def measure_sizes():
+    """{размер: {маршрут: число запросов}}; данные откатываются."""
+    from posts import hits
+
+    results = {}
+    for size in SIZES:
+        with transaction.atomic():
+            results[size] = measure(*seed(size))
+            hits.flush()
+            transaction.set_rollback(True)
+    return results
+
+
+def load_baseline():
+    if not os.path.exists(BASELINE_PATH):
+        return {}
+    with open(BASELINE_PATH, encoding='utf-8') as file:
+        return json.load(file)
+
+
+def save_baseline(counts):
+    with open(BASELINE_PATH, 'w', encoding='utf-8') as file:
+        json.dump(counts, file, indent=2, sort_keys=True)
+        file.write('\n')
@@ -0,0 +1,132 @@
+"""Ограничение частоты запросов к пишущим представлениям.
+
+Лимиты задаются в RATELIMITS по имени представления: «N/период»
+(например '10/m', '20/h', '5/10m') и методы, которые расходуют лимит.
+Каждый пользователь, а аноним — каждый IP-адрес, получает свой счётчик
+скользящего окна: запросы текущего окна длиной в период плюс запросы
+прошлого окна с весом той его доли, что ещё входит в последний период.
+
+Счётчики лежат в кэше RATELIMIT_CACHE, общем для процессов
+manage.py serve, и меняются атомарными add() и incr(); отклонённый
+запрос свой инкремент возвращает. Если кэш недоступен, запрос
+пропускается: ограничение не должно ронять сайт.
+"""
+import logging
+import math
+import re
+import time
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import caches
+from django.shortcuts import render
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+RATE_RE = re.compile(r'^(\d+)/(\d*)([smhd])$')
+UNITS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}
+
+RATELIMITED = metrics.Counter(
+    'yatube_ratelimited_total', 'Запросы, отклонённые ограничением частоты',
+    ['view'])
+
+
+@lru_cache(maxsize=None)
+def parse_rate(rate):
+    """'10/5m' → (10, 300.0): число запросов и период в секундах."""
+    match = RATE_RE.match(rate)
+    if match is None:
+        raise ValueError(f'Неверное ограничение частоты: {rate!r}')
+    count, multiplier, unit = match.groups()
+    return int(count), float(multiplier or 1) * UNITS[unit]
+
+
+def retry_after(previous, used, count, period, elapsed):
+    """Секунды до запроса, который уложится в лимит."""
+    if used < count:
+        # Хватит того, что прошлое окно уйдёт из периода.
+        return period * (1 - (count - used - 1) / previous) - elapsed
+    # Текущее окно заполнено: ждём следующего, где оно станет прошлым.
+    return period - elapsed + period * max(0.0, 1 - (count - 1) / used)
+
+
+def consume(key, rate, now=None):
+    """Расходует запрос из лимита; возвращает 0 или секунды ожидания."""
+    count, period = parse_rate(rate)
+    now = time.time() if now is None else now
+    window, elapsed = divmod(now, period)
+    current = f'ratelimit:{key}:{int(window)}'
+    cache = caches[settings.RATELIMIT_CACHE]
+    try:
+        # Окно живёт ещё период, пока оно прошлое.
+        cache.add(current, 0, math.ceil(2 * period))
+        used = cache.incr(current)
+        previous = cache.get(f'ratelimit:{key}:{int(window) - 1}', 0)
+        if previous * (1 - elapsed / period) + used <= count:
+            return 0
+        cache.decr(current)
+    except Exception as error:
+        logger.warning('Ограничение частоты не проверено: %s', error)
+        return 0
+    return retry_after(previous, used - 1, count, period, elapsed)
+
+
+def client_ip(request):
+    """Адрес клиента; X-Forwarded-For — только от TRUSTED_PROXIES.
+
+    Цепочка читается справа: последний адрес, добавленный не нашим
+    прокси, и есть клиент. Левее он мог записать что угодно.
+    """
+    address = request.META.get('REMOTE_ADDR', '')
+    if address not in settings.TRUSTED_PROXIES:
+        return address
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR', '')
+    for hop in reversed([hop.strip() for hop in forwarded.split(',')]):
+        if hop and hop not in settings.TRUSTED_PROXIES:
+            return hop
+    return address
+
+
+def client_key(request):
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return f'user:{user.pk}'
+    return f'ip:{client_ip(request)}'
+
+
+def view_name(match):
+    """Имя представления по app_name, а не по пространству имён URL."""
+    if match.url_name is None:
+        return None
+    return ':'.join(match.app_names + [match.url_name])
+
+
+class RateLimitMiddleware:
+    """Отвечает 429 с Retry-After, когда бак клиента пуст.
+
+    Стоит после AuthenticationMiddleware: лимит считается на
+    пользователя, для анонимов — на IP-адрес.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not settings.RATELIMIT_ENABLED:
+            return None
+        name = view_name(request.resolver_match)
+        limit = settings.RATELIMITS.get(name)
+        if limit is None or request.method not in limit[1]:
+            return None
+        wait = consume(f'{name}:{client_key(request)}', limit[0])
+        if not wait:
+            return None
+        RATELIMITED.inc(view=name)
+        response = render(request, 'core/429.html', status=429)
+        response['Retry-After'] = str(math.ceil(wait))
+        return response
@@ -0,0 +1,233 @@
+"""Многопроцессный многопоточный WSGI-сервер без внешних зависимостей.
+
+Главный процесс загружает Django, URL и шаблоны, открывает сокет и
+порождает рабочие процессы через fork: загруженный код и шаблоны они
+делят с главным по принципу copy-on-write. Каждый рабочий обслуживает
+запросы пулом потоков и после max_requests запросов завершается —
+главный запускает ему замену. SIGTERM/SIGINT останавливают сервер
+мягко: рабочие дообрабатывают начатые запросы и сбрасывают буферы.
+"""
+import gc
+import logging
+import os
+import random
+import signal
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.servers.basehttp import WSGIRequestHandler, WSGIServer
+from django.core.wsgi import get_wsgi_application
+from django.db import connections
+from django.template import engines
+from django.template.utils import get_app_template_dirs
+from django.urls import get_resolver
+
+from posts import hits
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def preload():
+    """Загружает приложение, URL и шаблоны; возвращает WSGI-приложение."""
+    application = get_wsgi_application()
+    get_resolver().url_patterns
+    templates = 0
+    for engine in engines.all():
+        directories = list(engine.dirs)
+        if engine.app_dirs:
+            directories += get_app_template_dirs(engine.app_dirname)
+        for directory in directories:
+            for root, _, names in os.walk(directory):
+                for name in names:
+                    if not name.endswith(('.html', '.txt')):
+                        continue
+                    path = os.path.relpath(os.path.join(root, name),
+                                           directory)
+                    try:
+                        engine.get_template(path)
+                    except Exception:
+                        logger.warning('Шаблон %s не загружен', path,
+                                       exc_info=True)
+                        continue
+                    templates += 1
+    return application, templates
+
+
+class PooledWSGIServer(WSGIServer):
+    """WSGI-сервер с пулом из threads потоков.
+
+    После max_requests принятых соединений перестаёт принимать новые;
+    serve_forever возвращается, начатые запросы дообрабатываются в
+    stop().
+    """
+
+    def __init__(self, *args, threads=4, max_requests=0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.executor = ThreadPoolExecutor(threads,
+                                           thread_name_prefix='wsgi')
+        self.max_requests = max_requests
+        self.requests = 0
+
+    def use_socket(self, listener):
+        """Принимать соединения на сокете, открытом главным процессом."""
+        self.socket.close()
+        self.socket = listener
+        host, port = listener.getsockname()[:2]
+        self.server_name = socket.getfqdn(host)
+        self.server_port = port
+        self.setup_environ()
+
+    def process_request(self, request, client_address):
+        self.requests += 1
+        if self.max_requests and self.requests >= self.max_requests:
+            self.stop_soon()
+        self.executor.submit(self.process_request_thread, request,
+                             client_address)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            connections.close_all()
+
+    def stop_soon(self):
+        # shutdown() ждёт выхода из serve_forever, поэтому из его же
+        # потока (и из обработчика сигнала) вызывается в отдельном.
+        threading.Thread(target=self.shutdown, daemon=True).start()
+
+    def stop(self):
+        self.executor.shutdown(wait=True)
+
+
+def run_worker(listener, application, threads, max_requests):
+    """Тело рабочего процесса; не возвращается."""
+    server = PooledWSGIServer(
+        listener.getsockname()[:2], WSGIRequestHandler,
+        bind_and_activate=False, threads=threads, max_requests=max_requests,
+    )
+    server.use_socket(listener)
+    server.set_app(application)
+    hits.start_flusher()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *args: server.stop_soon())
+    code = 0
+    try:
+        server.serve_forever(poll_interval=0.5)
+        server.stop()
+        hits.flush_at_exit()
+    except Exception:
+        logger.exception('Рабочий процесс %s упал', os.getpid())
+        code = 1
+    finally:
+        connections.close_all()
+    os._exit(code)
+
+
+def exit_failure(status):
+    """Причина ошибочного завершения по статусу waitpid или None."""
+    if os.WIFSIGNALED(status):
+        return f'сигнал {os.WTERMSIG(status)}'
+    if os.WIFEXITED(status) and os.WEXITSTATUS(status):
+        return f'код {os.WEXITSTATUS(status)}'
+    return None
+
+
+class Arbiter:
+    """Главный процесс: держит workers рабочих и мягко их останавливает."""
+
+    def __init__(self, address, application, workers, threads,
+                 max_requests=0, max_requests_jitter=0, graceful_timeout=30,
+                 stdout=None):
+        self.address = address
+        self.application = application
+        self.workers = workers
+        self.threads = threads
+        self.max_requests = max_requests
+        self.max_requests_jitter = max_requests_jitter
+        self.graceful_timeout = graceful_timeout
+        self.stdout = stdout
+        self.children = set()
+        self.stopping = False
+
+    def log(self, message):
+        if self.stdout is not None:
+            self.stdout.write(message)
+
+    def listen(self):
+        host, port = self.address
+        family = socket.AF_INET6 if ':' in host else socket.AF_INET
+        listener = socket.socket(family, socket.SOCK_STREAM)
+        listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        listener.bind((host, port))
+        listener.listen(WSGIServer.request_queue_size * self.workers)
+        return listener
+
+    def spawn(self, listener):
+        max_requests = self.max_requests
+        if max_requests and self.max_requests_jitter:
+            max_requests += random.randint(0, self.max_requests_jitter)
+        pid = os.fork()
+        if pid == 0:
+            random.seed()
+            run_worker(listener, self.application, self.threads,
+                       max_requests)
+        self.children.add(pid)
+
+    def stop(self, *args):
+        self.stopping = True
+
+    def run(self):
+        metrics.reset()
+        listener = self.listen()
+        # Соединения с БД и потоки не должны переходить в рабочие.
+        connections.close_all()
+        gc.collect()
+        gc.freeze()
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        self.log(f'Сервер на {listener.getsockname()[0]}:'
+                 f'{listener.getsockname()[1]}: процессов {self.workers}, '
+                 f'потоков {self.threads}')
+        try:
+            while not self.stopping:
+                self.maintain(listener)
+                time.sleep(0.2)
+        finally:
+            listener.close()
+            self.shutdown()
+
+    def maintain(self, listener):
+        """Убирает завершившихся рабочих и запускает недостающих."""
+        self.reap()
+        while len(self.children) < self.workers:
+            self.spawn(listener)
+
+    def reap(self):
+        while self.children:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if pid == 0:
+                return
+            self.children.discard(pid)
+            metrics.fold(pid)
+            failure = exit_failure(status)
+            if not self.stopping and failure:
+                self.log(f'Рабочий процесс {pid} завершился с ошибкой: '
+                         f'{failure}')
+
+    def shutdown(self):
+        for pid in self.children:
+            os.kill(pid, signal.SIGTERM)
+        deadline = time.monotonic() + self.graceful_timeout
+        while self.children and time.monotonic() < deadline:
+            self.reap()
+            time.sleep(0.1)
+        for pid in self.children:
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+        self.log('Сервер остановлен')
@@ -0,0 +1,271 @@
+"""Server-Sent Events поверх журнала с монотонными id.
+
+Журнал читает один поток Broadcaster на процесс, пока есть
+подписчики, и раздаёт новые записи клиентам из памяти: клиент потока
+не держит соединения с БД. Под ASGI (core.asgi) клиент ждёт событий в
+цикле событий и не занимает поток пула. Под WSGI-серверами поток
+занят, поэтому ответ закрывается через SSE_MAX_DURATION секунд, и
+браузер переподключается сам, передав Last-Event-ID; страницы лент
+подключаются к потоку только под ASGI (is_async).
+"""
+import asyncio
+import bisect
+import json
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.http import StreamingHttpResponse
+
+logger = logging.getLogger(__name__)
+
+
+def format_event(data=None, event=None, id=None, retry=None, comment=None):
+    """Сообщение SSE в байтах; data сериализуется в JSON."""
+    lines = []
+    if comment is not None:
+        lines.append(f': {comment}')
+    if retry is not None:
+        lines.append(f'retry: {retry}')
+    if id is not None:
+        lines.append(f'id: {id}')
+    if event is not None:
+        lines.append(f'event: {event}')
+    if data is not None:
+        payload = json.dumps(data, ensure_ascii=False,
+                             separators=(',', ':'))
+        lines.extend(f'data: {line}' for line in payload.splitlines())
+    return ('\n'.join(lines) + '\n\n').encode()
+
+
+def is_async(request):
+    """Запрос пришёл через core.asgi: поток событий не займёт поток."""
+    return bool(request.META.get('core.asgi'))
+
+
+def release_connection():
+    """Закрывает соединение потока, если оно не в транзакции."""
+    if not connection.in_atomic_block:
+        connection.close()
+
+
+def wake(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class Broadcaster:
+    """Один читатель журнала на процесс и ждущие его клиенты.
+
+    fetch(after) возвращает до size записей с id больше after по
+    возрастанию id, head() — id последней записи журнала; оба
+    вызываются только из потока-читателя. В памяти лежат все записи с
+    id больше floor, но не больше size последних. floor задаёт сам
+    читатель по head(), а не курсор клиента: курсор приходит из
+    запроса и только сравнивается с ним.
+    """
+
+    def __init__(self, fetch, head, size=None, interval=None):
+        self.fetch = fetch
+        self.head = head
+        self.size = size or settings.SSE_BUFFER_SIZE
+        self.interval = interval or settings.SSE_POLL_INTERVAL
+        self.condition = threading.Condition()
+        self.events = []
+        self.ids = []
+        self.floor = None
+        self.clients = 0
+        self.waiters = []
+        self.thread = None
+
+    def latest(self):
+        return self.ids[-1] if self.ids else self.floor
+
+    def ready(self, cursor):
+        return self.floor is not None and self.latest() > cursor
+
+    def subscribe(self):
+        """Регистрирует клиента; первый запускает читателя."""
+        with self.condition:
+            self.clients += 1
+            if self.thread is None:
+                self.thread = threading.Thread(
+                    target=self.run, name='sse-reader', daemon=True)
+                self.thread.start()
+            else:
+                self.condition.notify_all()
+
+    def unsubscribe(self):
+        with self.condition:
+            self.clients -= 1
+
+    def since(self, cursor):
+        """Записи после cursor; None, если часть из них уже вытеснена."""
+        with self.condition:
+            if self.floor is None:
+                return []
+            if cursor < self.floor:
+                return None
+            return self.events[bisect.bisect_right(self.ids, cursor):]
+
+    def wait(self, cursor, timeout):
+        """Ждёт записи новее cursor; False по таймауту."""
+        with self.condition:
+            return self.condition.wait_for(
+                lambda: self.ready(cursor), timeout)
+
+    async def wait_async(self, cursor, timeout):
+        """wait() для цикла событий: ждёт без потока пула."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        waiter = (loop, future)
+        with self.condition:
+            if self.ready(cursor):
+                return True
+            self.waiters.append(waiter)
+        try:
+            await asyncio.wait_for(future, timeout)
+            return True
+        except asyncio.TimeoutError:
+            with self.condition:
+                if waiter in self.waiters:
+                    self.waiters.remove(waiter)
+            return False
+
+    def start_at_head(self):
+        """Начинает буфер с конца журнала: прошлое клиентам не нужно."""
+        head = self.head()
+        with self.condition:
+            if self.floor is None:
+                self.floor = head
+                self.wake_all()
+
+    def wake_all(self):
+        """Будит ждущих клиентов; вызывается под self.condition."""
+        self.condition.notify_all()
+        waiters, self.waiters = self.waiters, []
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(wake, future)
+
+    def poll(self):
+        """Дочитывает журнал; возвращает число новых записей."""
+        with self.condition:
+            after = self.latest()
+        if after is None:
+            return 0
+        events = self.fetch(after)
+        if not events:
+            return 0
+        with self.condition:
+            self.events.extend(events)
+            self.ids.extend(event.id for event in events)
+            overflow = len(self.events) - self.size
+            if overflow > 0:
+                self.floor = self.ids[overflow - 1]
+                del self.events[:overflow], self.ids[:overflow]
+            self.wake_all()
+        return len(events)
+
+    def run(self):
+        """Тело потока-читателя: опрос, пока есть клиенты."""
+        while True:
+            with self.condition:
+                if not self.clients:
+                    # Без клиентов соединение с БД не держится.
+                    connection.close()
+                    self.condition.wait_for(lambda: self.clients)
+            try:
+                if self.floor is None:
+                    self.start_at_head()
+                # Полная пачка — журнал ещё не дочитан.
+                while self.poll() == self.size:
+                    pass
+            except Exception:
+                logger.exception('Журнал для SSE не прочитан')
+                connection.close()
+            time.sleep(self.interval)
+
+
+class EventStream:
+    """Поток событий одного клиента.
+
+    render(events) превращает новые записи журнала в байты SSE (пустые,
+    если клиенту ничего из них не нужно). Итерируется синхронно под
+    WSGI и асинхронно под core.asgi.
+    """
+
+    def __init__(self, broadcaster, cursor, render, heartbeat=None,
+                 max_duration=None):
+        self.broadcaster = broadcaster
+        self.cursor = cursor
+        self.render = render
+        self.heartbeat = heartbeat or settings.SSE_HEARTBEAT
+        self.max_duration = max_duration or settings.SSE_MAX_DURATION
+
+    def start(self):
+        self.broadcaster.subscribe()
+        return format_event(retry=settings.SSE_RETRY, comment='stream')
+
+    def step(self):
+        """Байты для новых записей; None, если записи потеряны."""
+        events = self.broadcaster.since(self.cursor)
+        if events is None:
+            return None
+        if not events:
+            return b''
+        self.cursor = events[-1].id
+        return self.render(events)
+
+    def reset(self):
+        # Клиент отстал больше, чем помнит буфер: пусть перезагрузит
+        # страницу, а не ждёт неверного счёта.
+        return format_event(data={}, event='reset',
+                            id=self.broadcaster.latest())
+
+    def __iter__(self):
+        release_connection()
+        yield self.start()
+        deadline = time.monotonic() + self.max_duration
+        try:
+            while time.monotonic() < deadline:
+                if not self.broadcaster.wait(self.cursor, self.heartbeat):
+                    yield format_event(comment='ping')
+                    continue
+                chunk = self.step()
+                if chunk is None:
+                    yield self.reset()
+                    return
+                if chunk:
+                    yield chunk
+        finally:
+            self.broadcaster.unsubscribe()
+
+    async def __aiter__(self):
+        yield self.start()
+        try:
+            while True:
+                if not await self.broadcaster.wait_async(self.cursor,
+                                                         self.heartbeat):
+                    yield format_event(comment='ping')
+                    continue
+                chunk = self.step()
+                if chunk is None:
+                    yield self.reset()
+                    return
+                if chunk:
+                    yield chunk
+        finally:
+            self.broadcaster.unsubscribe()
+
+
+class EventStreamResponse(StreamingHttpResponse):
+    """Ответ text/event-stream; core.asgi отдаёт его без потока пула."""
+
+    def __init__(self, stream):
+        super().__init__(stream, content_type='text/event-stream')
+        self.event_stream = stream
+        self['Cache-Control'] = 'no-cache'
+        # Прокси не должен копить поток в буфере.
+        self['X-Accel-Buffering'] = 'no'
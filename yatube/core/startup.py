@@ -0,0 +1,166 @@
+"""Время запуска процесса: импорт приложений, ready() и первый запрос.
+
+Замер идёт в отдельном чистом интерпретаторе (probe), иначе модули
+уже загружены. Настройки у него те же, что у вызвавшего процесса, но
+БД — временная копия, а метрики, кэш, медиафайлы и профили — во
+временном каталоге: замер ничего не меняет. Модуль не импортирует
+Django на верхнем уровне.
+
+Django 2.2 импортирует distutils.version при запуске. Если setuptools
+подменяет distutils своей копией, за ней загружаются весь setuptools и
+pkg_resources — около 200 мс на каждый запуск процесса. Подмену
+отключает переменная окружения SETUPTOOLS_USE_DISTUTILS=stdlib: её
+читает сам setuptools при старте интерпретатора, поэтому задавать её
+нужно в окружении сервиса, а не в коде. Отчёт показывает, загружен ли
+setuptools к приходу первого запроса.
+"""
+import sys
+import time
+
+# Модули, которые не нужны до первой миниатюры или загрузки картинки.
+LAZY_MODULES = ('PIL.Image', 'sorl.thumbnail.engines.pil_engine')
+# Переменная окружения с настройками, которые probe подменяет.
+OVERRIDES_VARIABLE = 'YATUBE_STARTUP_OVERRIDES'
+
+
+def probe(path):
+    """Тело замера в дочернем процессе; печатает JSON в stdout."""
+    started = time.perf_counter()
+    import json
+    import os
+    from django.apps.config import AppConfig
+    from django.conf import settings
+
+    for name, value in json.loads(
+            os.environ.get(OVERRIDES_VARIABLE, '{}')).items():
+        setattr(settings, name, value)
+
+    timings = {'import': {}, 'models': {}, 'ready': {}}
+    create = AppConfig.create.__func__
+    import_models = AppConfig.import_models
+
+    def timed(kind, label, function, *args):
+        begin = time.perf_counter()
+        result = function(*args)
+        timings[kind][label] = time.perf_counter() - begin
+        return result
+
+    def timed_create(cls, entry):
+        config = timed('import', entry, create, cls, entry)
+        ready = config.ready
+        config.ready = lambda: timed('ready', config.label, ready)
+        return config
+
+    AppConfig.create = classmethod(timed_create)
+    AppConfig.import_models = (
+        lambda self: timed('models', self.label, import_models, self))
+
+    from yatube.wsgi import application
+    loaded = time.perf_counter() - started
+    setuptools_loaded = 'setuptools' in sys.modules
+    lazy_loaded = [name for name in LAZY_MODULES if name in sys.modules]
+
+    from wsgiref.util import setup_testing_defaults
+    environ = {'PATH_INFO': path}
+    setup_testing_defaults(environ)
+    statuses = []
+    response = application(
+        environ, lambda status, headers, exc_info=None:
+        statuses.append(status))
+    b''.join(response)
+    response.close()
+    json.dump({
+        'apps': timings,
+        'wsgi_loaded': loaded,
+        'first_request': time.perf_counter() - started,
+        'status': statuses[0],
+        'lazy_loaded_at_start': lazy_loaded,
+        'setuptools_loaded': setuptools_loaded,
+        'database': settings.DATABASES['default']['NAME'],
+        'lazy_loaded_after_request': [
+            name for name in LAZY_MODULES if name in sys.modules],
+    }, sys.stdout)
+
+
+def parse_importtime(stderr, limit=15):
+    """Самые долгие импорты верхнего уровня из вывода -X importtime."""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        _, cumulative, name = line.split('|')
+        # Вложенные импорты сдвинуты пробелами вправо.
+        if name.startswith('  ') or not cumulative.strip().isdigit():
+            continue
+        modules.append((int(cumulative) / 10**6, name.strip()))
+    return sorted(modules, reverse=True)[:limit]
+
+
+def isolated_overrides(directory, database):
+    """Настройки probe: копия БД database и каталоги внутри directory."""
+    import os
+    import sqlite3
+
+    from django.conf import settings
+    from django.core.cache.backends.filebased import FileBasedCache
+    from django.utils.module_loading import import_string
+
+    if not os.path.exists(database):
+        raise RuntimeError(f'Нет БД {database}: сначала migrate')
+    copy = os.path.join(directory, 'db.sqlite3')
+    source = sqlite3.connect(f'file:{database}?mode=ro', uri=True)
+    target = sqlite3.connect(copy)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+    caches = {}
+    for alias, config in settings.CACHES.items():
+        if issubclass(import_string(config['BACKEND']), FileBasedCache):
+            config = {**config,
+                      'LOCATION': os.path.join(directory, f'cache-{alias}')}
+        caches[alias] = {name: value for name, value in config.items()
+                         if not callable(value)}
+    return {
+        'DATABASES': {**settings.DATABASES, 'default': {
+            **settings.DATABASES['default'], 'NAME': copy}},
+        'CACHES': caches,
+        **{name: os.path.join(directory, name.lower())
+           for name in ('MEDIA_ROOT', 'METRICS_DIR', 'PROFILING_DIR',
+                        'EMAIL_FILE_PATH')},
+    }
+
+
+def measure(path='/', database=None):
+    """Запускает probe в новом процессе и возвращает его отчёт.
+
+    database — файл SQLite, копию которого получит probe; по умолчанию
+    БД из настроек.
+    """
+    import json
+    import os
+    import shutil
+    import subprocess
+    import tempfile
+
+    from django.conf import settings
+
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    directory = tempfile.mkdtemp(prefix='yatube-startup-')
+    try:
+        overrides = isolated_overrides(
+            directory, database or settings.DATABASES['default']['NAME'])
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c',
+             f'from core.startup import probe; probe({path!r})'],
+            cwd=base_dir, capture_output=True, text=True,
+            env={**os.environ, OVERRIDES_VARIABLE: json.dumps(overrides)},
+        )
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    if result.returncode:
+        raise RuntimeError(result.stderr[-2000:])
+    report = json.loads(result.stdout)
+    report['imports'] = parse_importtime(result.stderr)
+    return report
@@ -0,0 +1,69 @@
+import threading
+from urllib.parse import urljoin
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import Storage
+from django.utils import timezone
+from django.utils.deconstruct import deconstructible
+from django.utils.encoding import filepath_to_uri
+
+
+@deconstructible
+class InMemoryStorage(Storage):
+    """Хранилище файлов в памяти процесса — для тестов.
+
+    Содержимое общее для всех экземпляров, поэтому картинки поста и
+    миниатюры sorl-thumbnail видны друг другу без записи на диск.
+    """
+    _files = {}
+    _lock = threading.Lock()
+
+    def _open(self, name, mode='rb'):
+        content, _ = self._files[name]
+        return ContentFile(content, name=name)
+
+    def _save(self, name, content):
+        content.seek(0)
+        data = content.read()
+        if isinstance(data, str):
+            data = data.encode()
+        with self._lock:
+            self._files[name] = (data, timezone.now())
+        return name
+
+    def delete(self, name):
+        with self._lock:
+            self._files.pop(name, None)
+
+    def exists(self, name):
+        return name in self._files
+
+    def listdir(self, path):
+        prefix = path.rstrip('/') + '/' if path else ''
+        directories, files = set(), set()
+        for name in list(self._files):
+            if not name.startswith(prefix):
+                continue
+            head, _, tail = name[len(prefix):].partition('/')
+            if tail:
+                directories.add(head)
+            else:
+                files.add(head)
+        return sorted(directories), sorted(files)
+
+    def size(self, name):
+        return len(self._files[name][0])
+
+    def url(self, name):
+        return urljoin(settings.MEDIA_URL, filepath_to_uri(name))
+
+    def get_modified_time(self, name):
+        return self._files[name][1]
+
+    get_created_time = get_accessed_time = get_modified_time
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._files.clear()
@@ -1,7 +1,968 @@
-from django.test import TestCase
+import asyncio
+import os
+import shutil
+import signal
+import tempfile
+import threading
+import time
+import types
+from collections import namedtuple
+from functools import partial
+from io import StringIO
+from unittest import mock
+from urllib.request import urlopen
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache, caches
+from django.core.files.base import ContentFile
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.servers.basehttp import WSGIRequestHandler
+from django.core.files.storage import default_storage
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
+from django.core.management.base import OutputWrapper
+from django.db import connections, transaction
+from django.test import (RequestFactory, SimpleTestCase, TestCase,
+                         override_settings)
+from django.urls import reverse
+
+from django.utils import timezone
+
+from posts import search
+from . import (metrics, outbox, profiling, query_budget, ratelimit, server,
+               sse, startup, testing)
+from .asgi import ASGIHandler, build_environ, read_body
+from .models import OutboxMessage
+from .paginator import CachedCountPaginator
+from .storage import InMemoryStorage
+from .testing import migrations_signature
 
 
 class ViewTestClass(TestCase):
     def test_error_page(self):
         response = self.client.get('/nonexist-page/')
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+class TestInfrastructureTest(SimpleTestCase):
+    def tearDown(self):
+        InMemoryStorage.clear()
+
+    def test_media_in_memory(self):
+        """Тесты пишут файлы в память, а не на диск"""
+        self.assertIsInstance(default_storage, InMemoryStorage)
+        name = default_storage.save('posts/a.txt', ContentFile(b'abc'))
+        self.assertEqual(default_storage.open(name).read(), b'abc')
+        self.assertEqual(default_storage.listdir('posts'), ([], ['a.txt']))
+        self.assertNotEqual(
+            default_storage.save('posts/a.txt', ContentFile(b'')), name)
+
+    def test_signature_is_stable(self):
+        """Ключ шаблона БД не меняется без изменения миграций"""
+        self.assertEqual(migrations_signature(), migrations_signature())
+
+    def test_signature_covers_post_migrate_sql(self):
+        """Правка SQL обработчика post_migrate меняет ключ шаблона БД"""
+        self.assertIn(search, testing.post_migrate_modules())
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        module = types.ModuleType('schema')
+        module.__file__ = os.path.join(directory, 'schema.py')
+        signatures = []
+        with mock.patch.object(testing, 'post_migrate_modules',
+                               return_value=[module]):
+            for trigger in ('AFTER INSERT', 'AFTER UPDATE'):
+                with open(module.__file__, 'w') as file:
+                    file.write(f'TRIGGER = "{trigger}"')
+                signatures.append(migrations_signature())
+        self.assertNotEqual(*signatures)
+
+
+class QueryBudgetTest(TestCase):
+    """Число запросов на каждый URL; бюджет — core/query_budget.json.
+
+    После намеренного изменения запросов бюджет обновляется командой
+    `python manage.py update_query_budget`.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.results = query_budget.measure_sizes()
+        cls.budget = query_budget.load_baseline()
+
+    def test_no_queries_per_object(self):
+        """Число запросов не растёт с объёмом данных"""
+        small, large = (self.results[size] for size in query_budget.SIZES)
+        for route, count in large.items():
+            with self.subTest(route=route):
+                self.assertEqual(count, small[route])
+
+    def test_within_budget(self):
+        """Каждый URL укладывается в свой бюджет запросов"""
+        for route, count in self.results[query_budget.SIZES[-1]].items():
+            with self.subTest(route=route):
+                self.assertIn(route, self.budget,
+                              'Нет бюджета: update_query_budget')
+                self.assertLessEqual(count, self.budget[route])
+
+
+class ProfilingTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.staff = User.objects.create_user('staff', is_staff=True)
+        cls.user = User.objects.create_user('user')
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.settings = override_settings(PROFILING_DIR=self.directory,
+                                          PROFILING_SAMPLE_RATE=0)
+        self.settings.enable()
+        self.client.force_login(self.staff)
+
+    def tearDown(self):
+        self.settings.disable()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def profile(self, url='/about/tech/'):
+        response = self.client.get(url, HTTP_X_PROFILE='1')
+        return response['X-Profile-Name']
+
+    def test_staff_request_is_profiled(self):
+        """Заголовок или ?profile от сотрудника сохраняет профиль"""
+        name = self.profile(reverse('posts:trending'))
+        self.client.get('/about/author/?profile')
+        self.assertEqual(len(profiling.list_profiles()), 2)
+        self.assertIn('render', profiling.report(
+            profiling.profile_path(name)))
+
+    def test_others_are_not_profiled(self):
+        """Обычные пользователи профиль не включают"""
+        self.client.force_login(self.user)
+        response = self.client.get('/', HTTP_X_PROFILE='1')
+        self.assertNotIn('X-Profile-Name', response)
+        self.assertEqual(profiling.list_profiles(), [])
+
+    @override_settings(PROFILING_SAMPLE_RATE=1)
+    def test_sampling(self):
+        """Запросы из выборки профилируются и без просьбы"""
+        self.client.logout()
+        self.assertIn('X-Profile-Name', self.client.get('/about/tech/'))
+
+    @override_settings(PROFILING_MAX_FILES=2)
+    def test_old_profiles_removed(self):
+        """Хранится не больше PROFILING_MAX_FILES профилей"""
+        names = [self.profile() for _ in range(3)]
+        self.assertEqual(
+            [item['name'] for item in profiling.list_profiles()],
+            names[:0:-1])
+
+    def test_admin_pages(self):
+        """Список, просмотр, скачивание и сравнение профилей"""
+        old, new = self.profile(), self.profile('/about/author/')
+        pages = (
+            reverse('core:profile_list'),
+            reverse('core:profile_detail', args=[old]) + '?sort=tottime',
+            reverse('core:profile_diff') + f'?old={old}&new={new}',
+        )
+        for url in pages:
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 200)
+        response = self.client.get(
+            reverse('core:profile_download', args=[old]))
+        self.assertEqual(b''.join(response.streaming_content),
+                         open(os.path.join(self.directory, old),
+                              'rb').read())
+
+    def test_admin_pages_staff_only(self):
+        """Страницы профилей доступны только сотрудникам"""
+        name = self.profile()
+        self.client.force_login(self.user)
+        response = self.client.get(
+            reverse('core:profile_download', args=[name]))
+        self.assertEqual(response.status_code, 302)
+
+    def test_unknown_profile(self):
+        """Чужие пути и несуществующие профили — 404"""
+        for name in ('missing.prof', '..settings.py'):
+            with self.subTest(name=name):
+                response = self.client.get(
+                    reverse('core:profile_detail', args=[name]))
+                self.assertEqual(response.status_code, 404)
+
+
+def child_increments():
+    metrics.CACHE_REQUESTS.inc(2, cache='page', result='hit')
+    metrics.QUEUE_DEPTH.set(5, queue='post_views')
+
+
+class MetricsTest(TestCase):
+    def setUp(self):
+        # Свой каталог: параллельные процессы тестов пишут метрики тоже.
+        self.directory = tempfile.mkdtemp()
+        self.settings = override_settings(METRICS_DIR=self.directory)
+        self.settings.enable()
+
+    def tearDown(self):
+        self.settings.disable()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def sample(self, line):
+        return [row for row in metrics.exposition().splitlines()
+                if row.startswith(line)]
+
+    def test_store_survives_reopen_and_growth(self):
+        """Значения переживают расширение и повторное открытие файла"""
+        path = os.path.join(settings.METRICS_DIR, 'counter_1.db')
+        values = metrics.MmapedDict(path)
+        for i in range(3000):
+            values.add(f'key-{i}', i)
+        values.add('key-1', 0.5)
+        reopened = metrics.MmapedDict(path)
+        entries = {key: value for key, value, _
+                   in metrics.read_entries(reopened._map)}
+        self.assertEqual(len(entries), 3000)
+        self.assertEqual(entries['key-1'], 1.5)
+        self.assertEqual(entries['key-2999'], 2999)
+
+    def test_processes_aggregate(self):
+        """Счётчики процессов складываются, показатели — только живых"""
+        metrics.CACHE_REQUESTS.inc(cache='page', result='hit')
+        metrics.QUEUE_DEPTH.set(1, queue='post_views')
+        pid = os.fork()
+        if pid == 0:
+            try:
+                child_increments()
+            finally:
+                os._exit(0)
+        os.waitpid(pid, 0)
+        self.assertEqual(
+            self.sample('yatube_cache_requests_total{'),
+            ['yatube_cache_requests_total{cache="page",result="hit"} 3.0'])
+        self.assertEqual(self.sample('yatube_queue_depth{'),
+                         ['yatube_queue_depth{queue="post_views"} 1.0'])
+
+    def test_exited_processes_folded(self):
+        """Счётчики убранных рабочих — в одном файле, их файлы удалены"""
+        metrics.CACHE_REQUESTS.inc(cache='page', result='hit')
+        for _ in range(2):
+            pid = os.fork()
+            if pid == 0:
+                try:
+                    child_increments()
+                finally:
+                    os._exit(0)
+            os.waitpid(pid, 0)
+            metrics.fold(pid)
+        self.assertEqual(
+            self.sample('yatube_cache_requests_total{'),
+            ['yatube_cache_requests_total{cache="page",result="hit"} 5.0'])
+        self.assertCountEqual(
+            [name for name in os.listdir(self.directory)
+             if name.endswith('.db')],
+            ['counter_exited.db', f'counter_{os.getpid()}.db'])
+
+    def test_requests_measured(self):
+        """Время, запросы к БД и кэш страниц учитываются по представлению"""
+        cache.clear()
+        for _ in range(2):
+            self.client.get(reverse('posts:index'))
+        self.assertEqual(
+            self.sample('yatube_request_duration_seconds_count{'),
+            ['yatube_request_duration_seconds_count{view="posts:index"} '
+             '2.0'])
+        self.assertTrue(self.sample(
+            'yatube_request_queries_bucket{le="+Inf",view="posts:index"} '
+            '2.0'))
+        self.assertEqual(self.sample('yatube_cache_requests_total{'), [
+            'yatube_cache_requests_total{cache="page",result="hit"} 1.0',
+            'yatube_cache_requests_total{cache="page",result="miss"} 1.0',
+        ])
+
+    def test_histogram_buckets_are_cumulative(self):
+        """Корзины гистограммы накопительные, с суммой и числом"""
+        metrics.THUMBNAIL_LATENCY.observe(0.02)
+        metrics.THUMBNAIL_LATENCY.observe(3)
+        buckets = dict(
+            row.rsplit(' ', 1) for row in self.sample(
+                'yatube_thumbnail_duration_seconds_bucket'))
+        self.assertEqual(
+            buckets['yatube_thumbnail_duration_seconds_bucket{le="0.025"}'],
+            '1.0')
+        self.assertEqual(
+            buckets['yatube_thumbnail_duration_seconds_bucket{le="+Inf"}'],
+            '2.0')
+        self.assertEqual(
+            self.sample('yatube_thumbnail_duration_seconds_sum'),
+            ['yatube_thumbnail_duration_seconds_sum 3.02'])
+
+    def test_endpoint_access(self):
+        """/metrics открыт по токену и сотрудникам, но не по адресу"""
+        url = reverse('metrics')
+        self.assertEqual(self.client.get(url).status_code, 403)
+        with override_settings(METRICS_TOKEN='secret'):
+            response = self.client.get(url,
+                                       HTTP_AUTHORIZATION='Bearer secret')
+            self.assertEqual(response.status_code, 200)
+            self.assertIn(
+                b'# TYPE yatube_request_duration_seconds histogram',
+                response.content)
+            for header in ('Bearer wrong', 'Basic secret', 'secret'):
+                with self.subTest(header=header):
+                    self.assertEqual(self.client.get(
+                        url, HTTP_AUTHORIZATION=header).status_code, 403)
+        self.assertEqual(self.client.get(
+            url, HTTP_AUTHORIZATION='Bearer ').status_code, 403)
+        self.client.force_login(
+            get_user_model().objects.create_user('staff', is_staff=True))
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+
+class ASGITest(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.application = ASGIHandler(WSGIHandler(), max_workers=2)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.application.executor.shutdown()
+        super().tearDownClass()
+
+    def call(self, scope, messages, application=None):
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        asyncio.run((application or self.application)(scope, receive, send))
+        return sent
+
+    def request(self, path):
+        scope = {'type': 'http', 'method': 'GET', 'path': path,
+                 'query_string': b'', 'headers': [],
+                 'client': ('127.0.0.1', 5000)}
+        return self.call(scope, [{'type': 'http.request'}])
+
+    def test_page(self):
+        """Страница отдаётся через ASGI с заголовками ответа"""
+        start, body = self.request(reverse('about:tech'))
+        self.assertEqual(start['status'], 200)
+        self.assertIn((b'content-type', b'text/html; charset=utf-8'),
+                      start['headers'])
+        self.assertIn('Технологии'.encode(), body['body'])
+
+    def test_body_in_chunks(self):
+        """Тело запроса собирается из нескольких сообщений"""
+        messages = [
+            {'type': 'http.request', 'body': b'a=1', 'more_body': True},
+            {'type': 'http.request', 'body': b'&b=2'},
+        ]
+
+        async def receive():
+            return messages.pop(0)
+
+        body = asyncio.run(read_body(receive))
+        self.assertEqual(body.read(), b'a=1&b=2')
+
+    def test_disconnect_before_body(self):
+        """Отключившийся клиент не занимает поток пула"""
+        scope = {'type': 'http', 'method': 'POST', 'path': '/'}
+        self.assertEqual(
+            self.call(scope, [{'type': 'http.disconnect'}]), [])
+
+    def test_environ(self):
+        """Путь, строка запроса, заголовки и тело попадают в environ"""
+        environ = build_environ({
+            'method': 'POST', 'path': '/group/тест/',
+            'query_string': b'page=2',
+            'headers': [(b'content-type', b'text/plain'),
+                        (b'x-profile', b'1'), (b'x-profile', b'2')],
+        }, 'body')
+        self.assertEqual(environ['PATH_INFO'],
+                         '/group/тест/'.encode().decode('latin1'))
+        self.assertEqual(environ['QUERY_STRING'], 'page=2')
+        self.assertEqual(environ['CONTENT_TYPE'], 'text/plain')
+        self.assertEqual(environ['HTTP_X_PROFILE'], '1,2')
+        self.assertEqual(environ['wsgi.input'], 'body')
+        self.assertTrue(environ['core.asgi'])
+
+    def test_event_stream(self):
+        """Поток событий идёт из цикла событий до отключения клиента"""
+        class Stream:
+            closed = False
+
+            def __iter__(self):
+                return iter(())
+
+            async def __aiter__(self):
+                try:
+                    yield b'a'
+                    yield b'b'
+                    await asyncio.sleep(10)
+                finally:
+                    Stream.closed = True
+
+        def wsgi_application(environ, start_response):
+            response = sse.EventStreamResponse(Stream())
+            start_response('200 OK', list(response.items()))
+            return response
+
+        application = ASGIHandler(wsgi_application, max_workers=1)
+        messages = [{'type': 'http.request'}]
+        sent = []
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            await asyncio.sleep(0.05)
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            sent.append(message)
+
+        asyncio.run(application({'type': 'http', 'method': 'GET',
+                                 'path': '/'}, receive, send))
+        application.executor.shutdown()
+        self.assertIn((b'content-type', b'text/event-stream'),
+                      sent[0]['headers'])
+        self.assertEqual([message['body'] for message in sent[1:]],
+                         [b'a', b'b'])
+        self.assertTrue(Stream.closed)
+
+    def test_lifespan(self):
+        """Сервер получает подтверждение запуска и остановки"""
+        application = ASGIHandler(WSGIHandler(), max_workers=1)
+        sent = self.call({'type': 'lifespan'}, [
+            {'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}],
+            application)
+        self.assertEqual([message['type'] for message in sent], [
+            'lifespan.startup.complete', 'lifespan.shutdown.complete'])
+
+
+Event = namedtuple('Event', 'id')
+
+
+class QuietBroadcaster(sse.Broadcaster):
+    """Broadcaster без потока-читателя: тест сам вызывает poll()."""
+
+    def __init__(self, ids, size=3, head=0):
+        self.log = list(ids)
+        super().__init__(self.read, lambda: head, size=size, interval=0.01)
+        self.thread = threading.current_thread()
+
+    def read(self, after):
+        return [Event(id) for id in self.log if id > after][:self.size]
+
+
+class SSETest(SimpleTestCase):
+    def test_format_event(self):
+        """Сообщение SSE: поля по строкам и пустая строка в конце"""
+        self.assertEqual(
+            sse.format_event({'count': 2}, event='posts', id=7),
+            b'id: 7\nevent: posts\ndata: {"count":2}\n\n')
+        self.assertEqual(sse.format_event(comment='ping'), b': ping\n\n')
+
+    def test_buffer(self):
+        """Буфер помнит size последних записей и замечает отставших"""
+        broadcaster = QuietBroadcaster([1, 2, 3, 4, 5])
+        broadcaster.subscribe()
+        self.assertEqual(broadcaster.poll(), 0)
+        broadcaster.start_at_head()
+        self.assertEqual(broadcaster.poll(), 3)
+        self.assertEqual(broadcaster.poll(), 2)
+        self.assertEqual(broadcaster.poll(), 0)
+        self.assertEqual([event.id for event in broadcaster.since(2)],
+                         [3, 4, 5])
+        self.assertEqual(broadcaster.since(5), [])
+        self.assertIsNone(broadcaster.since(1))
+        self.assertTrue(broadcaster.wait(4, 0))
+        self.assertFalse(broadcaster.wait(5, 0))
+
+    def test_stream(self):
+        """Поток отдаёт новые записи, пинг по таймауту и сброс отставшим"""
+        broadcaster = QuietBroadcaster([1, 2])
+        rendered = []
+
+        def render(events):
+            rendered.append([event.id for event in events])
+            return sse.format_event(id=events[-1].id)
+
+        stream = sse.EventStream(broadcaster, 0, render, heartbeat=0.01,
+                                 max_duration=1)
+        chunks = iter(stream)
+        self.assertIn(b'retry: ', next(chunks))
+        self.assertEqual(broadcaster.clients, 1)
+        self.assertEqual(next(chunks), b': ping\n\n')
+        broadcaster.start_at_head()
+        broadcaster.poll()
+        self.assertEqual(next(chunks), b'id: 2\n\n')
+        broadcaster.log += [3, 4, 5, 6]
+        broadcaster.poll()
+        broadcaster.poll()
+        self.assertIn(b'event: reset', next(chunks))
+        self.assertEqual(list(chunks), [])
+        self.assertEqual(rendered, [[1, 2]])
+        self.assertEqual(broadcaster.clients, 0)
+
+    def test_wait_async(self):
+        """Асинхронный клиент просыпается от poll() из другого потока"""
+        broadcaster = QuietBroadcaster([1])
+
+        async def wait():
+            waiting = asyncio.ensure_future(broadcaster.wait_async(0, 5))
+            await asyncio.sleep(0)
+            threading.Thread(target=broadcaster.poll).start()
+            return await waiting, await broadcaster.wait_async(1, 0.01)
+
+        broadcaster.subscribe()
+        broadcaster.start_at_head()
+        self.assertEqual(asyncio.run(wait()), (True, False))
+        self.assertEqual(broadcaster.waiters, [])
+
+    def test_client_cursor_not_floor(self):
+        """Курсор клиента не сдвигает начало буфера, его задаёт журнал"""
+        broadcaster = QuietBroadcaster([1, 2, 3], head=2)
+        for cursor in (10 ** 9, 0):
+            stream = sse.EventStream(broadcaster, cursor, None)
+            stream.start()
+            self.assertEqual(stream.step(), b'')
+        broadcaster.start_at_head()
+        self.assertEqual(broadcaster.poll(), 1)
+        self.assertEqual([event.id for event in broadcaster.since(2)], [3])
+        self.assertEqual(broadcaster.since(10 ** 9), [])
+        # Клиент старше начала буфера получает сброс, а не всю историю.
+        self.assertIsNone(broadcaster.since(0))
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class ServerTest(SimpleTestCase):
+    def test_preload_templates(self):
+        """Предзагрузка компилирует шаблоны проекта"""
+        application, templates = server.preload()
+        self.assertIsInstance(application, WSGIHandler)
+        self.assertGreater(templates, 10)
+
+    def test_worker_recycled_after_max_requests(self):
+        """После max_requests запросов рабочий перестаёт их принимать"""
+        httpd = server.PooledWSGIServer(
+            ('127.0.0.1', 0), QuietRequestHandler, threads=2,
+            max_requests=3)
+        httpd.set_app(WSGIHandler())
+        thread = threading.Thread(target=httpd.serve_forever,
+                                  kwargs={'poll_interval': 0.05})
+        thread.start()
+        url = f'http://127.0.0.1:{httpd.server_port}{reverse("about:tech")}'
+        try:
+            for _ in range(3):
+                with urlopen(url, timeout=5) as response:
+                    self.assertEqual(response.status, 200)
+            thread.join(timeout=5)
+            self.assertFalse(thread.is_alive())
+        finally:
+            if thread.is_alive():
+                httpd.shutdown()
+            httpd.stop()
+            httpd.server_close()
+
+    def test_reap_and_respawn(self):
+        """Завершившиеся рабочие убираются и заменяются, сбои — в журнале"""
+        stdout = StringIO()
+        arbiter = server.Arbiter(('127.0.0.1', 0), None, workers=2,
+                                 threads=1, stdout=OutputWrapper(stdout))
+        spawned = []
+        spawn = arbiter.spawn
+
+        def counted_spawn(listener):
+            spawned.append(listener)
+            spawn(listener)
+
+        def worker(*args):
+            # Первый рабочий падает с кодом, второй — от сигнала,
+            # остальные завершаются штатно.
+            if len(spawned) == 1:
+                os._exit(3)
+            if len(spawned) == 2:
+                os.kill(os.getpid(), signal.SIGKILL)
+            os._exit(0)
+
+        arbiter.spawn = counted_spawn
+        deadline = time.monotonic() + 10
+        with mock.patch.object(server, 'run_worker', worker), \
+                mock.patch.object(metrics, 'fold') as fold:
+            while len(spawned) < 4 and time.monotonic() < deadline:
+                arbiter.maintain(None)
+                time.sleep(0.01)
+            arbiter.stopping = True
+            while arbiter.children and time.monotonic() < deadline:
+                arbiter.reap()
+                time.sleep(0.01)
+        self.assertGreaterEqual(len(spawned), 4)
+        self.assertEqual(arbiter.children, set())
+        self.assertEqual(fold.call_count, len(spawned))
+        self.assertCountEqual(
+            [line.rsplit(': ', 1)[1]
+             for line in stdout.getvalue().splitlines()],
+            ['код 3', f'сигнал {signal.SIGKILL}'])
+
+
+class StartupTest(SimpleTestCase):
+    def test_cold_start(self):
+        """Pillow и движок миниатюр не загружаются до первой миниатюры"""
+        template = testing.template_path(connections['default'])
+        modified = os.stat(template).st_mtime_ns
+        report = startup.measure(reverse('about:tech'), database=template)
+        self.assertEqual(report['status'], '200 OK')
+        # Замер шёл на копии, которой уже нет, а шаблон не тронут.
+        self.assertFalse(os.path.exists(report['database']))
+        self.assertEqual(os.stat(template).st_mtime_ns, modified)
+        self.assertEqual(report['lazy_loaded_at_start'], [])
+        self.assertEqual(report['lazy_loaded_after_request'], [])
+        self.assertIsInstance(report['setuptools_loaded'], bool)
+        self.assertIn('posts', report['apps']['ready'])
+        self.assertTrue(report['imports'])
+
+
+@override_settings(RATELIMIT_ENABLED=True, RATELIMITS={
+    'posts:add_comment': ('2/m', ('POST',)),
+    'users:login': ('1/h', ('POST',)),
+})
+class RateLimitTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        from posts.models import Post
+
+        User = get_user_model()
+        cls.user = User.objects.create_user('writer')
+        cls.other = User.objects.create_user('other')
+        cls.post = Post.objects.create(author=cls.user, text='Пост')
+
+    def setUp(self):
+        cache.clear()
+        caches[settings.RATELIMIT_CACHE].clear()
+        self.url = reverse('posts:add_comment', args=[self.post.pk])
+
+    def comment(self, user):
+        self.client.force_login(user)
+        return self.client.post(self.url, {'text': 'Комментарий'})
+
+    def test_limit_per_user(self):
+        """После исчерпания лимита — 429 с Retry-After, другим можно"""
+        for _ in range(2):
+            self.assertEqual(self.comment(self.user).status_code, 302)
+        response = self.comment(self.user)
+        self.assertEqual(response.status_code, 429)
+        self.assertIn(int(response['Retry-After']), range(1, 121))
+        self.assertTemplateUsed(response, 'core/429.html')
+        self.assertEqual(self.comment(self.other).status_code, 302)
+
+    def test_limit_per_ip_for_anonymous(self):
+        """Анонимы ограничены по IP-адресу"""
+        url = reverse('users:login')
+        data = {'username': 'writer', 'password': 'wrong'}
+        self.assertEqual(self.client.post(url, data).status_code, 200)
+        self.assertEqual(self.client.post(url, data).status_code, 429)
+        self.assertEqual(self.client.post(
+            url, data, REMOTE_ADDR='10.0.0.2').status_code, 200)
+
+    def test_forwarded_for_only_from_trusted_proxy(self):
+        """X-Forwarded-For читается, только если его прислал свой прокси"""
+        request = RequestFactory().get(
+            '/', REMOTE_ADDR='127.0.0.1',
+            HTTP_X_FORWARDED_FOR='6.6.6.6, 10.0.0.5, 127.0.0.1')
+        self.assertEqual(ratelimit.client_ip(request), '127.0.0.1')
+        with override_settings(TRUSTED_PROXIES=('127.0.0.1',)):
+            self.assertEqual(ratelimit.client_ip(request), '10.0.0.5')
+            request.META['REMOTE_ADDR'] = '10.0.0.9'
+            self.assertEqual(ratelimit.client_ip(request), '10.0.0.9')
+
+    def test_safe_methods_not_limited(self):
+        """Методы вне настройки лимит не расходуют"""
+        self.client.force_login(self.user)
+        for _ in range(3):
+            self.client.get(self.url)
+        self.assertEqual(self.comment(self.user).status_code, 302)
+
+    def test_sliding_window(self):
+        """Прошлое окно учитывается долей, что ещё входит в период"""
+        start = 60 * 1000
+        consume = partial(ratelimit.consume, 'window', '2/m')
+        self.assertEqual([consume(start), consume(start)], [0, 0])
+        # Отклонённый запрос лимит не расходует.
+        self.assertEqual(consume(start + 10), 80)
+        self.assertEqual(consume(start + 10), 80)
+        # Через окно прошлые два весят 2 · (1 - 30/60) = 1.
+        self.assertEqual(consume(start + 90), 0)
+        self.assertEqual(consume(start + 90), 30)
+        self.assertEqual(consume(start + 120), 0)
+
+    def test_shared_between_processes(self):
+        """Счётчик общий для процессов и не теряет параллельных запросов"""
+        now = time.time()
+        children = []
+        for _ in range(4):
+            read, write = os.pipe()
+            pid = os.fork()
+            if pid == 0:
+                # Дочерний процесс не должен вернуться в прогон тестов.
+                try:
+                    allowed = sum(
+                        not ratelimit.consume('shared', '10/h', now)
+                        for _ in range(5))
+                    os.write(write, bytes([allowed]))
+                finally:
+                    os._exit(0)
+            os.close(write)
+            children.append((pid, read))
+        allowed = 0
+        for pid, read in children:
+            os.waitpid(pid, 0)
+            allowed += os.read(read, 1)[0]
+            os.close(read)
+        self.assertEqual(allowed, 10)
+        self.assertTrue(ratelimit.consume('shared', '10/h', now))
+
+    def test_fails_open(self):
+        """Недоступный кэш не превращает запрос в ошибку"""
+        with mock.patch.object(caches[settings.RATELIMIT_CACHE], 'incr',
+                               side_effect=OSError('нет места')):
+            with self.assertLogs('core.ratelimit', 'WARNING'):
+                self.assertEqual(
+                    ratelimit.consume('broken', '1/m', 1000.0), 0)
+
+    def test_parse_rate(self):
+        """Ограничение задаётся как N/период"""
+        self.assertEqual(ratelimit.parse_rate('5/10m'), (5, 600))
+        self.assertEqual(ratelimit.parse_rate('20/h'), (20, 3600))
+        with self.assertRaises(ValueError):
+            ratelimit.parse_rate('5 per minute')
+
+    def test_overhead_benchmark(self):
+        """Замер проверки лимита видит и пропущенные, и отклонённые"""
+        stdout = StringIO()
+        call_command('benchmark_ratelimit', requests=300, stdout=stdout)
+        rows = [line.split()[0] for line in stdout.getvalue().splitlines()]
+        self.assertEqual(rows[1:], ['пропущен', '429'])
+
+
+class CountingBackend(EmailBackend):
+    """locmem-бэкенд, считающий соединения, как их открывает SMTP."""
+    opened = 0
+    connection = None
+
+    def open(self):
+        if self.connection is not None:
+            return False
+        CountingBackend.opened += 1
+        self.connection = True
+        return True
+
+    def close(self):
+        self.connection = None
+
+
+class FailingBackend(EmailBackend):
+    def send_messages(self, messages):
+        raise ConnectionRefusedError('почтовый сервер недоступен')
+
+
+@override_settings(EMAIL_BACKEND='core.outbox.OutboxBackend',
+                   OUTBOX_EMAIL_BACKEND='core.test.CountingBackend',
+                   OUTBOX_RETRY_DELAY=60, OUTBOX_MAX_ATTEMPTS=3)
+class OutboxTest(TestCase):
+    def setUp(self):
+        CountingBackend.opened = 0
+
+    def test_password_reset_queued(self):
+        """Сброс пароля ставит письмо в очередь, а не отправляет его"""
+        get_user_model().objects.create_user(
+            'reset', 'reset@example.com', 'pass')
+        response = self.client.post(reverse('users:password_reset_form'),
+                                    {'email': 'reset@example.com'})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(mail.outbox, [])
+        record = OutboxMessage.objects.get()
+        self.assertEqual(record.to, 'reset@example.com')
+
+        self.assertEqual(outbox.deliver(), (1, 0))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['reset@example.com'])
+        self.assertEqual(mail.outbox[0].subject, record.subject)
+        record.refresh_from_db()
+        self.assertEqual(record.status, OutboxMessage.SENT)
+        self.assertEqual(outbox.deliver(), (0, 0))
+
+    def test_rollback_drops_mail(self):
+        """Откат транзакции отменяет и письмо"""
+        with self.assertRaises(ZeroDivisionError):
+            with transaction.atomic():
+                mail.send_mail('Тема', 'Текст', None, ['a@example.com'])
+                1 / 0
+        self.assertFalse(OutboxMessage.objects.exists())
+
+    def test_batch_uses_one_connection(self):
+        """Пачка писем уходит через одно соединение"""
+        message = mail.EmailMultiAlternatives(
+            'Тема', 'Текст', 'from@example.com', ['a@example.com'],
+            cc=['b@example.com'], headers={'X-Tag': 'x'})
+        message.attach_alternative('<p>Текст</p>', 'text/html')
+        message.send()
+        for number in range(2):
+            mail.send_mail(f'Тема {number}', '', None, ['c@example.com'])
+        self.assertEqual(outbox.deliver(), (3, 0))
+        self.assertEqual(CountingBackend.opened, 1)
+        sent = mail.outbox[0]
+        self.assertEqual(sent.cc, ['b@example.com'])
+        self.assertEqual(sent.extra_headers, {'X-Tag': 'x'})
+        self.assertEqual(sent.alternatives, [('<p>Текст</p>', 'text/html')])
+
+    @override_settings(OUTBOX_EMAIL_BACKEND='core.test.FailingBackend')
+    def test_retry_with_backoff(self):
+        """Неудачная отправка повторяется с растущей задержкой"""
+        mail.send_mail('Тема', 'Текст', None, ['a@example.com'])
+        now = timezone.now()
+        self.assertEqual(outbox.deliver(now=now), (0, 1))
+        record = OutboxMessage.objects.get()
+        self.assertEqual(record.attempts, 1)
+        self.assertIn('ConnectionRefusedError', record.error)
+        self.assertEqual(record.next_attempt - now,
+                         timezone.timedelta(minutes=1))
+        self.assertEqual(outbox.deliver(now=now), (0, 0))
+
+        now = record.next_attempt
+        outbox.deliver(now=now)
+        record.refresh_from_db()
+        self.assertEqual(record.next_attempt - now,
+                         timezone.timedelta(minutes=2))
+        outbox.deliver(now=record.next_attempt)
+        record.refresh_from_db()
+        self.assertEqual(record.status, OutboxMessage.FAILED)
+        self.assertEqual(record.attempts, 3)
+
+    def test_admin_retry(self):
+        """Администратор видит очередь и повторяет неотправленные"""
+        admin = get_user_model().objects.create_superuser(
+            'admin', 'admin@example.com', 'pass')
+        self.client.force_login(admin)
+        record = OutboxMessage.objects.create(
+            subject='Тема', to='a@example.com', attempts=3,
+            status=OutboxMessage.FAILED)
+        url = reverse('admin:core_outboxmessage_changelist')
+        response = self.client.get(url, {'status__exact': 'failed'})
+        self.assertContains(response, 'a@example.com')
+        self.client.post(url, {'action': 'retry',
+                               '_selected_action': [record.pk]})
+        record.refresh_from_db()
+        self.assertEqual(record.status, OutboxMessage.PENDING)
+        self.assertEqual(outbox.deliver(), (1, 0))
+
+
+class SyncPaginator(CachedCountPaginator):
+    """Пересчитывает устаревшее число строк сразу, а не в потоке."""
+
+    def schedule_refresh(self, key, queryset):
+        self.refresh(key, queryset)
+
+
+class PaginatorTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        from posts.tests.factories import create_posts, create_users
+
+        cls.author, cls.other = create_users(2, prefix='paginator')
+        create_posts(9, [cls.author])
+        create_posts(1, [cls.other])
+
+    def setUp(self):
+        cache.clear()
+
+    def paginator(self, limit=3, cls=SyncPaginator, **filters):
+        from posts.models import Post
+
+        paginator = cls(Post.objects.filter(**filters), 2)
+        paginator.exact_count_limit = limit
+        return paginator
+
+    def test_small_result_exact(self):
+        """Небольшая выборка считается точно и не кэшируется"""
+        paginator = self.paginator(limit=10, author=self.author)
+        self.assertEqual(paginator.count, 9)
+        self.assertFalse(paginator.is_estimated)
+        self.assertEqual(list(paginator.get_elided_page_range(1)),
+                         [1, 2, 3, 4, 5])
+        with self.assertNumQueries(1):
+            self.paginator(limit=10, author=self.author).count
+
+    def test_large_result_cached(self):
+        """Большая выборка — оценка из кэша, без запросов"""
+        paginator = self.paginator(author=self.author)
+        # Граница подсчёта сразу, настоящее число — после пересчёта.
+        self.assertEqual(paginator.count, 4)
+        self.assertTrue(paginator.is_estimated)
+        with self.assertNumQueries(0):
+            paginator = self.paginator(author=self.author)
+            self.assertEqual(paginator.count, 9)
+        self.assertTrue(paginator.is_estimated)
+
+    def test_pages_past_estimate(self):
+        """Страницы за оценкой отфильтрованной ленты не обрезаются"""
+        paginator = self.paginator(cls=CachedCountPaginator,
+                                   author=self.author)
+        paginator.schedule_refresh = lambda key, queryset: None
+        self.assertEqual(paginator.num_pages, 2)
+        page = paginator.get_page(4)
+        self.assertEqual(page.number, 4)
+        self.assertEqual(len(page), 2)
+        self.assertEqual(len(paginator.get_page(5)), 1)
+        self.assertEqual(paginator.get_page('x').number, 1)
+
+    @override_settings(PAGINATOR_COUNT_TTL=0)
+    def test_stale_count_refreshed(self):
+        """Устаревшая оценка отдаётся, пока идёт пересчёт"""
+        from posts.tests.factories import create_posts
+
+        first = self.paginator(cls=SyncPaginator).count
+        create_posts(3, [self.author])
+        self.assertEqual(self.paginator(cls=SyncPaginator).count, first)
+        self.assertEqual(self.paginator(cls=SyncPaginator).count,
+                         first + 3)
+
+    def test_window_without_estimated_end(self):
+        """У оценки нет последних номеров и ссылки «Последняя»"""
+        paginator = CachedCountPaginator(range(100), 1)
+        self.assertEqual(list(paginator.get_elided_page_range(50)),
+                         [1, '…', 48, 49, 50, 51, 52, '…', 100])
+        paginator.is_estimated = True
+        self.assertEqual(list(paginator.get_elided_page_range(50)),
+                         [1, '…', 48, 49, 50, 51, 52, '…'])
+
+    @override_settings(LIMIT_POSTS=1)
+    def test_feed_past_limit(self):
+        """Отфильтрованная лента больше границы не обрывается на ней"""
+        url = reverse('posts:profile', args=[self.author.username])
+        with mock.patch.object(CachedCountPaginator, 'exact_count_limit',
+                               3), \
+                mock.patch.object(CachedCountPaginator, 'schedule_refresh'):
+            response = self.client.get(url, {'page': 8})
+        self.assertEqual(response.context['page_obj'].number, 8)
+        self.assertEqual(len(response.context['page_obj']), 1)
+
+    @override_settings(LIMIT_POSTS=1)
+    def test_feed_renders_window(self):
+        """Лента выводит окно номеров, а не все страницы"""
+        response = self.client.get(
+            reverse('posts:profile', args=[self.author.username]))
+        self.assertContains(response, '?page=3"')
+        self.assertNotContains(response, '?page=4"')
+        self.assertContains(response, '?page=9"')
+        self.assertContains(response, '…')
+        self.assertContains(response, 'Последняя')
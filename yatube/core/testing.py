@@ -0,0 +1,275 @@
+"""Ускорение тестов: шаблон мигрированной БД и отчёт о медленных тестах.
+
+Миграции прогоняются один раз: результат сохраняется в файл SQLite во
+временном каталоге, ключом служит хэш файлов миграций. Последующие
+запуски (и каждый процесс pytest-xdist) копируют шаблон в свою БД в
+памяти через backup API SQLite; `manage.py test --parallel` получает
+копии от уже заполненной БД при fork.
+"""
+import hashlib
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+import unittest
+import weakref
+from functools import partial
+from importlib import import_module
+
+import django
+from django.apps import apps
+from django.conf import settings
+from django.db import connections
+from django.db.models.signals import post_migrate
+from django.test import runner
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+from .storage import InMemoryStorage
+
+TEMPLATE_DIR = os.path.join(tempfile.gettempdir(), 'yatube-test-db')
+
+TEST_STORAGE = 'core.storage.InMemoryStorage'
+
+
+def worker_cache_key(key, key_prefix, version):
+    """Ключ общего кэша с номером процесса --parallel.
+
+    Процессы делят каталог кэша, но у каждого своя копия БД: без номера
+    они видели бы чужих пользователей с теми же id. Дочерние процессы
+    тестов номер наследуют и видят кэш своего процесса.
+    """
+    return f'{runner._worker_id}:{key_prefix}:{version}:{key}'
+
+
+class isolated_settings(override_settings):
+    """Файлы — в памяти, метрики и общий кэш — во временных каталогах.
+
+    Ограничение частоты выключено: тесты одного процесса делят кэш и
+    без этого расходовали бы общий лимит. Просмотры, накопленные в
+    буфере за прогон, при выключении забываются: сброс при выходе
+    записал бы их уже в рабочую БД.
+    """
+
+    def __init__(self):
+        super().__init__(
+            DEFAULT_FILE_STORAGE=TEST_STORAGE,
+            THUMBNAIL_STORAGE=TEST_STORAGE,
+            METRICS_DIR=tempfile.mkdtemp(prefix='yatube-metrics-'),
+            CACHES={**settings.CACHES, 'shared': {
+                **settings.CACHES['shared'],
+                'LOCATION': tempfile.mkdtemp(prefix='yatube-cache-'),
+                'KEY_FUNCTION': worker_cache_key,
+            }},
+            RATELIMIT_ENABLED=False,
+        )
+
+    def disable(self):
+        from posts import hits
+
+        hits.discard()
+        super().disable()
+        shutil.rmtree(self.options['METRICS_DIR'], ignore_errors=True)
+        shutil.rmtree(self.options['CACHES']['shared']['LOCATION'],
+                      ignore_errors=True)
+
+
+def post_migrate_modules():
+    """Модули обработчиков post_migrate: их SQL тоже меняет схему."""
+    modules = set()
+    for _, receiver in post_migrate.receivers:
+        if isinstance(receiver, weakref.ReferenceType):
+            receiver = receiver()
+        if receiver is not None:
+            modules.add(sys.modules[receiver.__module__])
+    return sorted(modules, key=lambda module: module.__name__)
+
+
+def migrations_signature():
+    """Хэш файлов миграций, модулей обработчиков post_migrate (индекс
+    поиска и его триггеры), версий Django и SQLite."""
+    digest = hashlib.sha1()
+    digest.update(django.get_version().encode())
+    digest.update(sqlite3.sqlite_version.encode())
+    for app_config in apps.get_app_configs():
+        try:
+            module = import_module(f'{app_config.name}.migrations')
+        except ImportError:
+            continue
+        directory = os.path.dirname(module.__file__)
+        for name in sorted(os.listdir(directory)):
+            if name.endswith('.py'):
+                digest.update(name.encode())
+                with open(os.path.join(directory, name), 'rb') as file:
+                    digest.update(file.read())
+    for module in post_migrate_modules():
+        digest.update(module.__name__.encode())
+        with open(module.__file__, 'rb') as file:
+            digest.update(file.read())
+    return digest.hexdigest()
+
+
+def template_path(connection):
+    return os.path.join(
+        TEMPLATE_DIR,
+        f'{connection.alias}-{migrations_signature()}.sqlite3',
+    )
+
+
+def can_use_template(connection):
+    creation = connection.creation
+    return (connection.vendor == 'sqlite'
+            and creation.is_in_memory_db(creation._get_test_db_name()))
+
+
+def create_test_db_from_template(connection, create_test_db, verbosity=1,
+                                 autoclobber=False, serialize=True,
+                                 keepdb=False):
+    """Замена creation.create_test_db, копирующая готовый шаблон."""
+    path = template_path(connection)
+    if not os.path.exists(path):
+        name = create_test_db(verbosity=verbosity, autoclobber=autoclobber,
+                              serialize=serialize, keepdb=keepdb)
+        os.makedirs(TEMPLATE_DIR, exist_ok=True)
+        # Пишем во временный файл: параллельные процессы не увидят
+        # недописанный шаблон.
+        partial_path = f'{path}.{os.getpid()}'
+        target = sqlite3.connect(partial_path)
+        try:
+            connection.connection.backup(target)
+        finally:
+            target.close()
+        os.replace(partial_path, path)
+        return name
+
+    creation = connection.creation
+    name = creation._get_test_db_name()
+    if verbosity >= 1:
+        creation.log(f'Copying test database for alias '
+                     f"'{connection.alias}' from {path}...")
+    connection.close()
+    settings.DATABASES[connection.alias]['NAME'] = name
+    connection.settings_dict['NAME'] = name
+    connection.ensure_connection()
+    source = sqlite3.connect(path)
+    try:
+        source.backup(connection.connection)
+    finally:
+        source.close()
+    if serialize:
+        connection._test_serialized_contents = (
+            creation.serialize_db_to_string())
+    return name
+
+
+def use_template_databases():
+    for connection in connections.all():
+        if can_use_template(connection):
+            connection.creation.create_test_db = partial(
+                create_test_db_from_template, connection,
+                connection.creation.create_test_db,
+            )
+
+
+class InMemoryMediaMixin:
+    """Свой пустой набор загруженных файлов на каждый класс тестов.
+
+    Хранилище в памяти общее на процесс; без очистки имя картинки
+    зависит от того, какие тесты её уже загружали.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        InMemoryStorage.clear()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        InMemoryStorage.clear()
+
+
+class TimedTextTestResult(unittest.TextTestResult):
+    """Запоминает время тестов и подготовки их классов.
+
+    Время между концом одного теста и началом следующего уходит на
+    setUpClass/tearDownClass — его относим к классу следующего теста.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.timings = []
+        self.fixture_timings = {}
+        self._last_stop = time.perf_counter()
+
+    def startTest(self, test):
+        now = time.perf_counter()
+        label = f'{type(test).__module__}.{type(test).__qualname__}'
+        self.fixture_timings[label] = (
+            self.fixture_timings.get(label, 0) + now - self._last_stop)
+        self._started = now
+        super().startTest(test)
+
+    def stopTest(self, test):
+        super().stopTest(test)
+        self._last_stop = time.perf_counter()
+        self.timings.append((self._last_stop - self._started, test.id()))
+
+
+class FastTestRunner(DiscoverRunner):
+    """Тесты на шаблоне БД, с файлами в памяти и отчётом о медленных."""
+
+    def __init__(self, slowest=10, **kwargs):
+        super().__init__(**kwargs)
+        self.slowest = slowest
+
+    @classmethod
+    def add_arguments(cls, parser):
+        super().add_arguments(parser)
+        parser.add_argument(
+            '--slowest', type=int, default=10,
+            help='Сколько самых медленных тестов и классов показать '
+                 '(0 — не показывать).',
+        )
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.overrides = isolated_settings()
+        self.overrides.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.overrides.disable()
+        super().teardown_test_environment(**kwargs)
+
+    def setup_databases(self, **kwargs):
+        use_template_databases()
+        return super().setup_databases(**kwargs)
+
+    def get_resultclass(self):
+        resultclass = super().get_resultclass()
+        if resultclass is None and self.slowest and self.parallel <= 1:
+            return TimedTextTestResult
+        return resultclass
+
+    def run_suite(self, suite, **kwargs):
+        result = super().run_suite(suite, **kwargs)
+        if isinstance(result, TimedTextTestResult):
+            self.report(result)
+        return result
+
+    def report(self, result):
+        stream = result.stream
+        stream.writeln(f'\nСамые медленные тесты ({self.slowest}):')
+        for seconds, test_id in sorted(result.timings,
+                                       reverse=True)[:self.slowest]:
+            stream.writeln(f'{seconds:8.3f}s  {test_id}')
+        stream.writeln(f'\nСамая долгая подготовка классов ({self.slowest}):')
+        fixtures = sorted(
+            ((seconds, label)
+             for label, seconds in result.fixture_timings.items()),
+            reverse=True,
+        )
+        for seconds, label in fixtures[:self.slowest]:
+            stream.writeln(f'{seconds:8.3f}s  {label}')
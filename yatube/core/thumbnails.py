@@ -0,0 +1,17 @@
+import time
+
+from sorl.thumbnail.base import ThumbnailBackend
+
+from . import metrics
+
+
+class TimedThumbnailBackend(ThumbnailBackend):
+    """Бэкенд sorl-thumbnail, замеряющий создание миниатюр."""
+
+    def _create_thumbnail(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return super()._create_thumbnail(*args, **kwargs)
+        finally:
+            metrics.THUMBNAIL_LATENCY.observe(
+                time.perf_counter() - started)
@@ -0,0 +1,13 @@
+from django.urls import path
+
+from . import views
+
+app_name = 'core'
+
+urlpatterns = [
+    path('', views.profile_list, name='profile_list'),
+    path('diff/', views.profile_diff, name='profile_diff'),
+    path('<str:name>/', views.profile_detail, name='profile_detail'),
+    path('<str:name>/download/', views.profile_download,
+         name='profile_download'),
+]
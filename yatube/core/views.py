@@ -1,5 +1,15 @@
+import hmac
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import (FileResponse, Http404, HttpResponse,
+                         HttpResponseForbidden)
 from django.shortcuts import render
 
+from . import metrics, profiling
+
+PROFILE_SORTS = ('cumulative', 'tottime', 'ncalls')
+
 
 def page_not_found(request, exception):
     return render(request, 'core/404.html', {'path': request.path}, status=404)
@@ -11,3 +21,66 @@ def csrf_failure(request, reason=''):
 
 def server_error(request):
     return render(request, 'core/500.html', status=500)
+
+
+@staff_member_required
+def profile_list(request):
+    return render(request, 'core/profiles.html', {
+        'profiles': profiling.list_profiles(),
+        'enabled': bool(settings.PROFILING_SAMPLE_RATE),
+        'sample_rate': settings.PROFILING_SAMPLE_RATE,
+    })
+
+
+def get_profile_path(name):
+    path = profiling.profile_path(name)
+    if path is None:
+        raise Http404('Профиль не найден')
+    return path
+
+
+@staff_member_required
+def profile_detail(request, name):
+    sort = request.GET.get('sort')
+    if sort not in PROFILE_SORTS:
+        sort = PROFILE_SORTS[0]
+    return render(request, 'core/profile_detail.html', {
+        'name': name,
+        'sort': sort,
+        'sorts': PROFILE_SORTS,
+        'report': profiling.report(get_profile_path(name), sort),
+    })
+
+
+@staff_member_required
+def profile_download(request, name):
+    return FileResponse(open(get_profile_path(name), 'rb'),
+                        as_attachment=True, filename=name)
+
+
+@staff_member_required
+def profile_diff(request):
+    old = request.GET.get('old', '')
+    new = request.GET.get('new', '')
+    return render(request, 'core/profile_diff.html', {
+        'old': old,
+        'new': new,
+        'rows': profiling.diff(get_profile_path(old), get_profile_path(new)),
+    })
+
+
+def has_metrics_token(request):
+    scheme, _, token = request.META.get(
+        'HTTP_AUTHORIZATION', '').partition(' ')
+    return bool(
+        settings.METRICS_TOKEN and scheme.lower() == 'bearer'
+        and hmac.compare_digest(token.encode(),
+                                settings.METRICS_TOKEN.encode()))
+
+
+def export_metrics(request):
+    """Метрики для Prometheus: по токену METRICS_TOKEN или сотрудникам."""
+    if not (has_metrics_token(request) or request.user.is_staff):
+        return HttpResponseForbidden()
+    return HttpResponse(metrics.exposition(),
+                        content_type='text/plain; version=0.0.4')
@@ -1,27 +1,123 @@
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
+from django.contrib.auth import get_user_model
+from django.urls import reverse
 
-from .models import Group, Post, Comment
+from core.paginator import EstimatedCountPaginator
+from . import jobs
+from .models import BulkJob, Group, Post, Comment
+from .search import search_posts
+
+User = get_user_model()
+
+
+class PostActionForm(ActionForm):
+    group = forms.ModelChoiceField(
+        Group.objects.all(), required=False, label='Группа')
+
+
+class BulkActionsMixin:
+    """Массовые действия одним UPDATE/DELETE вместо delete_selected.
+
+    Встроенное удаление загружает каждый объект и собирает связи
+    построчно, поэтому оно отключено.
+    """
+
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        actions.pop('delete_selected', None)
+        return actions
+
+    def run_bulk(self, request, action, queryset, operation, argument=None):
+        count, job = jobs.execute(action, queryset, operation, argument)
+        if job is None:
+            self.message_user(request, f'{action}: {count}')
+            return
+        url = reverse('admin:posts_bulkjob_change', args=[job.pk])
+        self.message_user(
+            request,
+            f'{action}: {count} — в очереди run_bulk_jobs, '
+            f'прогресс в задаче #{job.pk} ({url})',
+            messages.WARNING,
+        )
+
+    def delete_fast(self, request, queryset):
+        self.run_bulk(request, 'Удаление', queryset,
+                      f'delete_{self.model._meta.model_name}')
+    delete_fast.short_description = 'Удалить выбранные'
+
+    def delete_by_authors(self, request, queryset):
+        authored = self.model.objects.filter(
+            author__in=queryset.values('author_id'))
+        self.run_bulk(request, 'Удаление всего от авторов', authored,
+                      f'delete_{self.model._meta.model_name}')
+    delete_by_authors.short_description = (
+        'Удалить всё от авторов выбранных')
+
+    def ban_authors(self, request, queryset):
+        authors = User.objects.filter(pk__in=queryset.values('author_id'))
+        self.run_bulk(request, 'Блокировка авторов', authors,
+                      'ban_users')
+    ban_authors.short_description = 'Заблокировать авторов выбранных'
 
 
 @admin.register(Post)
-class PostAdmin(admin.ModelAdmin):
+class PostAdmin(BulkActionsMixin, admin.ModelAdmin):
     list_display = (
         'pk',
         'text',
         'pub_date',
+        'status',
         'author',
         'group',
     )
-    list_editable = ('group',)
+    list_select_related = ('author', 'group')
     search_fields = ('text',)
-    list_filter = ('pub_date',)
+    list_filter = ('status', 'pub_date')
+    date_hierarchy = 'pub_date'
+    raw_id_fields = ('author',)
+    autocomplete_fields = ('group',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     empty_value_display = '-пусто-'
+    action_form = PostActionForm
+    actions = ('delete_fast', 'delete_by_authors', 'ban_authors',
+               'set_group')
 
+    def get_search_results(self, request, queryset, search_term):
+        return search_posts(queryset, search_term), False
 
-admin.site.register(Group)
+    def set_group(self, request, queryset):
+        form = PostActionForm(request.POST)
+        # Поле action проверила сама админка, здесь важна только группа.
+        form.is_valid()
+        if 'group' in form.errors:
+            self.message_user(
+                request,
+                f'Перенос в группу не выполнен: '
+                f'{" ".join(form.errors["group"])}',
+                messages.ERROR,
+            )
+            return
+        group = form.cleaned_data['group']
+        self.run_bulk(request, f'Перенос в группу {group or "-пусто-"}',
+                      queryset, 'set_group', group and group.pk)
+    set_group.short_description = 'Перенести в группу'
 
 
-class CommentAdmin(admin.ModelAdmin):
+@admin.register(Group)
+class GroupAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk',
+        'title',
+        'slug',
+    )
+    search_fields = ('title', 'slug')
+    prepopulated_fields = {'slug': ('title',)}
+
+
+class CommentAdmin(BulkActionsMixin, admin.ModelAdmin):
     list_display = (
         'pk',
         'text',
@@ -29,6 +125,32 @@ class CommentAdmin(admin.ModelAdmin):
         'author',
         'created',
     )
+    list_select_related = ('post', 'author')
+    search_fields = ('=author__username',)
+    date_hierarchy = 'created'
+    raw_id_fields = ('post', 'author')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = ('delete_fast', 'delete_by_authors', 'ban_authors')
 
 
 admin.site.register(Comment, CommentAdmin)
+
+
+@admin.register(BulkJob)
+class BulkJobAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk',
+        'action',
+        'status',
+        'done',
+        'total',
+        'created',
+    )
+    list_filter = ('status',)
+    readonly_fields = ('action', 'operation', 'argument', 'status', 'done',
+                       'total', 'lease_until', 'error')
+    exclude = ('keys',)
+
+    def has_add_permission(self, request):
+        return False
@@ -1,6 +1,12 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class PostsConfig(AppConfig):
     name = 'posts'
     verbose_name = 'Посты'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .search import install_after_migrate
+        post_migrate.connect(install_after_migrate, sender=self)
@@ -0,0 +1,116 @@
+"""Чтение и сжатие журнала изменений (CDC).
+
+Журнал Change пишется в транзакции каждого изменения постов,
+комментариев, подписок и групп. Потребитель — поисковый индекс,
+счётчики, выгрузка — хранит смещение в ChangeConsumer и дочитывает
+журнал пачками; после простоя он продолжает с того же места.
+
+    changes.consume('search', handler)   # одна пачка
+    changes.catch_up('search', handler)  # до конца журнала
+
+handler(events) вызывается в той же транзакции, что и сдвиг
+смещения: его записи в БД и смещение фиксируются вместе, а ошибка
+откатывает обе, и пачка будет прочитана снова.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from .models import Change, ChangeConsumer
+
+
+def read(after, limit=None):
+    """События с смещением больше after по возрастанию."""
+    return list(Change.objects.filter(pk__gt=after).order_by('pk')[
+        :limit or settings.CHANGE_LOG_BATCH_SIZE])
+
+
+def position(name):
+    """Сохранённое смещение потребителя; новый начинает с начала."""
+    return ChangeConsumer.objects.filter(name=name).values_list(
+        'position', flat=True).first() or 0
+
+
+def consume(name, handler, batch_size=None):
+    """Обрабатывает одну пачку после смещения; возвращает её размер."""
+    with transaction.atomic():
+        # Второй процесс с тем же потребителем ждёт блокировки, а не
+        # обрабатывает ту же пачку (на SQLite запись и так одна).
+        consumer, _ = ChangeConsumer.objects.select_for_update(
+        ).get_or_create(name=name)
+        events = read(consumer.position, batch_size)
+        if not events:
+            return 0
+        handler(events)
+        consumer.position = events[-1].pk
+        consumer.save(update_fields=['position', 'updated'])
+    return len(events)
+
+
+def catch_up(name, handler, batch_size=None):
+    """Дочитывает журнал до конца; возвращает число событий."""
+    total = 0
+    while True:
+        count = consume(name, handler, batch_size)
+        if not count:
+            return total
+        total += count
+
+
+def horizon(days=None):
+    """Смещение, до которого журнал можно сжимать.
+
+    Это меньшее из смещений потребителей: непрочитанные события
+    остаются как есть. Потребитель, отставший больше чем на days
+    дней, журнал не держит — события старше days сжимаются всё равно.
+    """
+    if days is None:
+        days = settings.CHANGE_LOG_RETENTION_DAYS
+    consumed = ChangeConsumer.objects.aggregate(
+        position=Min('position'))['position']
+    if consumed is None:
+        consumed = Change.objects.aggregate(last=Max('pk'))['last'] or 0
+    expired = Change.objects.filter(
+        created__lt=timezone.now() - timedelta(days=days)).aggregate(
+        last=Max('pk'))['last'] or 0
+    return max(consumed, expired)
+
+
+def compact(days=None, batch_size=None):
+    """Оставляет до horizon() по последнему событию на объект.
+
+    Удалённые объекты (последнее событие — удаление) исчезают из
+    журнала совсем. Новый потребитель, прочитав журнал с начала,
+    получает текущее состояние каждого объекта. Возвращает число
+    удалённых событий.
+    """
+    batch_size = batch_size or settings.CHANGE_LOG_BATCH_SIZE
+    bound = horizon(days)
+    # Объекты и их последние события считаются один раз за проход:
+    # группировка — по сжимаемой части журнала, а для объектов,
+    # изменённых после горизонта, устарели все события до него.
+    newer = set(Change.objects.filter(pk__gt=bound).values_list(
+        'model', 'object_id').distinct())
+    latest = {
+        last for model, object_id, last in Change.objects.filter(
+            pk__lte=bound).values('model', 'object_id').annotate(
+            last=Max('pk')).values_list('model', 'object_id', 'last')
+        if (model, object_id) not in newer
+    }
+    deleted = last = 0
+    while True:
+        # Короткие пачки не держат блокировку записи журнала.
+        rows = list(Change.objects.filter(
+            pk__gt=last, pk__lte=bound).order_by('pk').values_list(
+            'pk', 'action')[:batch_size])
+        if not rows:
+            return deleted
+        last = rows[-1][0]
+        pks = [pk for pk, action in rows
+               if pk not in latest or action == Change.DELETE]
+        if pks:
+            Change.objects.filter(pk__in=pks).delete()
+            deleted += len(pks)
@@ -0,0 +1,53 @@
+"""Компактные разности текстов для истории правок.
+
+Текст режется на слова вместе с пробелами после них: отдельные
+пробелы были бы самым частым элементом и замедлили бы сравнение в
+десятки раз. Разность — JSON-список операций над словами исходного
+текста: положительное число — скопировать столько слов,
+отрицательное — пропустить, строка — вставить. Правка одного слова в
+длинном посте занимает несколько байт вместо копии текста.
+"""
+import json
+import re
+from difflib import SequenceMatcher
+
+# Начальные пробелы текста — отдельное слово.
+TOKEN_RE = re.compile(r'\s+|\S+\s*')
+
+
+def tokens(text):
+    return TOKEN_RE.findall(text)
+
+
+def diff(source, target):
+    """Операции, превращающие source в target."""
+    source_tokens = tokens(source)
+    target_tokens = tokens(target)
+    ops = []
+    matcher = SequenceMatcher(None, source_tokens, target_tokens,
+                              autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            ops.append(i2 - i1)
+            continue
+        if i2 > i1:
+            ops.append(i1 - i2)
+        if j2 > j1:
+            ops.append(''.join(target_tokens[j1:j2]))
+    return json.dumps(ops, ensure_ascii=False, separators=(',', ':'))
+
+
+def patch(source, delta):
+    """Применяет разность diff() к source."""
+    source_tokens = tokens(source)
+    parts = []
+    position = 0
+    for op in json.loads(delta):
+        if isinstance(op, str):
+            parts.append(op)
+        elif op > 0:
+            parts.extend(source_tokens[position:position + op])
+            position += op
+        else:
+            position -= op
+    return ''.join(parts)
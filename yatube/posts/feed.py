@@ -0,0 +1,111 @@
+"""Строки лент: только то, что выводит карточка поста.
+
+Ленты читают через values_list() лишь нужные столбцы — отрывок
+вместо полного текста, без хэша пароля и прочих полей автора — и
+собирают компактные FeedPost со __slots__ вместо экземпляров Post и
+User. Адреса и имена вычисляются один раз на автора и группу
+страницы, а не в шаблоне на каждый пост.
+"""
+from django.db.models.fields.files import ImageFieldFile
+from django.urls import reverse
+
+from .models import Post
+
+FIELDS = (
+    'id', 'excerpt', 'pub_date', 'image',
+    'author_id', 'author__username', 'author__first_name',
+    'author__last_name',
+    'group_id', 'group__slug', 'group__title',
+)
+# Номер-заглушка для шаблона адреса поста.
+SENTINEL = 2147483647
+
+
+class FeedAuthor:
+    __slots__ = ('id', 'username', 'full_name', 'url')
+
+    def __init__(self, pk, username, first_name, last_name):
+        self.id = pk
+        self.username = username
+        self.full_name = f'{first_name} {last_name}'.strip()
+        self.url = reverse('posts:profile', args=[username])
+
+    def get_full_name(self):
+        return self.full_name
+
+    def __str__(self):
+        return self.username
+
+
+class FeedGroup:
+    __slots__ = ('id', 'slug', 'title', 'url')
+
+    def __init__(self, pk, slug, title):
+        self.id = pk
+        self.slug = slug
+        self.title = title
+        self.url = reverse('posts:group_list', args=[slug])
+
+    def __str__(self):
+        return self.title
+
+
+class FeedPost:
+    __slots__ = ('id', 'excerpt', 'pub_date', 'image', 'author', 'group',
+                 'url')
+
+    def __init__(self, pk, excerpt, pub_date, image, author, group, url):
+        self.id = pk
+        self.excerpt = excerpt
+        self.pub_date = pub_date
+        self.image = image
+        self.author = author
+        self.group = group
+        self.url = url
+
+    @property
+    def pk(self):
+        return self.id
+
+    def __str__(self):
+        return self.excerpt[:15]
+
+
+def columns(prefix=''):
+    """Столбцы строки ленты; prefix — путь к посту, например 'post__'."""
+    return [prefix + name for name in FIELDS]
+
+
+def project(queryset):
+    """Выборка постов как кортежи столбцов ленты."""
+    return queryset.values_list(*columns())
+
+
+def rows(values):
+    """FeedPost из кортежей project(); авторы и группы общие.
+
+    Адрес поста подставляется в шаблон, полученный одним reverse() на
+    страницу: адреса авторов и групп кэшируются по ключу, а у постов
+    ключи не повторяются.
+    """
+    image_field = Post._meta.get_field('image')
+    prefix, suffix = reverse('posts:post_detail', args=[SENTINEL]).split(
+        str(SENTINEL))
+    authors, groups, posts = {}, {}, []
+    for (pk, excerpt, pub_date, image, author_id, username, first_name,
+         last_name, group_id, slug, title) in values:
+        author = authors.get(author_id)
+        if author is None:
+            author = authors[author_id] = FeedAuthor(
+                author_id, username, first_name, last_name)
+        group = None
+        if group_id is not None:
+            group = groups.get(group_id)
+            if group is None:
+                group = groups[group_id] = FeedGroup(group_id, slug, title)
+        posts.append(FeedPost(
+            pk, excerpt, pub_date,
+            ImageFieldFile(None, image_field, image or ''),
+            author, group, f'{prefix}{pk}{suffix}',
+        ))
+    return posts
@@ -1,4 +1,5 @@
 from django import forms
+from django.utils import timezone
 
 from .models import Post, Comment
 
@@ -20,3 +21,50 @@ class CommentForm(forms.ModelForm):
         help_texts = {
             'text': 'Текст комментария'
         }
+
+
+class PublishForm(forms.Form):
+    """Когда выпустить пост; без данных — публикация сразу.
+
+    Отдельная форма: поля поста и его публикации не смешиваются.
+    """
+    LOCAL_FORMAT = '%Y-%m-%dT%H:%M'
+
+    status = forms.ChoiceField(
+        choices=(
+            (Post.PUBLISHED, 'Опубликовать сейчас'),
+            (Post.SCHEDULED, 'Опубликовать позже'),
+            (Post.DRAFT, 'Сохранить черновик'),
+        ),
+        required=False,
+        label='Публикация',
+    )
+    publish_at = forms.DateTimeField(
+        required=False,
+        input_formats=[LOCAL_FORMAT],
+        widget=forms.DateTimeInput(attrs={'type': 'datetime-local'},
+                                   format=LOCAL_FORMAT),
+        label='Время публикации',
+        help_text='Только для отложенной публикации',
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        status = cleaned_data.get('status') or Post.PUBLISHED
+        cleaned_data['status'] = status
+        publish_at = cleaned_data.get('publish_at')
+        if status == Post.SCHEDULED and (
+            publish_at is None or publish_at <= timezone.now()
+        ):
+            self.add_error('publish_at', 'Укажите время в будущем')
+        return cleaned_data
+
+    def apply(self, post):
+        """Переносит статус и время выхода в ещё не сохранённый пост."""
+        post.status = self.cleaned_data['status']
+        post.publish_at = None
+        if post.status == Post.SCHEDULED:
+            post.publish_at = self.cleaned_data['publish_at']
+        elif post.status == Post.PUBLISHED:
+            # Черновик выходит в ленту с датой публикации, а не создания.
+            post.pub_date = timezone.now()
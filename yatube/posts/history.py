@@ -0,0 +1,74 @@
+"""История правок постов.
+
+PostRevision хранит прежние версии разностями от следующей версии к
+прежней, а каждую POST_REVISION_SNAPSHOT_EVERY-ю — целиком. Версия
+восстанавливается от ближайшего более нового снимка (или текущего
+текста) не более чем за столько же шагов, а удаление старых версий не
+ломает цепочку для оставшихся.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.utils import timezone
+
+from . import delta
+from .models import PostRevision
+
+
+def versions(post):
+    """Прежние версии поста, новые первыми, без текста."""
+    return post.revisions.values_list('version', 'created')
+
+
+def get_version(post, version):
+    """(текст, id группы, имя картинки) версии поста.
+
+    Восстановленная версия кэшируется по Post.version_key(): у версии
+    содержимое больше не меняется. Удалённые и несуществующие версии —
+    PostRevision.DoesNotExist.
+    """
+    if version == post.version:
+        return post.content()
+    if not 1 <= version < post.version:
+        raise PostRevision.DoesNotExist
+    key = post.version_key(version)
+    content = cache.get(key)
+    if content is not None:
+        return content
+    snapshot = post.revisions.filter(
+        version__gte=version, is_snapshot=True,
+    ).order_by('version').values_list('version', flat=True).first()
+    top = post.version - 1 if snapshot is None else snapshot
+    revisions = list(post.revisions.filter(
+        version__gte=version, version__lte=top).order_by('-version'))
+    if len(revisions) != top - version + 1:
+        raise PostRevision.DoesNotExist
+    text = post.text
+    for revision in revisions:
+        if revision.is_snapshot:
+            text = revision.data
+        else:
+            text = delta.patch(text, revision.data)
+    content = (text, revision.group_id, revision.image)
+    cache.set(key, content)
+    return content
+
+
+def prune(keep=None, days=None):
+    """Удаляет версии старше keep последних для каждого поста.
+
+    Если задано days, удаляются только версии старше стольких дней.
+    Возвращает число удалённых версий.
+    """
+    if keep is None:
+        keep = settings.POST_REVISIONS_KEEP
+    # У поста версии 1..version-1; остаются последние keep из них.
+    revisions = PostRevision.objects.filter(
+        version__lt=F('post__version') - keep)
+    if days is not None:
+        revisions = revisions.filter(
+            created__lt=timezone.now() - timedelta(days=days))
+    deleted, _ = revisions.delete()
+    return deleted
@@ -0,0 +1,164 @@
+"""Буферизованный счётчик просмотров постов.
+
+Просмотры копятся в памяти процесса и сбрасываются в БД пачкой
+UPDATE раз в POST_VIEWS_FLUSH_INTERVAL секунд, при переполнении буфера
+и при завершении процесса. В рабочих процессах сервера сбрасывает
+фоновый поток (start_flusher), и запрос сброса не ждёт; без него
+сбрасывает запрос, заставший срок. Повторные просмотры одного
+посетителя в пределах POST_VIEWS_DEDUP_WINDOW не считаются.
+"""
+import atexit
+import hashlib
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connection, transaction
+from django.db.models import F
+
+from core.metrics import QUEUE_DEPTH
+from . import trending
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_pending = Counter()
+_flushed_at = time.monotonic()
+# Фоновый сброс: поток своего процесса, будильник и флаг остановки.
+_flusher = None
+_wake = threading.Event()
+_stop = threading.Event()
+
+
+def visitor_key(request):
+    # Ключ сессии в подписанной cookie — её содержимое, он длинный.
+    raw = request.session.session_key or '{}|{}'.format(
+        request.META.get('REMOTE_ADDR', ''),
+        request.META.get('HTTP_USER_AGENT', ''))
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def record(request, post_id):
+    """Учитывает просмотр; возвращает False для повторного."""
+    key = f'post_view:{post_id}:{visitor_key(request)}'
+    if not cache.add(key, 1, settings.POST_VIEWS_DEDUP_WINDOW):
+        return False
+    with _lock:
+        _pending[post_id] += 1
+        QUEUE_DEPTH.set(len(_pending), queue='post_views')
+        due = (
+            len(_pending) >= settings.POST_VIEWS_FLUSH_SIZE
+            or time.monotonic() - _flushed_at
+            >= settings.POST_VIEWS_FLUSH_INTERVAL
+        )
+    if not due:
+        return True
+    if _flusher is not None and _flusher.is_alive():
+        _wake.set()
+    else:
+        flush_logged()
+    return True
+
+
+def pending(post_id):
+    """Ещё не сброшенные в БД просмотры поста."""
+    return _pending.get(post_id, 0)
+
+
+def flush():
+    """Сбрасывает буфер: один UPDATE на каждое значение приращения.
+
+    Запись идёт одной транзакцией; при ошибке БД просмотры
+    возвращаются в буфер и уйдут со следующим сбросом.
+    """
+    global _flushed_at
+    with _lock:
+        increments = dict(_pending)
+        _pending.clear()
+        _flushed_at = time.monotonic()
+        QUEUE_DEPTH.set(0, queue='post_views')
+    if not increments:
+        return 0
+    by_count = defaultdict(list)
+    for post_id, count in increments.items():
+        by_count[count].append(post_id)
+    try:
+        with transaction.atomic():
+            for count, post_ids in by_count.items():
+                Post.objects.filter(pk__in=post_ids).update(
+                    views=F('views') + count)
+            trending.bump_many({
+                post_id: count * settings.TRENDING_VIEW_WEIGHT
+                for post_id, count in increments.items()
+            })
+    except DatabaseError:
+        with _lock:
+            _pending.update(increments)
+            QUEUE_DEPTH.set(len(_pending), queue='post_views')
+        raise
+    return len(increments)
+
+
+def flush_logged():
+    """flush() без исключения: просмотры уже вернулись в буфер."""
+    try:
+        return flush()
+    except DatabaseError as error:
+        logger.warning('Просмотры не сохранены, повтор при следующем '
+                       'сбросе: %s', error)
+        return 0
+
+
+def flush_periodically():
+    while not _stop.is_set():
+        _wake.wait(settings.POST_VIEWS_FLUSH_INTERVAL)
+        _wake.clear()
+        if _stop.is_set():
+            break
+        try:
+            flush_logged()
+        finally:
+            connection.close()
+
+
+def start_flusher():
+    """Запускает фоновый сброс в текущем процессе (после fork)."""
+    global _flusher
+    if _flusher is not None and _flusher.is_alive():
+        return
+    _stop.clear()
+    _flusher = threading.Thread(target=flush_periodically,
+                                name='post-views', daemon=True)
+    _flusher.start()
+
+
+def stop_flusher():
+    """Останавливает фоновый сброс, дождавшись начатого."""
+    global _flusher
+    if _flusher is None:
+        return
+    _stop.set()
+    _wake.set()
+    _flusher.join()
+    _flusher = None
+
+
+def discard():
+    """Забывает несброшенные просмотры (тестовая БД уже удалена)."""
+    with _lock:
+        _pending.clear()
+        QUEUE_DEPTH.set(0, queue='post_views')
+
+
+@atexit.register
+def flush_at_exit():
+    """Сброс при завершении процесса или остановке сервера."""
+    stop_flusher()
+    try:
+        flush()
+    except DatabaseError as error:
+        logger.warning('Просмотры не сохранены при выходе: %s', error)
@@ -0,0 +1,160 @@
+"""Массовые операции над постами и комментариями.
+
+Операция получает список первичных ключей и выполняет над ним один
+UPDATE или DELETE. Небольшие выборки обрабатываются сразу, большие
+становятся задачей BulkJob с ключами выборки, которую порциями по
+BULK_ACTION_CHUNK выполняет команда run_bulk_jobs. Рабочий держит
+задачу BULK_JOB_LEASE секунд с каждой порции; задачу упавшего рабочего
+после этого забирает другой и продолжает с done.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from core.metrics import QUEUE_DEPTH
+from users.backends import forget_users
+from . import notifications
+from .models import (BulkJob, Change, Comment, Group, Post, PostRevision,
+                     PostScore)
+
+User = get_user_model()
+logger = logging.getLogger(__name__)
+
+
+def lease(now=None):
+    return (now or timezone.now()) + timedelta(
+        seconds=settings.BULK_JOB_LEASE)
+
+
+def claim(now=None):
+    """Забирает новую задачу или брошенную упавшим рабочим."""
+    now = now or timezone.now()
+    free = BulkJob.objects.filter(
+        Q(lease_until__isnull=True) | Q(lease_until__lte=now),
+        status__in=(BulkJob.PENDING, BulkJob.RUNNING))
+    pk = free.order_by('pk').values_list('pk', flat=True).first()
+    if pk is None:
+        return None
+    # Условный UPDATE: из двух рабочих задачу получит один.
+    if not free.filter(pk=pk).update(status=BulkJob.RUNNING,
+                                     lease_until=lease(now)):
+        return None
+    return BulkJob.objects.get(pk=pk)
+
+
+def run(job):
+    """Выполняет задачу порциями, начиная с job.done.
+
+    Порция и прогресс пишутся одной транзакцией: после падения ни одна
+    порция не выполнится дважды.
+    """
+    keys = job.key_list()
+    size = settings.BULK_ACTION_CHUNK
+    try:
+        operation = OPERATIONS[job.operation](job.argument)
+        for start in range(job.done, len(keys), size):
+            pks = keys[start:start + size]
+            with transaction.atomic():
+                operation(pks)
+                job.done = start + len(pks)
+                job.lease_until = lease()
+                job.save(update_fields=['done', 'lease_until'])
+    except Exception as error:
+        logger.exception('Массовая операция %s не выполнена', job.pk)
+        job.status = BulkJob.FAILED
+        job.error = str(error)
+    else:
+        job.status = BulkJob.DONE
+    job.lease_until = None
+    job.save(update_fields=['status', 'error', 'lease_until'])
+
+
+def process():
+    """Выполняет одну задачу; возвращает её или None."""
+    job = claim()
+    if job is not None:
+        run(job)
+    return job
+
+
+def pending():
+    count = BulkJob.objects.filter(
+        status__in=(BulkJob.PENDING, BulkJob.RUNNING)).count()
+    QUEUE_DEPTH.set(count, queue='bulk_jobs')
+    return count
+
+
+def execute(action, queryset, operation, argument=None):
+    """Выполняет операцию из OPERATIONS сразу или ставит задачу.
+
+    Возвращает пару (число строк, задача или None).
+    """
+    limit = settings.BULK_ACTION_SYNC_LIMIT
+    count = queryset.order_by()[:limit + 1].count()
+    if count <= limit:
+        pks = list(queryset.order_by().values_list('pk', flat=True))
+        with transaction.atomic():
+            OPERATIONS[operation](argument)(pks)
+        return count, None
+    keys = list(queryset.order_by('pk').values_list('pk', flat=True))
+    job = BulkJob.objects.create(
+        action=action, operation=operation, argument=argument,
+        total=len(keys), keys=','.join(map(str, keys)))
+    return job.total, job
+
+
+def delete(model):
+    """Удаление порции; каскады Collector выполняет пачкой DELETE."""
+    def operation(pks):
+        if model is Post:
+            # Уведомления уйдут каскадом, а счётчики — нет.
+            notifications.forget_posts(pks)
+        with Change.objects.bulk_deletes():
+            model.objects.filter(pk__in=pks).delete()
+    return operation
+
+
+def set_group(group):
+    """Перенос порции в группу; каждый перенесённый пост — новая версия."""
+    group_id = None if group is None else group.pk
+
+    def operation(pks):
+        moved = [
+            post for post in Post.objects.filter(pk__in=pks).only(
+                'text', 'group', 'image', 'version')
+            if post.group_id != group_id
+        ]
+        revisions = []
+        for post in moved:
+            post.group_id = group_id
+            revisions.append(post.make_revision())
+        PostRevision.objects.bulk_create(revisions)
+        posts = Post.objects.filter(pk__in=[post.pk for post in moved])
+        posts.update(group=group, version=F('version') + 1)
+        # update() не шлёт post_save: группу в популярном и журнал
+        # изменений правим сами.
+        PostScore.objects.filter(post__in=posts).update(group=group)
+        Change.objects.log_rows(Change.UPDATE, posts)
+    return operation
+
+
+def ban_users(pks):
+    User.objects.filter(pk__in=pks, is_superuser=False).update(
+        is_active=False)
+    # update() не шлёт post_save: кэш пользователей сессий чистим сами.
+    forget_users(pks)
+
+
+# Операции задач по имени; аргумент — pk группы для set_group.
+OPERATIONS = {
+    'delete_post': lambda argument: delete(Post),
+    'delete_comment': lambda argument: delete(Comment),
+    'ban_users': lambda argument: ban_users,
+    'set_group': lambda argument: set_group(
+        None if argument is None else Group.objects.get(pk=argument)),
+}
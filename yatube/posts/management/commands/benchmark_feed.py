@@ -0,0 +1,97 @@
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.testing import FastTestRunner
+from posts import feed
+from posts.models import Post
+
+
+def model_page(number):
+    """Страница ленты как раньше: Post с автором и группой целиком."""
+    posts = Paginator(Post.objects.select_related('group', 'author'),
+                      settings.LIMIT_POSTS).page(number).object_list
+    for post in posts:
+        # Адреса, которые карточка вычисляла тегом {% url %}.
+        reverse('posts:profile', args=[post.author.username])
+        reverse('posts:post_detail', args=[post.pk])
+        if post.group is not None:
+            reverse('posts:group_list', args=[post.group.slug])
+    return list(posts)
+
+
+def row_page(number):
+    posts = Paginator(Post.objects.all(),
+                      settings.LIMIT_POSTS).page(number).object_list
+    return feed.rows(feed.project(posts))
+
+
+def measure(build, pages, rounds=3):
+    """(мс на страницу, байт памяти страницы, запросов на страницу).
+
+    Время — лучшее из rounds проходов по страницам pages.
+    """
+    with CaptureQueriesContext(connection) as queries:
+        build(1)
+    best = float('inf')
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for number in pages:
+            build(number)
+        best = min(best, (time.perf_counter() - started) / len(pages))
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    page = build(1)
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del page
+    return best * 1000, size, len(queries)
+
+
+class Command(BaseCommand):
+    help = ('Сравнить время и память страницы ленты: экземпляры Post '
+            'против строк FeedPost (на тестовой БД)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=2000)
+        parser.add_argument('--repeat', type=int, default=200,
+                            help='Сколько страниц строить на замер')
+
+    def handle(self, *args, **options):
+        from posts.tests.factories import (create_groups, create_posts,
+                                           create_users)
+
+        runner = FastTestRunner(verbosity=0, slowest=0)
+        runner.setup_test_environment()
+        old_config = runner.setup_databases()
+        try:
+            with transaction.atomic():
+                authors = create_users(50, prefix='benchmark')
+                groups = create_groups(5, prefix='benchmark') + [None]
+                create_posts(options['posts'], authors, groups,
+                             text='Текст поста средней длины ' * 20)
+                page_count = options['posts'] // settings.LIMIT_POSTS
+                pages = [number % page_count + 1
+                         for number in range(options['repeat'])]
+                results = {
+                    'Post': measure(model_page, pages),
+                    'FeedPost': measure(row_page, pages),
+                }
+                transaction.set_rollback(True)
+        finally:
+            runner.teardown_databases(old_config)
+            runner.teardown_test_environment()
+        self.stdout.write(f'{"строки":<10} {"мс/стр.":>8} {"КиБ/стр.":>9} '
+                          f'{"запросов":>8}')
+        for name, (elapsed, size, queries) in results.items():
+            self.stdout.write(f'{name:<10} {elapsed:>8.2f} '
+                              f'{size / 1024:>9.1f} {queries:>8}')
+        (old_ms, old_size, _), (new_ms, new_size, _) = results.values()
+        self.stdout.write(f'Быстрее в {old_ms / new_ms:.1f} раза, памяти '
+                          f'меньше в {old_size / new_size:.1f} раза')
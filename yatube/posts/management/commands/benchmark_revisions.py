@@ -0,0 +1,134 @@
+import random
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from core.testing import FastTestRunner
+from posts import history
+from posts.models import Post, PostRevision
+
+WORDS = (
+    'сегодня вчера город парк утро вечер дорога книга музыка фильм друг '
+    'работа проект идея вопрос ответ погода дождь солнце море поезд '
+    'кофе ужин прогулка выставка концерт код релиз тест ошибка версия '
+    'очень немного снова наконец кажется почему-то действительно'
+).split()
+
+
+def sentence(rng):
+    words = rng.choices(WORDS, k=rng.randint(6, 16))
+    return ' '.join(words).capitalize() + rng.choice('..!?')
+
+
+def paragraph(rng):
+    return ' '.join(sentence(rng) for _ in range(rng.randint(2, 6)))
+
+
+def fix_word(rng, paragraphs):
+    index = rng.randrange(len(paragraphs))
+    words = paragraphs[index].split(' ')
+    words[rng.randrange(len(words))] = rng.choice(WORDS)
+    paragraphs[index] = ' '.join(words)
+
+
+def append_sentence(rng, paragraphs):
+    paragraphs[-1] += ' ' + sentence(rng)
+
+
+def insert_paragraph(rng, paragraphs):
+    paragraphs.insert(rng.randrange(len(paragraphs) + 1), paragraph(rng))
+
+
+def drop_paragraph(rng, paragraphs):
+    if len(paragraphs) > 1:
+        del paragraphs[rng.randrange(len(paragraphs))]
+
+
+def rewrite_paragraph(rng, paragraphs):
+    paragraphs[rng.randrange(len(paragraphs))] = paragraph(rng)
+
+
+def rewrite_all(rng, paragraphs):
+    paragraphs[:] = [paragraph(rng) for _ in range(rng.randint(2, 6))]
+
+
+# Правки и их доли: чаще всего опечатки и дописанные предложения.
+EDITS = (
+    (fix_word, 40), (append_sentence, 25), (insert_paragraph, 10),
+    (drop_paragraph, 10), (rewrite_paragraph, 12), (rewrite_all, 3),
+)
+
+
+def edit(rng, text):
+    paragraphs = text.split('\n\n')
+    operation = rng.choices([op for op, _ in EDITS],
+                            [weight for _, weight in EDITS])[0]
+    operation(rng, paragraphs)
+    return '\n\n'.join(paragraphs)
+
+
+class Command(BaseCommand):
+    help = ('Объём истории правок против полных копий и время '
+            'восстановления версии (на тестовой БД)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=200)
+        parser.add_argument('--edits', type=int, default=30,
+                            help='Правок каждого поста')
+        parser.add_argument('--reads', type=int, default=500,
+                            help='Сколько версий восстановить на замер')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        from posts.tests.factories import create_posts, create_users
+
+        rng = random.Random(options['seed'])
+        runner = FastTestRunner(verbosity=0, slowest=0)
+        runner.setup_test_environment()
+        old_config = runner.setup_databases()
+        try:
+            with transaction.atomic():
+                author, = create_users(1, prefix='benchmark')
+                posts = create_posts(options['posts'], [author])
+                full = 0
+                started = time.perf_counter()
+                for post in posts:
+                    post.text = '\n\n'.join(
+                        paragraph(rng) for _ in range(rng.randint(2, 6)))
+                    Post.objects.filter(pk=post.pk).update(text=post.text)
+                    post.saved_content = post.content()
+                    for _ in range(options['edits']):
+                        full += len(post.text.encode())
+                        post.text = edit(rng, post.text)
+                        post.save()
+                edits = len(posts) * options['edits']
+                save_ms = (time.perf_counter() - started) * 1000 / edits
+                stored = sum(len(data.encode()) for data in (
+                    PostRevision.objects.values_list('data', flat=True)))
+                current = sum(len(post.text.encode()) for post in posts)
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    for _ in range(options['reads']):
+                        post = rng.choice(posts)
+                        version = rng.randint(1, post.version - 1)
+                        # Замеряется восстановление, а не чтение кэша.
+                        cache.delete(post.version_key(version))
+                        history.get_version(post, version)
+                    read_ms = ((time.perf_counter() - started) * 1000
+                               / options['reads'])
+                transaction.set_rollback(True)
+        finally:
+            runner.teardown_databases(old_config)
+            runner.teardown_test_environment()
+        self.stdout.write(f'Правок: {edits}, текущие тексты: '
+                          f'{current / 1024:.1f} КиБ')
+        self.stdout.write(f'Полные копии: {full / 1024:.1f} КиБ')
+        self.stdout.write(f'Разности и снимки: {stored / 1024:.1f} КиБ '
+                          f'(меньше в {full / stored:.1f} раза)')
+        self.stdout.write(f'Сохранение правки: {save_ms:.2f} мс')
+        self.stdout.write(
+            f'Восстановление версии: {read_ms:.2f} мс, '
+            f'{len(queries) / options["reads"]:.1f} запроса')
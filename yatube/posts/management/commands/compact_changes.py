@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from posts import changes
+from posts.models import Change, ChangeConsumer
+
+
+class Command(BaseCommand):
+    help = ('Сжимает журнал изменений до последнего события на объект '
+            'там, где его прочитали все потребители')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int,
+            help='Сжимать события старше стольких дней даже непрочитанными '
+                 '(по умолчанию CHANGE_LOG_RETENTION_DAYS)',
+        )
+        parser.add_argument(
+            '--batch-size', type=int,
+            help='Событий на один DELETE (по умолчанию '
+                 'CHANGE_LOG_BATCH_SIZE)',
+        )
+
+    def handle(self, *args, **options):
+        deleted = changes.compact(options['days'], options['batch_size'])
+        self.stdout.write(f'Удалено событий: {deleted}, осталось: '
+                          f'{Change.objects.count()}')
+        for consumer in ChangeConsumer.objects.order_by('name'):
+            behind = Change.objects.filter(pk__gt=consumer.position).count()
+            self.stdout.write(f'{consumer.name}: не прочитано {behind}')
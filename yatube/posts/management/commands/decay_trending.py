@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from posts import trending
+
+
+class Command(BaseCommand):
+    help = ('Затухание популярности постов; запускать раз в '
+            'TRENDING_DECAY_INTERVAL секунд')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--elapsed', type=float,
+            help='Сколько секунд прошло с прошлого запуска',
+        )
+        parser.add_argument(
+            '--rebuild', action='store_true',
+            help='Пересчитать популярность заново по комментариям',
+        )
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            count = trending.rebuild()
+            self.stdout.write(f'Пересчитано постов: {count}')
+            return
+        deleted = trending.decay(options['elapsed'])
+        self.stdout.write(f'Удалено остывших постов: {deleted}')
@@ -0,0 +1,48 @@
+import multiprocessing
+import os
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.models import Max, Min
+
+from posts import tags
+from posts.models import Post
+
+
+def index_chunk(bounds):
+    start, stop = bounds
+    posts = list(Post.objects.filter(pk__gte=start, pk__lt=stop).only(
+        'text', 'pub_date', 'status', 'author_id'))
+    tags.index_posts(posts)
+    return len(posts)
+
+
+class Command(BaseCommand):
+    help = 'Заново строит индекс тегов и упоминаний по всем постам'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Число процессов; 1 — без пула',
+        )
+        parser.add_argument('--chunk', type=int, default=1000,
+                            help='Постов в одной пачке')
+
+    def handle(self, *args, **options):
+        bounds = Post.objects.aggregate(first=Min('pk'), last=Max('pk'))
+        if bounds['first'] is None:
+            self.stdout.write('Проиндексировано постов: 0')
+            return
+        chunk = options['chunk']
+        chunks = [(start, start + chunk) for start in range(
+            bounds['first'], bounds['last'] + 1, chunk)]
+        if options['workers'] <= 1:
+            done = sum(map(index_chunk, chunks))
+        else:
+            # Потомки не должны делить с родителем открытые соединения.
+            connections.close_all()
+            context = multiprocessing.get_context('fork')
+            with context.Pool(options['workers'],
+                              initializer=connections.close_all) as pool:
+                done = sum(pool.imap_unordered(index_chunk, chunks))
+        self.stdout.write(f'Проиндексировано постов: {done}')
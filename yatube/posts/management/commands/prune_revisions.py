@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from posts import history
+
+
+class Command(BaseCommand):
+    help = 'Удаляет старые версии постов из истории правок'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keep', type=int,
+            help='Сколько последних версий оставить у каждого поста (по '
+                 'умолчанию POST_REVISIONS_KEEP)',
+        )
+        parser.add_argument(
+            '--days', type=int,
+            help='Удалять только версии старше стольких дней',
+        )
+
+    def handle(self, *args, **options):
+        deleted = history.prune(options['keep'], options['days'])
+        self.stdout.write(f'Удалено версий: {deleted}')
@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from posts import publishing
+
+
+class Command(BaseCommand):
+    help = ('Публикует запланированные посты; без --once работает, '
+            'пока не остановят')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выпустить наступившие посты и выйти',
+        )
+        parser.add_argument(
+            '--batch-size', type=int,
+            help='Постов за одну транзакцию (по умолчанию '
+                 'PUBLISH_BATCH_SIZE)',
+        )
+        parser.add_argument(
+            '--interval', type=float, default=60,
+            help='Не спать дольше стольких секунд: так подхватываются '
+                 'посты, запланированные во время сна',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                published = publishing.publish_due(options['batch_size'])
+                if published:
+                    self.stdout.write(
+                        f'Опубликовано: {published}, '
+                        f'запланировано: {publishing.scheduled()}')
+                    continue
+                if options['once']:
+                    return
+                delay = publishing.seconds_until_due(options['interval'])
+                connection.close()
+                time.sleep(delay)
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from posts import recommendations
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает рекомендации «кого почитать»'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', type=int, action='append', dest='users',
+            help='id пользователя; можно указать несколько раз',
+        )
+        parser.add_argument('--limit', type=int, help='Рекомендаций на '
+                                                      'пользователя')
+
+    def handle(self, *args, **options):
+        changed = recommendations.refresh(options['users'], options['limit'])
+        self.stdout.write(f'Обновлены рекомендации: {changed}')
@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from posts import jobs
+
+
+class Command(BaseCommand):
+    help = ('Выполнение массовых операций админки из очереди BulkJob; '
+            'без --once работает, пока не остановят')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Разобрать очередь и выйти',
+        )
+        parser.add_argument(
+            '--interval', type=float, default=5,
+            help='Секунд между проверками пустой очереди',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                job = jobs.process()
+                if job is not None:
+                    self.stdout.write(
+                        f'Задача #{job.pk} {job.action}: '
+                        f'{job.get_status_display()}, {job.done}/'
+                        f'{job.total}, в очереди: {jobs.pending()}')
+                    continue
+                if options['once']:
+                    return
+                connection.close()
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,57 @@
+"""Подготовка текста поста к выводу при сохранении, а не при чтении.
+
+Лента выводит экранированный отрывок, страница поста — готовый HTML
+с абзацами, ссылками, #тегами и @упоминаниями. Оба поля
+пересчитываются в Post.save(), поэтому шаблоны вставляют их без
+фильтров.
+"""
+import re
+
+from django.conf import settings
+from django.urls import reverse
+from django.utils.html import escape, format_html, linebreaks, urlize
+from django.utils.text import Truncator
+
+# Решётка и @ внутри слова, адреса или HTML-сущности — не тег и не
+# упоминание: page#top, user@example.com, /#anchor.
+TAG_RE = re.compile(r'(?<![\w/&])#(\w{1,50})')
+MENTION_RE = re.compile(r'(?<![\w/.@])@([\w.+-]{0,149}\w)')
+TOKEN_RE = re.compile(f'{TAG_RE.pattern}|{MENTION_RE.pattern}')
+
+
+def tags(text):
+    """Имена тегов в нижнем регистре."""
+    return {name.lower() for name in TAG_RE.findall(text)}
+
+
+def mentions(text):
+    return set(MENTION_RE.findall(text))
+
+
+def excerpt(text):
+    """Начало текста без переносов строк, экранированное."""
+    text = ' '.join(text.split())
+    return escape(Truncator(text).chars(settings.POST_EXCERPT_LENGTH))
+
+
+def render(text, usernames=frozenset()):
+    """HTML поста: абзацы, переносы строк, ссылки и теги.
+
+    Ссылками становятся только упоминания пользователей из usernames.
+    """
+    parts = []
+    position = 0
+    for match in TOKEN_RE.finditer(text):
+        tag, username = match.groups()
+        if tag is not None:
+            url = reverse('posts:tag', args=[tag.lower()])
+        elif username in usernames:
+            url = reverse('posts:profile', args=[username])
+        else:
+            continue
+        parts.append(urlize(text[position:match.start()], nofollow=True,
+                            autoescape=True))
+        parts.append(format_html('<a href="{}">{}</a>', url, match.group()))
+        position = match.end()
+    parts.append(urlize(text[position:], nofollow=True, autoescape=True))
+    return linebreaks(''.join(parts))
@@ -0,0 +1,22 @@
+# Generated by Django 2.2.16 on 2026-10-19 10:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_auto_20261019_1027'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='postscore',
+            options={'ordering': ['-score', '-pk'], 'verbose_name': 'Популярность поста', 'verbose_name_plural': 'Популярность постов'},
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='views',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Просмотры'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 2.2.16 on 2026-10-19 11:08
+
+from django.db import migrations, models
+
+
+def render_posts(apps, schema_editor):
+    from posts import markup
+
+    Post = apps.get_model('posts', 'Post')
+    posts = Post.objects.only('text').order_by('pk')
+    batch = []
+    for post in posts.iterator():
+        post.excerpt = markup.excerpt(post.text)
+        post.text_html = markup.render(post.text)
+        batch.append(post)
+        if len(batch) == 500:
+            Post.objects.bulk_update(batch, ['excerpt', 'text_html'])
+            batch = []
+    Post.objects.bulk_update(batch, ['excerpt', 'text_html'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0022_auto_20261019_1100'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='excerpt',
+            field=models.TextField(blank=True, editable=False, verbose_name='Отрывок для ленты'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='text_html',
+            field=models.TextField(blank=True, editable=False, verbose_name='Текст в HTML'),
+        ),
+        migrations.RunPython(render_posts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 2.2.16 on 2026-10-19 11:18
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0025_auto_20261019_1117'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False, verbose_name='Версия'),
+        ),
+        migrations.CreateModel(
+            name='PostRevision',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Дата создания')),
+                ('version', models.PositiveIntegerField(verbose_name='Версия')),
+                ('is_snapshot', models.BooleanField(default=False, verbose_name='Текст целиком')),
+                ('data', models.TextField(blank=True, verbose_name='Текст или разность')),
+                ('image', models.CharField(blank=True, max_length=100, verbose_name='Картинка')),
+                ('group', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='posts.Group', verbose_name='Группа')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='revisions', to='posts.Post', verbose_name='Пост')),
+            ],
+            options={
+                'verbose_name': 'Версия поста',
+                'verbose_name_plural': 'Версии постов',
+                'ordering': ['-version'],
+                'unique_together': {('post', 'version')},
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 2.2.16 on 2026-10-19 11:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0027_feedevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Change',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False, verbose_name='Смещение')),
+                ('created', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Дата создания')),
+                ('model', models.CharField(choices=[('post', 'Пост'), ('comment', 'Комментарий'), ('follow', 'Подписка'), ('group', 'Группа')], max_length=10, verbose_name='Модель')),
+                ('object_id', models.PositiveIntegerField(verbose_name='id объекта')),
+                ('action', models.CharField(choices=[('create', 'Создание'), ('update', 'Изменение'), ('delete', 'Удаление')], max_length=6, verbose_name='Действие')),
+                ('data', models.TextField(verbose_name='Состояние в JSON')),
+            ],
+            options={
+                'verbose_name': 'Изменение',
+                'verbose_name_plural': 'Журнал изменений',
+            },
+        ),
+        migrations.CreateModel(
+            name='ChangeConsumer',
+            fields=[
+                ('name', models.SlugField(primary_key=True, serialize=False, verbose_name='Имя')),
+                ('position', models.BigIntegerField(default=0, verbose_name='Последнее обработанное событие')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='Обновлено')),
+            ],
+            options={
+                'verbose_name': 'Потребитель журнала',
+                'verbose_name_plural': 'Потребители журнала',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='change',
+            index=models.Index(fields=['model', 'object_id', 'id'], name='change_object_idx'),
+        ),
+    ]
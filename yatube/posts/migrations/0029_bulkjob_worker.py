@@ -0,0 +1,34 @@
+# Generated by Django 2.2.16 on 2026-10-19 14:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0028_change_log'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bulkjob',
+            name='argument',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Аргумент операции'),
+        ),
+        migrations.AddField(
+            model_name='bulkjob',
+            name='keys',
+            field=models.TextField(blank=True, verbose_name='Ключи выборки'),
+        ),
+        migrations.AddField(
+            model_name='bulkjob',
+            name='lease_until',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Занята рабочим до'),
+        ),
+        migrations.AddField(
+            model_name='bulkjob',
+            name='operation',
+            field=models.CharField(default='', max_length=50, verbose_name='Операция'),
+            preserve_default=False,
+        ),
+    ]
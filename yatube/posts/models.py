@@ -1,11 +1,42 @@
+import json
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
+from django.db.models import Q
+from django.utils import timezone
+from core.db import insert_ignore
 from core.models import CreatedModel
 
+from . import delta, markup
+
 User = get_user_model()
 
 
-class Group(models.Model):
+class ChangeLogged(models.Model):
+    """Сохранение пишет событие в журнал Change той же транзакцией.
+
+    Удаление журналирует сигнал post_delete: Collector шлёт его внутри
+    своей транзакции, в том числе для каскадов.
+    """
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        action = Change.CREATE if self._state.adding else Change.UPDATE
+        with transaction.atomic(savepoint=False):
+            super().save(*args, **kwargs)
+            if update_fields is None or not (
+                    set(update_fields) <= Change.SKIP_FIELDS):
+                Change.objects.log(action, [self])
+
+
+class Group(ChangeLogged):
     title = models.CharField(max_length=200, verbose_name='Название')
     slug = models.SlugField(unique=True, verbose_name='Группа')
     description = models.TextField(verbose_name='Описание')
@@ -18,13 +49,51 @@ class Group(models.Model):
         return self.title
 
 
-class Post(models.Model):
+class PostQuerySet(models.QuerySet):
+    def published(self):
+        """Опубликованные посты; ленты читают их по частичным индексам."""
+        return self.filter(status=Post.PUBLISHED)
+
+    def due(self, now=None):
+        """Запланированные посты, время которых наступило."""
+        return self.filter(status=Post.SCHEDULED,
+                           publish_at__lte=now or timezone.now())
+
+
+class Post(ChangeLogged):
+    DRAFT = 'draft'
+    SCHEDULED = 'scheduled'
+    PUBLISHED = 'published'
+    STATUSES = (
+        (DRAFT, 'Черновик'),
+        (SCHEDULED, 'Запланирован'),
+        (PUBLISHED, 'Опубликован'),
+    )
+    # Поля, правка которых создаёт новую версию.
+    CONTENT_FIELDS = frozenset({'text', 'group', 'image'})
+
     text = models.TextField(
         verbose_name='Текст',
         help_text='Введите текст поста'
     )
     pub_date = models.DateTimeField(
-        auto_now_add=True, verbose_name='Дата публикации'
+        auto_now_add=True, db_index=True, verbose_name='Дата публикации'
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=STATUSES,
+        default=PUBLISHED,
+        verbose_name='Статус'
+    )
+    publish_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name='Запланировано на'
+    )
+    version = models.PositiveIntegerField(
+        default=1,
+        editable=False,
+        verbose_name='Версия'
     )
     author = models.ForeignKey(
         User,
@@ -47,17 +116,174 @@ class Post(models.Model):
         blank=True,
         null=True
     )
+    views = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Просмотры'
+    )
+    excerpt = models.TextField(
+        blank=True,
+        editable=False,
+        verbose_name='Отрывок для ленты'
+    )
+    text_html = models.TextField(
+        blank=True,
+        editable=False,
+        verbose_name='Текст в HTML'
+    )
+
+    objects = PostQuerySet.as_manager()
+
+    # Был ли пост опубликован на момент загрузки из базы: по переходу
+    # из черновика в опубликованные срабатывает posts_published.
+    was_published = False
+    # Текст, группа и картинка на момент загрузки; при их изменении
+    # прежняя версия уходит в PostRevision.
+    saved_content = None
 
     class Meta:
         ordering = ["-pub_date"]
+        indexes = [
+            # Черновики и запланированные в индексы лент не попадают.
+            models.Index(fields=['-pub_date'],
+                         name='post_published_idx',
+                         condition=Q(status='published')),
+            models.Index(fields=['group', '-pub_date'],
+                         name='post_group_published_idx',
+                         condition=Q(status='published')),
+            models.Index(fields=['author', '-pub_date'],
+                         name='post_author_published_idx',
+                         condition=Q(status='published')),
+            # Очередь планировщика: ближайший срок — первая запись.
+            models.Index(fields=['publish_at'],
+                         name='post_scheduled_idx',
+                         condition=Q(status='scheduled')),
+        ]
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
 
     def __str__(self):
         return f'{self.text[:15]}'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        post = super().from_db(db, field_names, values)
+        # Отложенные поля не догружаются отдельными запросами.
+        post.was_published = post.__dict__.get('status') == cls.PUBLISHED
+        if post.__dict__.keys() >= {'text', 'group_id', 'image'}:
+            post.saved_content = post.content()
+        return post
+
+    @property
+    def cache_key(self):
+        """Ключ кэша, который меняется с каждой правкой поста."""
+        return self.version_key(self.version)
+
+    def version_key(self, version):
+        """Ключ кэша версии; содержимое версии больше не меняется."""
+        return f'post:{self.pk}:{version}'
 
-class Comment(CreatedModel):
+    def content(self):
+        return self.text, self.group_id, self.image.name or ''
+
+    @property
+    def is_published(self):
+        return self.status == self.PUBLISHED
+
+    def render_text(self):
+        """Пересчитывает отрывок и HTML; bulk_create его не вызывает."""
+        usernames = markup.mentions(self.text)
+        if usernames:
+            usernames = set(User.objects.filter(
+                username__in=usernames).values_list('username', flat=True))
+        self.excerpt = markup.excerpt(self.text)
+        self.text_html = markup.render(self.text, usernames)
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'text' in update_fields:
+            self.render_text()
+            if update_fields is not None:
+                kwargs['update_fields'] = {
+                    *update_fields, 'excerpt', 'text_html'}
+        revision = None
+        if update_fields is None or self.CONTENT_FIELDS & set(update_fields):
+            revision = self.make_revision()
+        if revision is None:
+            super().save(*args, **kwargs)
+        else:
+            self.version += 1
+            if update_fields is not None:
+                kwargs['update_fields'] = {
+                    *kwargs['update_fields'], 'version'}
+            with transaction.atomic():
+                super().save(*args, **kwargs)
+                revision.save()
+        self.was_published = self.is_published
+        self.saved_content = self.content()
+
+    def make_revision(self):
+        """Несохранённая прежняя версия или None, если правки нет.
+
+        Хранится разность от нового текста к прежнему, а каждая
+        POST_REVISION_SNAPSHOT_EVERY-я версия — целиком: любая версия
+        восстанавливается не более чем за столько же шагов от
+        ближайшего более нового снимка.
+        """
+        if self.pk is None or self.saved_content is None:
+            return None
+        if self.content() == self.saved_content:
+            return None
+        text, group_id, image = self.saved_content
+        revision = PostRevision(post=self, version=self.version,
+                                group_id=group_id, image=image)
+        if self.version % settings.POST_REVISION_SNAPSHOT_EVERY == 0:
+            revision.is_snapshot = True
+            revision.data = text
+        else:
+            revision.data = delta.diff(self.text, text)
+        return revision
+
+
+class PostRevision(CreatedModel):
+    """Прежняя версия поста: текст целиком или разность к следующей."""
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='revisions',
+        verbose_name='Пост'
+    )
+    version = models.PositiveIntegerField(verbose_name='Версия')
+    is_snapshot = models.BooleanField(
+        default=False,
+        verbose_name='Текст целиком'
+    )
+    data = models.TextField(
+        blank=True,
+        verbose_name='Текст или разность'
+    )
+    group = models.ForeignKey(
+        Group,
+        blank=True,
+        null=True,
+        on_delete=models.SET_NULL,
+        related_name='+',
+        verbose_name='Группа'
+    )
+    image = models.CharField(max_length=100, blank=True,
+                             verbose_name='Картинка')
+
+    class Meta:
+        ordering = ['-version']
+        unique_together = ('post', 'version')
+        verbose_name = 'Версия поста'
+        verbose_name_plural = 'Версии постов'
+
+    def __str__(self):
+        return f'{self.post_id} v{self.version}'
+
+
+class Comment(ChangeLogged, CreatedModel):
     post = models.ForeignKey(
         Post,
         on_delete=models.CASCADE,
@@ -82,7 +308,31 @@ class Comment(CreatedModel):
         return f'{self.text[:15]}'
 
 
-class Follow(models.Model):
+class FollowManager(models.Manager):
+    def follow(self, user, author):
+        """Создаёт подписку одним INSERT без гонки check-then-act.
+
+        Возвращает True, если подписка действительно появилась.
+        """
+        if user.pk == author.pk:
+            return False
+        with transaction.atomic(savepoint=False):
+            if not insert_ignore(self.model, user=user.pk, author=author.pk):
+                return False
+            Change.objects.log_rows(
+                Change.CREATE, self.filter(user=user, author=author))
+        return True
+
+    def unfollow(self, user, author):
+        """Удаляет подписку; событие журнала пишет post_delete.
+
+        Возвращает True, если подписка существовала.
+        """
+        deleted, _ = self.filter(user=user, author=author).delete()
+        return deleted > 0
+
+
+class Follow(ChangeLogged):
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -94,5 +344,440 @@ class Follow(models.Model):
         related_name='following'
     )
 
+    objects = FollowManager()
+
     class Meta:
         unique_together = ('user', 'author')
+
+
+class Recommendation(models.Model):
+    """Кого почитать: результаты пакетного расчёта по графу подписок."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='recommendations',
+        verbose_name='Пользователь'
+    )
+    candidate = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Рекомендуемый автор'
+    )
+    score = models.FloatField(verbose_name='Вес')
+
+    class Meta:
+        ordering = ['-score']
+        unique_together = ('user', 'candidate')
+        indexes = [models.Index(fields=['user', '-score'])]
+        verbose_name = 'Рекомендация'
+        verbose_name_plural = 'Рекомендации'
+
+    def __str__(self):
+        return f'{self.user_id} -> {self.candidate_id}'
+
+
+class PostScore(models.Model):
+    """Популярность поста с затуханием во времени.
+
+    Поддерживается инкрементально: комментарии и просмотры прибавляют
+    вес, периодическая задача decay_trending умножает все веса на
+    коэффициент затухания.
+    """
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='trending',
+        verbose_name='Пост'
+    )
+    group = models.ForeignKey(
+        Group,
+        blank=True,
+        null=True,
+        on_delete=models.SET_NULL,
+        related_name='+',
+        verbose_name='Группа'
+    )
+    score = models.FloatField(default=0, verbose_name='Популярность')
+
+    class Meta:
+        ordering = ['-score', '-pk']
+        indexes = [
+            models.Index(fields=['-score', '-post']),
+            models.Index(fields=['group', '-score', '-post']),
+        ]
+        verbose_name = 'Популярность поста'
+        verbose_name_plural = 'Популярность постов'
+
+    def __str__(self):
+        return f'{self.post_id}: {self.score:.2f}'
+
+
+class BulkJob(CreatedModel):
+    """Массовая операция из админки, выполняемая порциями в фоне.
+
+    Ключи выборки и операция хранятся в задаче: рабочий run_bulk_jobs,
+    упавший посреди задачи, оставит её с done и просроченной арендой, и
+    следующий продолжит с того же места.
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Готово'),
+        (FAILED, 'Ошибка'),
+    )
+    action = models.CharField(max_length=200, verbose_name='Действие')
+    total = models.PositiveIntegerField(default=0, verbose_name='Всего')
+    done = models.PositiveIntegerField(default=0, verbose_name='Обработано')
+    status = models.CharField(
+        max_length=10,
+        choices=STATUSES,
+        default=PENDING,
+        verbose_name='Статус'
+    )
+    error = models.TextField(blank=True, verbose_name='Ошибка')
+    operation = models.CharField(max_length=50, verbose_name='Операция')
+    argument = models.PositiveIntegerField(
+        blank=True,
+        null=True,
+        verbose_name='Аргумент операции'
+    )
+    keys = models.TextField(blank=True, verbose_name='Ключи выборки')
+    lease_until = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name='Занята рабочим до'
+    )
+
+    class Meta:
+        ordering = ['-created']
+        verbose_name = 'Массовая операция'
+        verbose_name_plural = 'Массовые операции'
+
+    def __str__(self):
+        return f'{self.action}: {self.done}/{self.total}'
+
+    def key_list(self):
+        return [int(key) for key in self.keys.split(',') if key]
+
+
+class Notification(models.Model):
+    """Уведомление автору; однотипные события схлопываются в одно."""
+    COMMENT = 'comment'
+    FOLLOW = 'follow'
+    KINDS = (
+        (COMMENT, 'Комментарий'),
+        (FOLLOW, 'Подписка'),
+    )
+    recipient = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='notifications',
+        verbose_name='Получатель'
+    )
+    kind = models.CharField(
+        max_length=10, choices=KINDS, verbose_name='Тип')
+    # По ключу события схлопываются: комментарии — по посту,
+    # подписки — все в одно уведомление.
+    key = models.CharField(max_length=50, verbose_name='Ключ')
+    actor = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Последний участник'
+    )
+    post = models.ForeignKey(
+        Post,
+        blank=True,
+        null=True,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Пост'
+    )
+    count = models.PositiveIntegerField(default=1, verbose_name='Событий')
+    unread = models.BooleanField(default=True, verbose_name='Не прочитано')
+    updated = models.DateTimeField(
+        default=timezone.now, verbose_name='Обновлено')
+
+    class Meta:
+        ordering = ['-updated', '-pk']
+        unique_together = ('recipient', 'key')
+        indexes = [models.Index(fields=['recipient', '-updated'])]
+        verbose_name = 'Уведомление'
+        verbose_name_plural = 'Уведомления'
+
+    def __str__(self):
+        return f'{self.recipient_id}: {self.key} ×{self.count}'
+
+
+class NotificationCounter(models.Model):
+    """Число непрочитанных уведомлений, чтобы не считать их COUNT(*)."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='+',
+        verbose_name='Пользователь'
+    )
+    unread = models.IntegerField(default=0, verbose_name='Не прочитано')
+
+    class Meta:
+        verbose_name = 'Счётчик уведомлений'
+        verbose_name_plural = 'Счётчики уведомлений'
+
+    def __str__(self):
+        return f'{self.user_id}: {self.unread}'
+
+
+class Tag(models.Model):
+    name = models.CharField(max_length=50, unique=True,
+                            verbose_name='Тег')
+
+    class Meta:
+        ordering = ['name']
+        verbose_name = 'Тег'
+        verbose_name_plural = 'Теги'
+
+    def __str__(self):
+        return f'#{self.name}'
+
+
+class PostTag(models.Model):
+    """Тег поста; дата публикации повторена для сортировки по индексу."""
+    tag = models.ForeignKey(
+        Tag,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Тег'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Пост'
+    )
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+
+    class Meta:
+        unique_together = ('tag', 'post')
+        indexes = [models.Index(fields=['tag', '-pub_date', '-post'])]
+        verbose_name = 'Тег поста'
+        verbose_name_plural = 'Теги постов'
+
+    def __str__(self):
+        return f'{self.tag_id} -> {self.post_id}'
+
+
+class Mention(models.Model):
+    """Упоминание пользователя в посте."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Пользователь'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Пост'
+    )
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+
+    class Meta:
+        unique_together = ('user', 'post')
+        indexes = [models.Index(fields=['user', '-pub_date', '-post'])]
+        verbose_name = 'Упоминание'
+        verbose_name_plural = 'Упоминания'
+
+    def __str__(self):
+        return f'{self.user_id} -> {self.post_id}'
+
+
+class FeedEvent(CreatedModel):
+    """Запись журнала вышедших постов; id растёт монотонно.
+
+    Журнал только дописывается: поток новых постов (posts.stream)
+    читает его по первичному ключу после последнего прочитанного id.
+    Связи без ограничений в БД, чтобы удаление поста не трогало журнал.
+    """
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='+',
+        verbose_name='Пост'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='+',
+        verbose_name='Автор'
+    )
+    group = models.ForeignKey(
+        Group,
+        blank=True,
+        null=True,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='+',
+        verbose_name='Группа'
+    )
+
+    class Meta:
+        verbose_name = 'Событие ленты'
+        verbose_name_plural = 'События ленты'
+
+    def __str__(self):
+        return f'{self.pk}: {self.post_id}'
+
+
+class ChangeManager(models.Manager):
+    _deletes = threading.local()
+
+    def event(self, action, instance):
+        """Несохранённое событие; отложенные поля не загружаются."""
+        return self.model(
+            model=instance._meta.model_name, object_id=instance.pk,
+            action=action, data=self.model.dump({
+                field.attname: field.get_prep_value(
+                    instance.__dict__[field.attname])
+                for field in self.model.fields(type(instance))
+                if field.attname in instance.__dict__
+            }))
+
+    def log(self, action, instances):
+        """Пишет события по объектам."""
+        return self.bulk_create(
+            self.event(action, instance) for instance in instances)
+
+    def log_rows(self, action, queryset, **values):
+        """События по строкам queryset после update() и других обходов save().
+
+        values заменяют прочитанные значения полей, если строки ещё не
+        изменены.
+        """
+        model = queryset.model
+        rows = queryset.order_by('pk').values(
+            *(field.attname for field in self.model.fields(model)))
+        return self.bulk_create(
+            self.model(model=model._meta.model_name,
+                       object_id=row[model._meta.pk.attname], action=action,
+                       data=self.model.dump({**row, **values}))
+            for row in rows
+        )
+
+    def log_deleted(self, instance):
+        """Событие удаления; внутри bulk_deletes() — отложенное."""
+        pending = getattr(self._deletes, 'events', None)
+        if pending is None:
+            self.log(self.model.DELETE, [instance])
+        else:
+            # Collector обнулит pk после удаления: событие — сейчас.
+            pending.append(self.event(self.model.DELETE, instance))
+
+    @contextmanager
+    def bulk_deletes(self):
+        """Удаления в блоке пишутся в журнал одним INSERT в его конце.
+
+        post_delete приходит на каждую удалённую строку, включая
+        каскады; вне блока каждая из них — отдельный INSERT. Блок
+        должен быть внутри транзакции удаления.
+        """
+        self._deletes.events = pending = []
+        try:
+            yield
+        finally:
+            del self._deletes.events
+        self.bulk_create(pending)
+
+
+class Change(models.Model):
+    """Событие журнала изменений (CDC); id — монотонное смещение.
+
+    Журнал только дописывается в транзакции самого изменения и хранит
+    полное состояние строки после него (для удаления — последнее
+    известное). Потребители читают его пачками после сохранённого
+    смещения (posts.changes), manage.py compact_changes оставляет по
+    последнему событию на объект. На SQLite id не переиспользуются
+    (AUTOINCREMENT), а запись последовательна, поэтому порядок id —
+    порядок фиксации транзакций.
+    """
+    CREATE = 'create'
+    UPDATE = 'update'
+    DELETE = 'delete'
+    ACTIONS = (
+        (CREATE, 'Создание'),
+        (UPDATE, 'Изменение'),
+        (DELETE, 'Удаление'),
+    )
+    MODELS = (
+        ('post', 'Пост'),
+        ('comment', 'Комментарий'),
+        ('follow', 'Подписка'),
+        ('group', 'Группа'),
+    )
+    # Производные поля и счётчики: их правка не событие.
+    SKIP_FIELDS = frozenset({'views', 'excerpt', 'text_html'})
+
+    id = models.BigAutoField(primary_key=True, verbose_name='Смещение')
+    created = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+        verbose_name='Дата создания'
+    )
+    model = models.CharField(max_length=10, choices=MODELS,
+                             verbose_name='Модель')
+    object_id = models.PositiveIntegerField(verbose_name='id объекта')
+    action = models.CharField(max_length=6, choices=ACTIONS,
+                              verbose_name='Действие')
+    data = models.TextField(verbose_name='Состояние в JSON')
+
+    objects = ChangeManager()
+
+    class Meta:
+        # Последнее событие объекта для compact_changes.
+        indexes = [models.Index(fields=['model', 'object_id', 'id'],
+                                name='change_object_idx')]
+        verbose_name = 'Изменение'
+        verbose_name_plural = 'Журнал изменений'
+
+    def __str__(self):
+        return f'{self.pk}: {self.action} {self.model} {self.object_id}'
+
+    @classmethod
+    def fields(cls, model):
+        return [field for field in model._meta.concrete_fields
+                if field.attname not in cls.SKIP_FIELDS]
+
+    @staticmethod
+    def dump(values):
+        return json.dumps(values, cls=DjangoJSONEncoder, ensure_ascii=False,
+                          separators=(',', ':'))
+
+    @property
+    def values(self):
+        return json.loads(self.data)
+
+
+class ChangeConsumer(models.Model):
+    """Потребитель журнала изменений и его смещение."""
+    name = models.SlugField(primary_key=True, verbose_name='Имя')
+    position = models.BigIntegerField(
+        default=0,
+        verbose_name='Последнее обработанное событие'
+    )
+    updated = models.DateTimeField(auto_now=True, verbose_name='Обновлено')
+
+    class Meta:
+        verbose_name = 'Потребитель журнала'
+        verbose_name_plural = 'Потребители журнала'
+
+    def __str__(self):
+        return f'{self.name}: {self.position}'
@@ -0,0 +1,108 @@
+"""Уведомления авторам о комментариях и новых подписчиках.
+
+Однотипные события схлопываются в одну строку на получателя и ключ:
+все комментарии к посту — в «N комментариев», все подписки — в
+«N новых подписчиков». Повторное событие после прочтения снова делает
+строку непрочитанной, так что таблица растёт не быстрее числа постов.
+Число непрочитанных строк хранится в NotificationCounter и меняется
+вместе с ними; шапка страницы берёт его из кэша. Строки, удалённые
+каскадом вместе с постом, счётчик не уменьшают: массовое удаление
+вычитает их само (forget_posts), а открытие входящих сверяет счётчик
+с таблицей.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from core.db import insert_ignore
+from .models import Notification, NotificationCounter
+
+
+def counter_key(user_id):
+    return f'notifications:unread:{user_id}'
+
+
+def add_unread(user_id, amount):
+    if not NotificationCounter.objects.filter(user=user_id).update(
+            unread=F('unread') + amount):
+        insert_ignore(NotificationCounter, user=user_id, unread=0)
+        NotificationCounter.objects.filter(user=user_id).update(
+            unread=F('unread') + amount)
+    cache.delete(counter_key(user_id))
+
+
+def notify(recipient_id, actor_id, kind, key, post_id=None):
+    """Записывает событие; себе уведомления не приходят."""
+    if recipient_id == actor_id:
+        return
+    now = timezone.now()
+    rows = Notification.objects.filter(recipient=recipient_id, key=key)
+    with transaction.atomic():
+        if rows.filter(unread=True).update(
+                actor=actor_id, count=F('count') + 1, updated=now):
+            return
+        if not rows.update(actor=actor_id, count=1, unread=True,
+                           updated=now):
+            try:
+                with transaction.atomic():
+                    Notification.objects.create(
+                        recipient_id=recipient_id, actor_id=actor_id,
+                        kind=kind, key=key, post_id=post_id, updated=now)
+            except IntegrityError:
+                # Строку только что создал параллельный запрос.
+                rows.update(actor=actor_id, count=F('count') + 1,
+                            updated=now)
+                return
+        add_unread(recipient_id, 1)
+
+
+def comment_added(comment, post):
+    notify(post.author_id, comment.author_id, Notification.COMMENT,
+           f'comment:{post.pk}', post.pk)
+
+
+def follower_added(user, author):
+    notify(author.pk, user.pk, Notification.FOLLOW, 'follow')
+
+
+def unread_count(user):
+    key = counter_key(user.pk)
+    count = cache.get(key)
+    if count is None:
+        count = NotificationCounter.objects.filter(user=user).values_list(
+            'unread', flat=True).first() or 0
+        cache.set(key, count, settings.NOTIFICATIONS_CACHE_TIMEOUT)
+    return count
+
+
+def forget_posts(post_ids):
+    """Вычитает из счётчиков непрочитанные уведомления удаляемых постов.
+
+    Вызывается до удаления: одна выборка на пачку постов и по UPDATE
+    на получателя.
+    """
+    rows = Notification.objects.filter(
+        post__in=post_ids, unread=True).order_by().values(
+        'recipient').annotate(unread=Count('pk'))
+    for row in rows:
+        add_unread(row['recipient'], -row['unread'])
+
+
+def mark_read(user):
+    with transaction.atomic():
+        marked = Notification.objects.filter(
+            recipient=user, unread=True).update(unread=False)
+        if not marked and not unread_count(user):
+            return
+        # Счётчик становится реальным числом непрочитанных, а не
+        # уменьшается на отмеченные: так уходит и расхождение после
+        # удалений, прошедших мимо forget_posts.
+        unread = Notification.objects.filter(
+            recipient=OuterRef('user'), unread=True).order_by().values(
+            'recipient').annotate(count=Count('pk')).values('count')
+        NotificationCounter.objects.filter(user=user).update(
+            unread=Coalesce(Subquery(unread), 0))
+        cache.delete(counter_key(user.pk))
@@ -0,0 +1,65 @@
+"""Публикация запланированных постов.
+
+Запланированный пост хранит время выхода в publish_at. Планировщик
+берёт наступившие посты пачками по частичному индексу
+post_scheduled_idx и спит до ближайшего срока из того же индекса, а
+не опрашивает таблицу постов. Опубликованные пачкой посты проходят
+через тот же сигнал posts_published, что и созданные в post_create.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from core.metrics import QUEUE_DEPTH
+
+from .models import Change, Post
+from .signals import posts_published
+
+
+def publish_due(batch_size=None, now=None):
+    """Публикует пачку наступивших постов; возвращает их число."""
+    batch_size = batch_size or settings.PUBLISH_BATCH_SIZE
+    with transaction.atomic():
+        # Параллельный планировщик пропускает захваченные строки; на
+        # SQLite блокировки строк нет, запись и так последовательна.
+        posts = list(
+            Post.objects.due(now).select_for_update(skip_locked=True)
+            .order_by('publish_at', 'pk')
+            .only('text', 'publish_at', 'status', 'author_id', 'group_id')
+            [:batch_size]
+        )
+        if not posts:
+            return 0
+        # Дата публикации — запланированное время, а не момент, когда
+        # до поста дошёл планировщик.
+        published = Post.objects.filter(pk__in=[post.pk for post in posts])
+        published.update(status=Post.PUBLISHED, pub_date=F('publish_at'))
+        Change.objects.log_rows(Change.UPDATE, published)
+        for post in posts:
+            post.status = Post.PUBLISHED
+            post.pub_date = post.publish_at
+            post.was_published = True
+        posts_published.send(sender=Post, posts=posts)
+    return len(posts)
+
+
+def next_due():
+    """Время ближайшей запланированной публикации или None."""
+    return Post.objects.filter(status=Post.SCHEDULED).order_by(
+        'publish_at').values_list('publish_at', flat=True).first()
+
+
+def scheduled():
+    count = Post.objects.filter(status=Post.SCHEDULED).count()
+    QUEUE_DEPTH.set(count, queue='scheduled_posts')
+    return count
+
+
+def seconds_until_due(limit, now=None):
+    """Сколько спать до ближайшего срока, но не больше limit."""
+    due = next_due()
+    if due is None:
+        return limit
+    now = now or timezone.now()
+    return min(limit, max(0.0, (due - now).total_seconds()))
@@ -0,0 +1,102 @@
+"""Пакетный расчёт рекомендаций «кого почитать».
+
+Граф подписок и авторство в группах целиком читаются двумя запросами
+и обрабатываются операциями над множествами в памяти, а в таблицу
+Recommendation записываются только изменившиеся строки.
+"""
+import heapq
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import Follow, Post, Recommendation
+
+
+def load_graph():
+    following = defaultdict(set)
+    for user_id, author_id in (
+        Follow.objects.values_list('user_id', 'author_id').iterator()
+    ):
+        following[user_id].add(author_id)
+    author_groups = defaultdict(set)
+    group_authors = defaultdict(set)
+    for author_id, group_id in (
+        Post.objects.published().filter(group__isnull=False)
+        .values_list('author_id', 'group_id').distinct().iterator()
+    ):
+        author_groups[author_id].add(group_id)
+        group_authors[group_id].add(author_id)
+    return following, author_groups, group_authors
+
+
+def score_user(user_id, following, author_groups, group_authors, limit):
+    """Друзья друзей плюс авторы, пишущие в те же группы."""
+    scores = Counter()
+    for followee in following.get(user_id, ()):
+        scores.update(following.get(followee, ()))
+    weight = settings.RECOMMENDATIONS_GROUP_WEIGHT
+    for group_id in author_groups.get(user_id, ()):
+        for author_id in group_authors[group_id]:
+            scores[author_id] += weight
+    excluded = following.get(user_id, set()) | {user_id}
+    return dict(heapq.nlargest(
+        limit,
+        ((candidate, score) for candidate, score in scores.items()
+         if candidate not in excluded),
+        key=lambda item: (item[1], -item[0]),
+    ))
+
+
+def compute(users=None, limit=None):
+    """Возвращает {user_id: {candidate_id: score}} для пользователей."""
+    limit = limit or settings.LIMIT_RECOMMENDATIONS
+    following, author_groups, group_authors = load_graph()
+    if users is None:
+        users = set(following) | set(author_groups)
+    return {
+        user_id: score_user(
+            user_id, following, author_groups, group_authors, limit)
+        for user_id in users
+    }
+
+
+def refresh(users=None, limit=None):
+    """Пересчитывает рекомендации и сохраняет только изменения.
+
+    Возвращает число пользователей, чьи рекомендации обновились.
+    """
+    fresh = compute(users, limit)
+    stored = defaultdict(dict)
+    rows = Recommendation.objects.values_list(
+        'user_id', 'candidate_id', 'score')
+    if users is not None:
+        rows = rows.filter(user_id__in=list(fresh))
+    for user_id, candidate_id, score in rows.iterator():
+        stored[user_id][candidate_id] = score
+    if users is None:
+        for user_id in stored:
+            fresh.setdefault(user_id, {})
+    changed = [
+        user_id for user_id, scores in fresh.items()
+        if scores != stored.get(user_id, {})
+    ]
+    with transaction.atomic():
+        Recommendation.objects.filter(user_id__in=changed).delete()
+        Recommendation.objects.bulk_create(
+            Recommendation(user_id=user_id, candidate_id=candidate_id,
+                           score=score)
+            for user_id in changed
+            for candidate_id, score in fresh[user_id].items()
+        )
+    return len(changed)
+
+
+def for_user(user):
+    """Одна выборка по индексу (user, -score) для шаблонов."""
+    if not user.is_authenticated:
+        return []
+    return list(
+        Recommendation.objects.filter(user=user)
+        .select_related('candidate')[:settings.LIMIT_RECOMMENDATIONS]
+    )
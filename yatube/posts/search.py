@@ -0,0 +1,76 @@
+"""Полнотекстовый поиск по постам.
+
+На SQLite текст постов индексируется внешней FTS5-таблицей, которую
+поддерживают триггеры; на остальных СУБД поиск откатывается к LIKE.
+"""
+from django.db import connections
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = 'posts_post_fts'
+
+TRIGGERS = (
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai
+    AFTER INSERT ON posts_post BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad
+    AFTER DELETE ON posts_post BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text)
+        VALUES ('delete', old.id, old.text);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au
+    AFTER UPDATE OF text ON posts_post BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text)
+        VALUES ('delete', old.id, old.text);
+        INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+    END""",
+)
+
+
+def install(using='default'):
+    """Создаёт индекс и триггеры, если их ещё нет.
+
+    Вызывается после каждого migrate: пересоздание таблицы posts_post
+    миграциями SQLite удаляет её триггеры.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s",
+            [FTS_TABLE],
+        )
+        created = cursor.fetchone() is None
+        if created:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+                f"text, content='posts_post', content_rowid='id')"
+            )
+        for trigger in TRIGGERS:
+            cursor.execute(trigger)
+        if created:
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def install_after_migrate(sender, using, **kwargs):
+    install(using)
+
+
+def match_expression(term):
+    """Каждое слово запроса — префикс в кавычках, чтобы не ломать MATCH."""
+    words = term.replace('"', ' ').split()
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def search_posts(queryset, term):
+    expression = match_expression(term)
+    if not expression:
+        return queryset
+    if connections[queryset.db].vendor != 'sqlite':
+        return queryset.filter(text__icontains=term)
+    return queryset.filter(pk__in=RawSQL(
+        f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+        [expression],
+    ))
@@ -0,0 +1,85 @@
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import Signal, receiver
+
+from . import notifications, tags, trending
+from .models import (Change, Comment, FeedEvent, Follow, Group, Post,
+                     PostScore, Recommendation)
+
+# Отправляются только при реальном изменении подписки, поэтому
+# обработчики (счётчики, ленты) не срабатывают на повторные клики.
+follow_created = Signal(providing_args=['user', 'author'])
+follow_deleted = Signal(providing_args=['user', 'author'])
+# Посты вышли в ленты: созданы опубликованными, черновик опубликован
+# или наступило время запланированных.
+posts_published = Signal(providing_args=['posts'])
+
+
+@receiver(follow_created)
+def drop_followed_recommendation(sender, user, author, **kwargs):
+    """Автор, на которого подписались, больше не рекомендуется."""
+    Recommendation.objects.filter(user=user, candidate=author).delete()
+
+
+@receiver(follow_created)
+def notify_followed_author(sender, user, author, **kwargs):
+    notifications.follower_added(user, author)
+
+
+@receiver(post_save, sender=Comment)
+def bump_trending_on_comment(sender, instance, created, **kwargs):
+    if created:
+        trending.bump(instance.post_id, settings.TRENDING_COMMENT_WEIGHT,
+                      instance.post.group_id)
+
+
+@receiver(post_save, sender=Comment)
+def notify_post_author(sender, instance, created, **kwargs):
+    if created:
+        notifications.comment_added(instance, instance.post)
+
+
+@receiver(post_save, sender=Post)
+def sync_trending_group(sender, instance, created, **kwargs):
+    if not created:
+        PostScore.objects.filter(post=instance).exclude(
+            group_id=instance.group_id).update(group=instance.group_id)
+
+
+@receiver(post_save, sender=Post)
+def publish_saved_post(sender, instance, created, update_fields=None,
+                       **kwargs):
+    if instance.is_published and not instance.was_published:
+        posts_published.send(sender=Post, posts=[instance])
+    elif update_fields is None or 'text' in update_fields:
+        tags.index_posts([instance], created)
+
+
+@receiver(posts_published)
+def index_published_tags(sender, posts, **kwargs):
+    # До публикации пост в индекс не попадает, удалять нечего.
+    tags.index_posts(posts, created=True)
+
+
+@receiver(posts_published)
+def log_published_posts(sender, posts, **kwargs):
+    FeedEvent.objects.bulk_create(
+        FeedEvent(post_id=post.pk, author_id=post.author_id,
+                  group_id=post.group_id)
+        for post in posts
+    )
+
+
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=Comment)
+@receiver(post_delete, sender=Follow)
+@receiver(post_delete, sender=Group)
+def log_deleted(sender, instance, **kwargs):
+    Change.objects.log_deleted(instance)
+
+
+@receiver(pre_delete, sender=Group)
+def log_ungrouped_posts(sender, instance, **kwargs):
+    # SET_NULL обновит посты группы одним UPDATE без post_save.
+    Change.objects.log_rows(Change.UPDATE, instance.posts.all(),
+                            group_id=None)
@@ -0,0 +1,70 @@
+"""Поток новых постов в лентах через SSE.
+
+Вышедшие посты записываются в журнал FeedEvent. Один поток на
+процесс (core.sse.Broadcaster) дочитывает журнал и сразу готовит
+карточки постов; клиенты главной ленты, группы и подписок получают из
+памяти число новых постов своей ленты и, по желанию, их карточки.
+"""
+from collections import namedtuple
+
+from django.template.loader import render_to_string
+
+from core.sse import Broadcaster, format_event, is_async
+
+from . import feed
+from .models import FeedEvent, Post
+
+Entry = namedtuple('Entry', 'id post_id author_id group_id html')
+
+
+def head():
+    """id последней записи журнала."""
+    return FeedEvent.objects.order_by('-pk').values_list(
+        'pk', flat=True).first() or 0
+
+
+def page_cursor(request):
+    """Курсор для страницы ленты; None — потока на странице нет.
+
+    Под WSGI каждый открытый поток занимал бы поток сервера, поэтому
+    страницы подключаются к нему только под core.asgi.
+    """
+    return head() if is_async(request) else None
+
+
+def fetch(after):
+    """Записи после after с готовыми карточками; для Broadcaster."""
+    rows = list(FeedEvent.objects.filter(pk__gt=after).order_by(
+        'pk').values_list('pk', 'post_id', 'author_id', 'group_id')[
+        :hub.size])
+    posts = feed.rows(feed.project(Post.objects.filter(
+        pk__in=[row[1] for row in rows])))
+    cards = {
+        post.id: render_to_string('includes/article.html',
+                                  {'post': post, 'main': True})
+        for post in posts
+    }
+    return [Entry(*row, cards.get(row[1], '')) for row in rows]
+
+
+hub = Broadcaster(fetch, head)
+
+
+def renderer(group_id=None, authors=None, cards=False):
+    """render() для EventStream одной ленты.
+
+    authors — id авторов для ленты подписок, group_id — для группы.
+    """
+    def render(events):
+        matched = [
+            event for event in events
+            if (group_id is None or event.group_id == group_id)
+            and (authors is None or event.author_id in authors)
+        ]
+        if not matched:
+            return b''
+        data = {'count': len(matched)}
+        if cards:
+            data['cards'] = [event.html for event in matched]
+        return format_event(data, event='posts', id=events[-1].id)
+    return render
@@ -0,0 +1,90 @@
+"""Хэштеги и упоминания: обратный индекс и ленты по нему.
+
+При сохранении поста его #теги и @упоминания существующих
+пользователей записываются в PostTag и Mention вместе с датой
+публикации. Ленты тега и «меня упомянули» читают эти таблицы по
+индексу (тег или пользователь, -pub_date, -post) и листаются по ключу,
+без OFFSET и без сортировки таблицы постов.
+"""
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Q
+
+from . import feed, markup
+from .models import Mention, PostTag, Tag
+
+User = get_user_model()
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def index_posts(posts, created=False):
+    """Пересобирает теги и упоминания постов пачкой.
+
+    Число запросов не зависит от числа постов; для новых постов без
+    тегов и упоминаний запросов нет совсем. Неопубликованные посты
+    индексируются при публикации.
+    """
+    # Черновики и запланированные посты в ленты не попадают.
+    tag_names = {post.pk: markup.tags(post.text) if post.is_published
+                 else set() for post in posts}
+    usernames = {post.pk: markup.mentions(post.text) if post.is_published
+                 else set() for post in posts}
+    all_tags = set().union(*tag_names.values())
+    all_usernames = set().union(*usernames.values())
+    if created and not all_tags and not all_usernames:
+        return
+    tag_ids, user_ids = {}, {}
+    if all_tags:
+        Tag.objects.bulk_create((Tag(name=name) for name in all_tags),
+                                ignore_conflicts=True)
+        tag_ids = dict(Tag.objects.filter(name__in=all_tags).values_list(
+            'name', 'pk'))
+    if all_usernames:
+        user_ids = dict(User.objects.filter(
+            username__in=all_usernames).values_list('username', 'pk'))
+    pks = [post.pk for post in posts]
+    with transaction.atomic():
+        if not created:
+            PostTag.objects.filter(post__in=pks).delete()
+            Mention.objects.filter(post__in=pks).delete()
+        PostTag.objects.bulk_create(
+            PostTag(tag_id=tag_ids[name], post_id=post.pk,
+                    pub_date=post.pub_date)
+            for post in posts for name in tag_names[post.pk]
+        )
+        Mention.objects.bulk_create(
+            Mention(user_id=user_ids[username], post_id=post.pk,
+                    pub_date=post.pub_date)
+            for post in posts for username in usernames[post.pk]
+            if user_ids.get(username) not in (None, post.author_id)
+        )
+
+
+def get_page(request, links):
+    """Страница постов по PostTag или Mention с ключом из ?after=.
+
+    Возвращает строки ленты и курсор следующей страницы или None.
+    """
+    after = request.GET.get('after', '')
+    micros, _, post_id = after.partition('_')
+    try:
+        pub_date = EPOCH + timedelta(microseconds=int(micros))
+        post_id = int(post_id)
+    except (ValueError, OverflowError):
+        pass
+    else:
+        links = links.filter(Q(pub_date__lt=pub_date)
+                             | Q(pub_date=pub_date, post_id__lt=post_id))
+    page = list(links.order_by('-pub_date', '-post').values_list(
+        'pub_date', *feed.columns('post__'))[:settings.LIMIT_POSTS + 1])
+    cursor = None
+    if len(page) > settings.LIMIT_POSTS:
+        page = page[:settings.LIMIT_POSTS]
+        pub_date, post_id = page[-1][:2]
+        micros = (pub_date - EPOCH) // timedelta(microseconds=1)
+        cursor = f'{micros}_{post_id}'
+    return feed.rows(row[1:] for row in page), cursor
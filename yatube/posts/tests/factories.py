@@ -0,0 +1,71 @@
+"""Пакетное создание тестовых данных: один INSERT на набор объектов.
+
+bulk_create не отправляет post_save, так что обработчики сигналов
+(популярное и т.п.) на этих данных не срабатывают.
+"""
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+def small_gif(name='small.gif'):
+    return SimpleUploadedFile(
+        name=name,
+        content=SMALL_GIF,
+        content_type='image/gif'
+    )
+
+
+def create_users(count, prefix='user'):
+    usernames = [f'{prefix}{i}' for i in range(count)]
+    User.objects.bulk_create(User(username=name) for name in usernames)
+    return list(User.objects.filter(username__in=usernames).order_by('pk'))
+
+
+def create_groups(count, prefix='group'):
+    slugs = [f'{prefix}-{i}' for i in range(count)]
+    Group.objects.bulk_create(
+        Group(title=slug, slug=slug, description=slug) for slug in slugs)
+    return list(Group.objects.filter(slug__in=slugs).order_by('pk'))
+
+
+def create_posts(count, authors, groups=(None,), text='Тестовый пост'):
+    """Посты по кругу от авторов и в группы, новые — последними."""
+    last = Post.objects.order_by('-pk').values_list('pk', flat=True).first()
+    posts = [Post(author=authors[i % len(authors)],
+                  group=groups[i % len(groups)],
+                  text=f'{text} {i}')
+             for i in range(count)]
+    for post in posts:
+        post.render_text()
+    Post.objects.bulk_create(posts)
+    return list(Post.objects.filter(pk__gt=last or 0).order_by('pk'))
+
+
+def create_comments(posts, authors, per_post=1):
+    Comment.objects.bulk_create(
+        Comment(post=post, author=authors[i % len(authors)],
+                text=f'Комментарий {i}')
+        for post in posts
+        for i in range(per_post)
+    )
+
+
+def create_follows(users, authors):
+    Follow.objects.bulk_create(
+        (Follow(user=user, author=author)
+         for user in users for author in authors if user != author),
+        ignore_conflicts=True,
+    )
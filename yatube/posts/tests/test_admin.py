@@ -0,0 +1,196 @@
+from datetime import timedelta
+
+from django.contrib import admin, messages
+from django.contrib.auth import get_user_model
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core.paginator import EstimatedCountPaginator
+from .. import history, jobs
+from ..models import BulkJob, Comment, Group, Post, PostScore
+from ..search import search_posts
+
+User = get_user_model()
+
+
+class AdminChangelistTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass')
+        cls.group = Group.objects.create(title='group', slug='group')
+        Post.objects.bulk_create(
+            Post(author=cls.admin, group=cls.group, text=f'Пост номер {i}')
+            for i in range(30)
+        )
+        cls.post = Post.objects.create(
+            author=cls.admin, text='Редкое СЛОВО в тексте')
+        Comment.objects.create(post=cls.post, author=cls.admin, text='к')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def test_changelist_queries_do_not_grow(self):
+        """Список постов в админке не делает запросов на строку"""
+        url = reverse('admin:posts_post_changelist')
+        self.client.get(url)
+        with self.assertNumQueries(5):
+            self.client.get(url)
+        Post.objects.bulk_create(
+            Post(author=self.admin, group=self.group, text='ещё')
+            for _ in range(30)
+        )
+        with self.assertNumQueries(5):
+            self.client.get(url)
+
+    def test_comment_changelist(self):
+        """Список комментариев открывается"""
+        response = self.client.get(reverse('admin:posts_comment_changelist'))
+        self.assertContains(response, 'Редкое СЛОВ')
+
+    def test_full_text_search(self):
+        """Поиск идёт по полнотекстовому индексу без учёта регистра"""
+        found = search_posts(Post.objects.all(), 'слов')
+        self.assertEqual(list(found), [self.post])
+        self.post.text = 'Другой текст'
+        self.post.save()
+        self.assertFalse(search_posts(Post.objects.all(), 'слово').exists())
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'другой'})
+        self.assertEqual(list(response.context['cl'].result_list),
+                         [self.post])
+
+    def test_estimated_paginator(self):
+        """Большие выборки считаются по оценке, маленькие — точно"""
+        paginator = EstimatedCountPaginator(Post.objects.all(), 10)
+        self.assertEqual(paginator.count, 31)
+        self.assertFalse(paginator.is_estimated)
+        paginator = EstimatedCountPaginator(Post.objects.all(), 10)
+        paginator.exact_count_limit = 5
+        self.assertEqual(paginator.count, Post.objects.latest('pk').pk)
+        self.assertTrue(paginator.is_estimated)
+        paginator = EstimatedCountPaginator(
+            Post.objects.filter(group=self.group), 10)
+        paginator.exact_count_limit = 5
+        self.assertEqual(paginator.count, 6)
+
+
+class AdminBulkActionsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass')
+        cls.spammer = User.objects.create_user(username='spammer')
+        cls.group = Group.objects.create(title='group', slug='group')
+        cls.spam = [
+            Post.objects.create(author=cls.spammer, text=f'спам {i}')
+            for i in range(5)
+        ]
+        cls.post = Post.objects.create(author=cls.admin, text='Пост')
+        for post in cls.spam:
+            Comment.objects.create(post=post, author=cls.spammer, text='к')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+        self.url = reverse('admin:posts_post_changelist')
+
+    def act(self, action, posts, **data):
+        return self.client.post(self.url, {
+            'action': action,
+            '_selected_action': [post.pk for post in posts],
+            **data,
+        }, follow=True)
+
+    def test_builtin_delete_disabled(self):
+        """Медленное встроенное удаление недоступно"""
+        response = self.client.get(self.url)
+        self.assertNotIn('delete_selected',
+                         dict(response.context['action_form']
+                              .fields['action'].choices))
+
+    def test_set_group(self):
+        """Перенос в группу одним UPDATE, популярное следует за ним"""
+        self.act('set_group', self.spam[:2], group=self.group.pk)
+        self.assertEqual(self.group.posts.count(), 2)
+        self.assertEqual(
+            PostScore.objects.get(post=self.spam[0]).group, self.group)
+
+    def test_set_group_creates_version(self):
+        """Перенос — новая версия поста с прежней группой в истории"""
+        self.act('set_group', self.spam[:2], group=self.group.pk)
+        self.act('set_group', self.spam[:1], group=self.group.pk)
+        post = Post.objects.get(pk=self.spam[0].pk)
+        self.assertEqual(post.version, 2)
+        revision = post.revisions.get()
+        self.assertEqual((revision.version, revision.group_id), (1, None))
+        self.assertEqual(history.get_version(post, 1),
+                         (post.text, None, ''))
+
+    def test_set_group_rejects_invalid_group(self):
+        """Несуществующая группа — ошибка, а не перенос в «без группы»"""
+        Post.objects.filter(pk=self.post.pk).update(group=self.group)
+        request = RequestFactory().post(self.url, {'group': 0})
+        request.user = self.admin
+        request._messages = CookieStorage(request)
+        admin.site._registry[Post].set_group(
+            request, Post.objects.filter(pk=self.post.pk))
+        self.assertEqual([message.level for message in request._messages],
+                         [messages.ERROR])
+        self.assertTrue(self.group.posts.filter(pk=self.post.pk).exists())
+
+    def test_delete_by_authors(self):
+        """Удаляются все посты авторов выбранных, с комментариями"""
+        self.act('delete_by_authors', self.spam[:1])
+        self.assertEqual(list(Post.objects.all()), [self.post])
+        self.assertFalse(Comment.objects.exists())
+
+    def test_ban_authors(self):
+        """Авторы выбранных блокируются, суперпользователь — нет"""
+        self.act('ban_authors', [self.spam[0], self.post])
+        self.spammer.refresh_from_db()
+        self.admin.refresh_from_db()
+        self.assertFalse(self.spammer.is_active)
+        self.assertTrue(self.admin.is_active)
+
+    @override_settings(BULK_ACTION_SYNC_LIMIT=2, BULK_ACTION_CHUNK=2)
+    def test_large_selection_becomes_job(self):
+        """Большая выборка обрабатывается фоновой задачей порциями"""
+        self.act('delete_fast', self.spam)
+        self.assertEqual(Post.objects.count(), 6)
+        job = BulkJob.objects.get()
+        self.assertEqual((job.status, job.total), (BulkJob.PENDING, 5))
+        self.assertEqual(job.key_list(), [post.pk for post in self.spam])
+        with self.assertNumQueries(46):
+            self.assertEqual(jobs.process(), job)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.done), (BulkJob.DONE, 5))
+        self.assertIsNone(job.lease_until)
+        self.assertEqual(list(Post.objects.all()), [self.post])
+        self.assertIsNone(jobs.process())
+
+    @override_settings(BULK_ACTION_CHUNK=2)
+    def test_abandoned_job_resumed(self):
+        """Задачу упавшего рабочего другой продолжает с done"""
+        job = BulkJob.objects.create(
+            action='Удаление', operation='delete_post',
+            status=BulkJob.RUNNING, total=5, done=2,
+            keys=','.join(str(post.pk) for post in self.spam),
+            lease_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(jobs.process(), job)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.done), (BulkJob.DONE, 5))
+        self.assertEqual(list(Post.objects.order_by('pk')),
+                         [*self.spam[:2], self.post])
+
+    def test_leased_job_not_claimed(self):
+        """Задачу живого рабочего второй не берёт"""
+        BulkJob.objects.create(
+            action='Удаление', operation='delete_post',
+            status=BulkJob.RUNNING, total=1, keys=str(self.post.pk),
+            lease_until=timezone.now() + timedelta(minutes=1))
+        self.assertIsNone(jobs.process())
+        self.assertTrue(Post.objects.filter(pk=self.post.pk).exists())
@@ -0,0 +1,171 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .. import changes, jobs, publishing
+from ..models import Change, ChangeConsumer, Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ChangeLogTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+
+    def setUp(self):
+        self.start = Change.objects.order_by('-pk').values_list(
+            'pk', flat=True).first() or 0
+
+    def log(self):
+        return [(event.action, event.model, event.object_id)
+                for event in changes.read(self.start)]
+
+    def test_changes_logged(self):
+        """Создание, правка и удаление пишутся по порядку с состоянием"""
+        post = Post.objects.create(author=self.author, group=self.group,
+                                   text='Пост')
+        comment = Comment.objects.create(post=post, author=self.reader,
+                                         text='Комментарий')
+        Follow.objects.follow(self.reader, self.author)
+        follow = Follow.objects.get()
+        post.text = 'Правка'
+        post.save()
+        post.views = 10
+        post.save(update_fields=['views'])
+        ids = post.pk, comment.pk, follow.pk
+        Follow.objects.unfollow(self.reader, self.author)
+        post.delete()
+        post_id, comment_id, follow_id = ids
+        self.assertEqual(self.log(), [
+            ('create', 'post', post_id),
+            ('create', 'comment', comment_id),
+            ('create', 'follow', follow_id),
+            ('update', 'post', post_id),
+            ('delete', 'follow', follow_id),
+            ('delete', 'comment', comment_id),
+            ('delete', 'post', post_id),
+        ])
+        values = changes.read(self.start)[3].values
+        self.assertEqual(
+            (values['text'], values['group_id'], values['version']),
+            ('Правка', self.group.pk, 2))
+        self.assertNotIn('text_html', values)
+        self.assertEqual(changes.read(self.start)[2].values,
+                         {'id': follow_id, 'user_id': self.reader.pk,
+                          'author_id': self.author.pk})
+
+    def test_bulk_updates_logged(self):
+        """Обходы save() — планировщик, перенос, удаление группы — тоже"""
+        post = Post.objects.create(
+            author=self.author, text='Отложенный', status=Post.SCHEDULED,
+            publish_at=timezone.now() - timedelta(minutes=1))
+        group = Group.objects.create(title='Г', slug='g', description='Д')
+        publishing.publish_due()
+        jobs.set_group(group)([post.pk])
+        group.delete()
+        events = changes.read(self.start)
+        self.assertEqual(
+            [(event.action, event.model) for event in events],
+            [('create', 'post'), ('create', 'group'), ('update', 'post'),
+             ('update', 'post'), ('update', 'post'), ('delete', 'group')])
+        self.assertEqual(
+            [(event.values['status'], event.values['group_id'])
+             for event in events[2:5]],
+            [('published', None), ('published', events[1].object_id),
+             ('published', None)])
+
+    def test_bulk_delete_logged(self):
+        """Массовое удаление пишет события каскада одним INSERT"""
+        posts = [Post.objects.create(author=self.author, text=f'Пост {n}')
+                 for n in range(2)]
+        comment = Comment.objects.create(post=posts[0], author=self.reader,
+                                         text='Комментарий')
+        ids = comment.pk, posts[0].pk, posts[1].pk
+        with CaptureQueriesContext(connection) as queries:
+            jobs.delete(Post)([post.pk for post in posts])
+        comment_id, *post_ids = ids
+        self.assertEqual(
+            sum('INSERT INTO "posts_change"' in query['sql']
+                for query in queries), 1)
+        self.assertEqual(self.log()[3], ('delete', 'comment', comment_id))
+        self.assertCountEqual(self.log()[4:], [
+            ('delete', 'post', post_id) for post_id in post_ids])
+        values = changes.read(self.start)[3].values
+        self.assertEqual((values['id'], values['post_id'], values['text']),
+                         (comment_id, post_ids[0], 'Комментарий'))
+
+    def test_consume(self):
+        """Потребитель читает пачками с сохранённого смещения"""
+        ChangeConsumer.objects.create(name='search', position=self.start)
+        for number in range(5):
+            Group.objects.create(title=f'Г{number}', slug=f'g{number}',
+                                 description='Описание')
+        batches = []
+
+        def handler(events):
+            batches.append([event.values['slug'] for event in events])
+
+        self.assertEqual(changes.consume('search', handler, 2), 2)
+        self.assertEqual(changes.catch_up('search', handler, 2), 3)
+        self.assertEqual(batches, [['g0', 'g1'], ['g2', 'g3'], ['g4']])
+        self.assertEqual(changes.position('search'),
+                         Change.objects.latest('pk').pk)
+        self.assertEqual(changes.consume('search', handler), 0)
+
+    def test_failed_batch_not_committed(self):
+        """Ошибка обработчика не сдвигает смещение"""
+        ChangeConsumer.objects.create(name='search', position=self.start)
+        Group.objects.create(title='Г', slug='g', description='Описание')
+
+        def handler(events):
+            Group.objects.create(title='Н', slug='n', description='Д')
+            raise DatabaseError('сбой')
+
+        with self.assertRaises(DatabaseError):
+            changes.consume('search', handler)
+        self.assertEqual(changes.position('search'), self.start)
+        self.assertFalse(Group.objects.filter(slug='n').exists())
+
+    def test_compact(self):
+        """Сжатие оставляет последнее событие объекта там, где прочитано"""
+        ChangeConsumer.objects.create(name='search', position=self.start)
+        post = Post.objects.create(author=self.author, text='Версия 1')
+        for number in range(2, 4):
+            post.text = f'Версия {number}'
+            post.save()
+        group = Group.objects.create(title='Г', slug='g', description='Д')
+        group.delete()
+        changes.catch_up('search', lambda events: None)
+        for number in range(2):
+            post.text = f'Непрочитанная {number}'
+            post.save()
+        last = Change.objects.latest('pk').pk
+        call_command('compact_changes', batch_size=2, stdout=StringIO())
+        # Прочитанные версии вытеснены, непрочитанные остались все.
+        self.assertEqual(
+            [event.values['text'] for event in changes.read(self.start)],
+            ['Непрочитанная 0', 'Непрочитанная 1'])
+        # Смещения не переиспользуются даже после удаления последних.
+        Change.objects.filter(pk=last).delete()
+        Follow.objects.follow(self.reader, self.author)
+        self.assertGreater(Change.objects.latest('pk').pk, last)
+
+    def test_retention(self):
+        """Отставший потребитель не держит журнал дольше срока"""
+        ChangeConsumer.objects.create(name='stale', position=self.start)
+        post = Post.objects.create(author=self.author, text='Текст')
+        post.save()
+        Change.objects.update(created=timezone.now() - timedelta(days=31))
+        self.assertEqual(changes.compact(days=40), 0)
+        self.assertEqual(changes.compact(days=30), 1)
+        self.assertEqual(self.log(), [('update', 'post', post.pk)])
@@ -0,0 +1,54 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import feed
+from ..models import Post
+from .factories import create_groups, create_posts
+
+User = get_user_model()
+
+
+class FeedRowsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            'writer', first_name='Лев', last_name='Толстой')
+        cls.group = create_groups(1)[0]
+        cls.posts = create_posts(2, [cls.author], [cls.group, None])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_rows_match_posts(self):
+        """Строка ленты несёт то же, что выводит карточка поста"""
+        with_group, without_group = feed.rows(
+            feed.project(Post.objects.order_by('pk')))
+        post = self.posts[0]
+        self.assertEqual(with_group.id, post.id)
+        self.assertEqual(with_group.excerpt, post.excerpt)
+        self.assertEqual(with_group.pub_date, post.pub_date)
+        self.assertEqual(with_group.url, reverse('posts:post_detail',
+                                                 args=[post.id]))
+        self.assertEqual(with_group.author.get_full_name(), 'Лев Толстой')
+        self.assertEqual(with_group.author.url,
+                         reverse('posts:profile', args=['writer']))
+        self.assertEqual(with_group.group.url,
+                         reverse('posts:group_list', args=[self.group.slug]))
+        self.assertIsNone(without_group.group)
+        self.assertFalse(without_group.image)
+        self.assertIs(with_group.author, without_group.author)
+        with self.assertRaises(AttributeError):
+            with_group.extra = True
+
+    def test_feed_skips_unused_columns(self):
+        """Лента не читает пароль автора и описание группы"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, self.posts[0].text)
+        sql = ' '.join(query['sql'] for query in queries)
+        self.assertNotIn('password', sql)
+        self.assertNotIn('description', sql)
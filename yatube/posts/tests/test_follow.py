@@ -0,0 +1,153 @@
+import threading
+import time
+
+from django.contrib.auth import get_user_model
+from django.db import OperationalError, connection
+from django.test import Client, TestCase, TransactionTestCase
+from django.urls import reverse
+
+from ..models import Follow
+from ..signals import follow_created, follow_deleted
+
+User = get_user_model()
+
+
+class FollowQueriesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.follower = User.objects.create_user(username='follower')
+        cls.author = User.objects.create_user(username='author')
+
+    def setUp(self):
+        self.client.force_login(self.follower)
+        self.follow_url = reverse('posts:profile_follow',
+                                  kwargs={'username': 'author'})
+        self.unfollow_url = reverse('posts:profile_unfollow',
+                                    kwargs={'username': 'author'})
+
+    def test_follow_is_idempotent(self):
+        """Повторная подписка не падает и не создаёт дубль"""
+        for _ in range(3):
+            self.client.get(self.follow_url)
+        self.assertEqual(Follow.objects.count(), 1)
+
+    def test_follow_and_unfollow_queries(self):
+        """Повторная подписка — один INSERT, отписка — ещё и журнал"""
+        Follow.objects.follow(self.follower, self.author)
+        # Отписка: чтение подписки для журнала, DELETE и событие.
+        with self.assertNumQueries(4):
+            Follow.objects.follow(self.follower, self.author)
+            Follow.objects.unfollow(self.follower, self.author)
+
+    def test_self_follow(self):
+        """На самого себя подписаться нельзя"""
+        self.assertFalse(Follow.objects.follow(self.follower, self.follower))
+        self.assertFalse(Follow.objects.exists())
+
+    def test_signals_sent_only_on_change(self):
+        """Сигналы отправляются только при реальном изменении"""
+        events = []
+
+        def handler(signal, **kwargs):
+            events.append(signal)
+
+        follow_created.connect(handler)
+        follow_deleted.connect(handler)
+        try:
+            self.client.get(self.follow_url)
+            self.client.get(self.follow_url)
+            self.client.get(self.unfollow_url)
+            self.client.get(self.unfollow_url)
+        finally:
+            follow_created.disconnect(handler)
+            follow_deleted.disconnect(handler)
+        self.assertEqual(events, [follow_created, follow_deleted])
+
+    def test_follow_unknown_author(self):
+        """Подписка на несуществующего автора возвращает 404"""
+        response = self.client.get(
+            reverse('posts:profile_follow', kwargs={'username': 'nobody'}))
+        self.assertEqual(response.status_code, 404)
+
+
+class FollowConcurrencyTest(TransactionTestCase):
+    threads = 8
+    rounds = 5
+
+    def setUp(self):
+        self.follower = User.objects.create_user(username='follower')
+        self.author = User.objects.create_user(username='author')
+
+    def retry(self, function, *args):
+        # Тестовая БД SQLite живёт в памяти с общим кэшем и отвечает
+        # «table is locked» на одновременную запись: такие ответы
+        # повторяем, любые другие ошибки (IntegrityError) пробрасываем.
+        for _ in range(100):
+            try:
+                return function(*args)
+            except OperationalError as error:
+                if 'locked' not in str(error):
+                    raise
+                time.sleep(0.01)
+        raise AssertionError(f'{args} всё время заблокирован')
+
+    def run_threads(self, target, *args):
+        barrier = threading.Barrier(self.threads, timeout=10)
+        errors = []
+        workers = [
+            threading.Thread(target=target, args=(barrier, errors, *args))
+            for _ in range(self.threads)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return errors
+
+    def hammer(self, barrier, errors):
+        kwargs = {'username': self.author.username}
+        urls = [
+            reverse(name, kwargs=kwargs)
+            for name in ('posts:profile_follow',
+                         'posts:profile_unfollow',
+                         'posts:profile_follow')
+        ]
+        try:
+            client = Client()
+            self.retry(client.force_login, self.follower)
+            barrier.wait()
+            for _ in range(self.rounds):
+                for url in urls:
+                    response = self.retry(client.get, url)
+                    if response.status_code != 302:
+                        errors.append(response.status_code)
+        except Exception as error:
+            errors.append(error)
+        finally:
+            connection.close()
+
+    def test_parallel_follow_unfollow(self):
+        """Параллельные подписки и отписки не приводят к ошибкам"""
+        self.assertEqual(self.run_threads(self.hammer), [])
+        self.assertLessEqual(
+            Follow.objects.filter(user=self.follower).count(), 1)
+
+    def follow(self, barrier, errors, results):
+        try:
+            barrier.wait()
+            results.append(self.retry(
+                Follow.objects.follow, self.follower, self.author))
+        except Exception as error:
+            errors.append(error)
+        finally:
+            connection.close()
+
+    def test_parallel_follow(self):
+        """Из одновременных подписок создаёт строку ровно одна"""
+        results = []
+        self.assertEqual(self.run_threads(self.follow, results), [])
+        self.assertEqual(
+            Follow.objects.filter(user=self.follower).count(), 1)
+        self.assertEqual(results.count(True), 1)
+        self.assertEqual(len(results), self.threads)
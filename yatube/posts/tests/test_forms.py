@@ -1,20 +1,15 @@
-import shutil
-import tempfile
-
 from http import HTTPStatus
 from django.contrib.auth import get_user_model
 from django.urls import reverse
-from django.conf import settings
-from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import TestCase, Client, override_settings
+from django.test import TestCase, Client
+from core.testing import InMemoryMediaMixin
 from posts.models import Post, Group, Comment
+from .factories import small_gif
 
-TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 User = get_user_model()
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
-class PostCreateFormTest(TestCase):
+class PostCreateFormTest(InMemoryMediaMixin, TestCase):
     @classmethod
     def setUpClass(cls):
         super().setUpClass()
@@ -31,11 +26,6 @@ class PostCreateFormTest(TestCase):
             text='Тестовый пост',
         )
 
-    @classmethod
-    def tearDownClass(cls):
-        super().tearDownClass()
-        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
-
     def setUp(self):
         self.guest = Client()
         self.authorized_client = Client()
@@ -59,19 +49,7 @@ class PostCreateFormTest(TestCase):
     def test_create_post_authorized(self):
         """Проверка на создание поста"""
         posts_count = Post.objects.count()
-        small_gif = (
-            b'\x47\x49\x46\x38\x39\x61\x02\x00'
-            b'\x01\x00\x80\x00\x00\x00\x00\x00'
-            b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
-            b'\x00\x00\x00\x2C\x00\x00\x00\x00'
-            b'\x02\x00\x01\x00\x00\x02\x02\x0C'
-            b'\x0A\x00\x3B'
-        )
-        uploaded = SimpleUploadedFile(
-            name='small.gif',
-            content=small_gif,
-            content_type='image/gif'
-        )
+        uploaded = small_gif()
 
         form_data = {
             'text': 'Новый пост',
@@ -0,0 +1,110 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .. import delta, history
+from ..models import Group, Post, PostRevision
+
+User = get_user_model()
+
+
+@override_settings(POST_REVISION_SNAPSHOT_EVERY=3)
+class PostHistoryTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.author)
+        self.post = Post.objects.create(author=self.author,
+                                        text='Версия 1\n\nобщий абзац')
+
+    def edit(self, count):
+        texts = [self.post.text]
+        for number in range(2, count + 2):
+            self.post.text = f'Версия {number}\n\nобщий абзац'
+            self.post.save()
+            texts.append(self.post.text)
+        return texts
+
+    def test_delta_roundtrip(self):
+        """Разность восстанавливает текст, включая пробелы по краям"""
+        pairs = (('  раз  два\n\nтри ', 'раз, два\nчетыре'), ('', 'текст'),
+                 ('текст', ''))
+        for source, target in pairs:
+            with self.subTest(source=source, target=target):
+                self.assertEqual(
+                    delta.patch(source, delta.diff(source, target)), target)
+
+    def test_edit_creates_revision(self):
+        """Правка сохраняет прежнюю версию и меняет ключ кэша"""
+        key = self.post.cache_key
+        self.client.post(reverse('posts:post_edit', args=[self.post.id]),
+                         {'text': 'Новый текст', 'group': self.group.id})
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.version, 2)
+        self.assertNotEqual(self.post.cache_key, key)
+        revision = self.post.revisions.get()
+        self.assertEqual((revision.version, revision.group_id),
+                         (1, None))
+        self.assertEqual(history.get_version(self.post, 1),
+                         ('Версия 1\n\nобщий абзац', None, ''))
+
+    def test_unchanged_save_keeps_version(self):
+        """Сохранение без правок и без полей содержимого версию не меняет"""
+        self.post.save()
+        self.post.views = 5
+        self.post.save(update_fields=['views'])
+        self.assertEqual(self.post.version, 1)
+        self.assertFalse(PostRevision.objects.exists())
+
+    def test_reconstruct_every_version(self):
+        """Любая версия восстанавливается через снимки и разности"""
+        texts = self.edit(8)
+        self.assertEqual(
+            list(self.post.revisions.filter(is_snapshot=True).values_list(
+                'version', flat=True)),
+            [6, 3])
+        # Разность хранит правку, а не копию текста.
+        revision = self.post.revisions.get(version=5)
+        self.assertNotIn('общий абзац', revision.data)
+        for version, text in enumerate(texts, start=1):
+            with self.subTest(version=version):
+                cache.clear()
+                with self.assertNumQueries(0 if version == 9 else 2):
+                    content = history.get_version(self.post, version)
+                self.assertEqual(content[0], text)
+        history.get_version(self.post, 4)
+        with self.assertNumQueries(0):
+            history.get_version(self.post, 4)
+
+    def test_history_page(self):
+        """Страница истории показывает выбранную версию"""
+        self.edit(2)
+        url = reverse('posts:post_history', args=[self.post.id])
+        response = self.client.get(url, {'version': 1})
+        self.assertContains(response, 'Версия 1')
+        self.assertEqual(list(response.context['versions'].values_list(
+            'version', flat=True)), [2, 1])
+        for version in ('0', '4', 'x'):
+            with self.subTest(version=version):
+                response = self.client.get(url, {'version': version})
+                self.assertEqual(response.status_code, 404)
+
+    def test_prune(self):
+        """prune_revisions оставляет последние версии рабочими"""
+        texts = self.edit(8)
+        call_command('prune_revisions', keep=4, stdout=StringIO())
+        self.assertEqual(
+            list(self.post.revisions.values_list('version', flat=True)),
+            [8, 7, 6, 5])
+        self.assertEqual(history.get_version(self.post, 5)[0], texts[4])
+        with self.assertRaises(PostRevision.DoesNotExist):
+            history.get_version(self.post, 4)
@@ -0,0 +1,125 @@
+import threading
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DatabaseError
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import hits, trending
+from ..models import Post, PostScore
+
+User = get_user_model()
+
+
+@override_settings(POST_VIEWS_FLUSH_INTERVAL=3600,
+                   POST_VIEWS_FLUSH_SIZE=1000)
+class PostViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Просмотры из других тестов сбрасываются в ещё пустую таблицу.
+        hits.flush()
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+        cls.other = Post.objects.create(author=cls.author, text='Другой')
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('posts:post_detail',
+                           kwargs={'post_id': self.post.id})
+
+    def tearDown(self):
+        hits.flush()
+
+    def visit(self, url, user_agent='browser'):
+        return Client(HTTP_USER_AGENT=user_agent).get(url)
+
+    def test_views_are_buffered(self):
+        """Просмотр не пишет в БД, но сразу виден на странице"""
+        response = self.visit(self.url)
+        self.assertEqual(response.context['post'].views, 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.views, 0)
+        self.assertEqual(hits.pending(self.post.id), 1)
+
+    def test_repeated_view_is_deduplicated(self):
+        """Повторный просмотр того же посетителя не считается"""
+        self.visit(self.url)
+        self.visit(self.url)
+        self.visit(self.url, user_agent='another')
+        self.assertEqual(hits.pending(self.post.id), 2)
+
+    def test_flush_batches_updates(self):
+        """Сброс буфера — один UPDATE на каждое значение приращения"""
+        self.visit(self.url)
+        self.visit(self.url, user_agent='another')
+        self.visit(reverse('posts:post_detail',
+                           kwargs={'post_id': self.other.id}))
+        # Два UPDATE и популярное внутри SAVEPOINT транзакции сброса.
+        with self.assertNumQueries(7):
+            self.assertEqual(hits.flush(), 2)
+        self.post.refresh_from_db()
+        self.other.refresh_from_db()
+        self.assertEqual((self.post.views, self.other.views), (2, 1))
+        self.assertEqual(hits.pending(self.post.id), 0)
+        self.assertTrue(PostScore.objects.filter(post=self.post).exists())
+
+    def test_flush_when_buffer_is_full(self):
+        """Переполненный буфер сбрасывается сам"""
+        with self.settings(POST_VIEWS_FLUSH_SIZE=1):
+            self.visit(self.url)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.views, 1)
+
+    def test_failed_flush_keeps_views(self):
+        """Ошибка БД при сбросе не теряет просмотры"""
+        self.visit(self.url)
+        with mock.patch.object(trending, 'bump_many',
+                               side_effect=DatabaseError('сбой')):
+            with self.assertRaises(DatabaseError):
+                hits.flush()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.views, 0)
+        self.assertEqual(hits.pending(self.post.id), 1)
+        self.assertEqual(hits.flush(), 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.views, 1)
+
+    def test_failed_flush_does_not_fail_request(self):
+        """Ошибка БД при сбросе из запроса пишется в лог, а не в ответ"""
+        with self.settings(POST_VIEWS_FLUSH_SIZE=1), \
+                mock.patch.object(trending, 'bump_many',
+                                  side_effect=DatabaseError('сбой')), \
+                self.assertLogs('posts.hits', 'WARNING'):
+            response = self.visit(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(hits.pending(self.post.id), 1)
+
+    def flusher_calls(self):
+        """Запускает фоновый сброс с подменённым flush()."""
+        flushed = threading.Event()
+        # Буфер остаётся несброшенным: tearDown идёт до снятия подмены.
+        self.addCleanup(hits.discard)
+        patcher = mock.patch.object(hits, 'flush',
+                                    side_effect=lambda: flushed.set())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        hits.start_flusher()
+        self.addCleanup(hits.stop_flusher)
+        return flushed
+
+    def test_flusher_flushes_on_timer(self):
+        """Фоновый поток сбрасывает буфер по интервалу, без запросов"""
+        with self.settings(POST_VIEWS_FLUSH_INTERVAL=0.01):
+            self.assertTrue(self.flusher_calls().wait(5))
+
+    def test_full_buffer_wakes_flusher(self):
+        """Переполненный буфер будит фоновый поток, запрос не ждёт"""
+        flushed = self.flusher_calls()
+        with self.settings(POST_VIEWS_FLUSH_SIZE=1):
+            self.visit(self.url)
+        self.assertTrue(flushed.wait(5))
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.views, 0)
@@ -0,0 +1,59 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Post
+
+User = get_user_model()
+
+
+class PostMarkupTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.author)
+
+    def test_rendered_on_save(self):
+        """Отрывок и HTML готовятся при сохранении и экранируются"""
+        post = Post.objects.create(
+            author=self.author,
+            text='<b>Первый</b> абзац\nвторая строка\n\n'
+                 'Второй абзац: https://example.com/page')
+        self.assertEqual(
+            post.excerpt,
+            '&lt;b&gt;Первый&lt;/b&gt; абзац вторая строка Второй абзац: '
+            'https://example.com/page')
+        self.assertEqual(
+            post.text_html,
+            '<p>&lt;b&gt;Первый&lt;/b&gt; абзац<br>вторая строка</p>\n\n'
+            '<p>Второй абзац: <a href="https://example.com/page" '
+            'rel="nofollow">https://example.com/page</a></p>')
+
+    @override_settings(POST_EXCERPT_LENGTH=10)
+    def test_excerpt_truncated(self):
+        """В ленту попадает только начало длинного поста"""
+        Post.objects.create(author=self.author, text='слово ' * 100)
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'слово сло…')
+        self.assertNotContains(response, 'слово слово слово')
+
+    def test_edit_rerenders(self):
+        """Редактирование поста пересчитывает отрывок и HTML"""
+        post = Post.objects.create(author=self.author, text='старый')
+        self.client.post(reverse('posts:post_edit', args=[post.id]),
+                         {'text': 'новый'})
+        post.refresh_from_db()
+        self.assertEqual(post.excerpt, 'новый')
+        self.assertEqual(post.text_html, '<p>новый</p>')
+
+    def test_detail_uses_stored_html(self):
+        """Страница поста выводит сохранённый HTML, не обрабатывая текст"""
+        post = Post.objects.create(author=self.author, text='текст')
+        Post.objects.filter(pk=post.pk).update(text_html='<p>готово</p>')
+        response = self.client.get(reverse('posts:post_detail',
+                                           args=[post.id]))
+        self.assertContains(response, '<p>готово</p>', html=True)
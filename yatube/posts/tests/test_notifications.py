@@ -0,0 +1,90 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from .. import jobs, notifications
+from ..models import Comment, Notification, NotificationCounter, Post
+
+User = get_user_model()
+
+
+class NotificationsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.post = Post.objects.create(author=self.author, text='Пост')
+        self.readers = [User.objects.create_user(username=f'reader{number}')
+                        for number in range(3)]
+
+    def comment(self, user):
+        Comment.objects.create(post=self.post, author=user, text='Текст')
+
+    def test_comments_collapsed(self):
+        """Комментарии к одному посту — одно уведомление"""
+        for reader in self.readers:
+            self.comment(reader)
+        notification = Notification.objects.get()
+        self.assertEqual(notification.count, 3)
+        self.assertEqual(notification.actor, self.readers[-1])
+        self.assertEqual(notifications.unread_count(self.author), 1)
+
+    def test_own_comment_ignored(self):
+        """Свой комментарий уведомления не создаёт"""
+        self.comment(self.author)
+        self.assertFalse(Notification.objects.exists())
+
+    def test_follows_collapsed(self):
+        """Новые подписчики собираются в одно уведомление"""
+        for reader in self.readers:
+            self.client.force_login(reader)
+            self.client.get(reverse('posts:profile_follow',
+                                    args=[self.author.username]))
+        notification = Notification.objects.get(kind=Notification.FOLLOW)
+        self.assertEqual(notification.count, 3)
+
+    def test_inbox_marks_read(self):
+        """Открытие входящих сбрасывает счётчик, новое событие — снова 1"""
+        self.comment(self.readers[0])
+        self.client.force_login(self.author)
+        response = self.client.get(reverse('posts:notifications'))
+        self.assertTrue(response.context['page_obj'][0].unread)
+        self.assertContains(response, 'прокомментировал')
+        self.assertEqual(notifications.unread_count(self.author), 0)
+        self.assertFalse(Notification.objects.get().unread)
+
+        self.comment(self.readers[1])
+        notification = Notification.objects.get()
+        self.assertEqual((notification.count, notification.unread), (1, True))
+        self.assertEqual(notifications.unread_count(self.author), 1)
+
+    def test_badge_without_count_query(self):
+        """Значок в шапке берётся из кэша, без COUNT(*) по уведомлениям"""
+        self.comment(self.readers[0])
+        self.client.force_login(self.author)
+        url = reverse('about:author')
+        response = self.client.get(url)
+        self.assertContains(response, 'badge bg-danger">1<')
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertContains(response, 'badge bg-danger">1<')
+        self.assertEqual(
+            NotificationCounter.objects.get(user=self.author).unread, 1)
+
+    def test_deleted_post_leaves_counter(self):
+        """Удаление поста с непрочитанными уведомлениями правит счётчик"""
+        other = Post.objects.create(author=self.author, text='Другой')
+        self.comment(self.readers[0])
+        Comment.objects.create(post=other, author=self.readers[1],
+                               text='Текст')
+        self.assertEqual(notifications.unread_count(self.author), 2)
+        jobs.delete(Post)([self.post.pk])
+        self.assertEqual(notifications.unread_count(self.author), 1)
+        # Удаление в обход массовых действий счётчик не трогает, но
+        # открытие входящих сверяет его с таблицей.
+        other.delete()
+        self.assertEqual(notifications.unread_count(self.author), 1)
+        notifications.mark_read(self.author)
+        self.assertEqual(notifications.unread_count(self.author), 0)
+        self.assertEqual(
+            NotificationCounter.objects.get(user=self.author).unread, 0)
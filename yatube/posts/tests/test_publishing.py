@@ -0,0 +1,130 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import publishing
+from ..models import Group, Post, PostTag
+
+User = get_user_model()
+
+
+class PublishingTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.author)
+
+    def schedule(self, minutes, text='Отложенный #тег'):
+        return Post.objects.create(
+            author=self.author, group=self.group, text=text,
+            status=Post.SCHEDULED,
+            publish_at=timezone.now() + timedelta(minutes=minutes))
+
+    def feed_ids(self, url):
+        response = self.client.get(url)
+        return [post.id for post in response.context['page_obj']]
+
+    def test_unpublished_hidden(self):
+        """Черновики и отложенные посты не видны в лентах и чужим"""
+        draft = Post.objects.create(author=self.author, group=self.group,
+                                    text='Черновик', status=Post.DRAFT)
+        scheduled = self.schedule(10)
+        for url in (reverse('posts:index'),
+                    reverse('posts:group_list', args=['group']),
+                    reverse('posts:profile', args=['author'])):
+            with self.subTest(url=url):
+                self.assertEqual(self.feed_ids(url), [])
+        self.assertEqual(self.feed_ids(reverse('posts:drafts')),
+                         [scheduled.id, draft.id])
+        self.assertFalse(PostTag.objects.exists())
+        detail = reverse('posts:post_detail', args=[draft.id])
+        self.assertEqual(self.client.get(detail).status_code, 200)
+        self.client.force_login(self.reader)
+        self.assertEqual(self.client.get(detail).status_code, 404)
+        response = self.client.post(
+            reverse('posts:add_comment', args=[draft.id]), {'text': 'Х'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_create_draft(self):
+        """Форма создания сохраняет черновик и проверяет время выхода"""
+        response = self.client.post(reverse('posts:post_create'), {
+            'text': 'Черновик', 'publish-status': Post.DRAFT})
+        self.assertRedirects(response, reverse('posts:drafts'))
+        self.assertEqual(Post.objects.get().status, Post.DRAFT)
+        response = self.client.post(reverse('posts:post_create'), {
+            'text': 'Позже', 'publish-status': Post.SCHEDULED,
+            'publish-publish_at': '2000-01-01T10:00'})
+        self.assertFormError(response, 'publish_form', 'publish_at',
+                             'Укажите время в будущем')
+
+    def test_create_defaults_to_published(self):
+        """Без полей публикации пост выходит сразу"""
+        self.client.post(reverse('posts:post_create'), {'text': 'Сразу'})
+        self.assertTrue(Post.objects.get().is_published)
+
+    def test_publish_draft_on_edit(self):
+        """Опубликованный при редактировании черновик попадает в индекс"""
+        draft = Post.objects.create(author=self.author, text='#тег',
+                                    status=Post.DRAFT)
+        self.client.post(reverse('posts:post_edit', args=[draft.id]), {
+            'text': '#тег', 'publish-status': Post.PUBLISHED})
+        draft.refresh_from_db()
+        self.assertTrue(draft.is_published)
+        self.assertTrue(PostTag.objects.filter(post=draft).exists())
+
+    def test_publish_due(self):
+        """Планировщик выпускает наступившие посты пачками"""
+        due = [self.schedule(-minutes) for minutes in (3, 2, 1)]
+        later = self.schedule(30)
+        self.assertEqual(publishing.publish_due(batch_size=2), 2)
+        self.assertEqual(publishing.publish_due(batch_size=2), 1)
+        self.assertEqual(publishing.publish_due(), 0)
+        self.assertEqual(
+            set(Post.objects.published().values_list('pk', flat=True)),
+            {post.pk for post in due})
+        # Вышедшие посты прошли тот же путь, что и созданные сразу.
+        self.assertEqual(PostTag.objects.count(), 3)
+        self.assertEqual(publishing.next_due(), later.publish_at)
+        self.assertEqual(publishing.scheduled(), 1)
+
+    def test_seconds_until_due(self):
+        """Планировщик спит до ближайшего срока, но не дольше предела"""
+        self.assertEqual(publishing.seconds_until_due(60), 60)
+        post = self.schedule(0.5)
+        delay = publishing.seconds_until_due(
+            60, now=post.publish_at - timedelta(seconds=20))
+        self.assertEqual(delay, 20)
+        self.assertEqual(publishing.seconds_until_due(5), 5)
+
+    @override_settings(PUBLISH_BATCH_SIZE=1)
+    def test_command_once(self):
+        """publish_scheduled --once выпускает все наступившие посты"""
+        for minutes in (2, 1):
+            self.schedule(-minutes)
+        out = StringIO()
+        call_command('publish_scheduled', once=True, stdout=out)
+        self.assertFalse(Post.objects.filter(
+            status=Post.SCHEDULED).exists())
+        self.assertIn('Опубликовано: 1, запланировано: 0', out.getvalue())
+
+    def test_feed_uses_partial_index(self):
+        """Лента читает опубликованные посты по частичному индексу"""
+        sql, params = Post.objects.published().order_by(
+            '-pub_date')[:10].query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            plan = ' '.join(str(row) for row in cursor.fetchall())
+        self.assertIn('post_published_idx', plan)
@@ -0,0 +1,66 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from .. import recommendations
+from ..models import Follow, Group, Post, Recommendation
+
+User = get_user_model()
+
+
+class RecommendationsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='user')
+        cls.friend = User.objects.create_user(username='friend')
+        cls.friend_of_friend = User.objects.create_user(username='fof')
+        cls.colleague = User.objects.create_user(username='colleague')
+        cls.group = Group.objects.create(title='group', slug='group')
+        Follow.objects.create(user=cls.user, author=cls.friend)
+        Follow.objects.create(user=cls.friend, author=cls.friend_of_friend)
+        Post.objects.create(author=cls.user, group=cls.group, text='a')
+        Post.objects.create(author=cls.colleague, group=cls.group, text='b')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_friend_of_friend_and_group(self):
+        """Рекомендуются друзья друзей и соседи по группе"""
+        scores = recommendations.compute()[self.user.id]
+        self.assertEqual(
+            list(scores), [self.friend_of_friend.id, self.colleague.id])
+        self.assertNotIn(self.friend.id, scores)
+
+    def test_refresh_writes_only_changes(self):
+        """Повторный пересчёт без изменений ничего не переписывает"""
+        call_command('refresh_recommendations', stdout=StringIO())
+        self.assertEqual(
+            Recommendation.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(recommendations.refresh(), 0)
+        Follow.objects.filter(user=self.user).delete()
+        self.assertEqual(recommendations.refresh([self.user.id]), 1)
+        self.assertEqual(
+            list(Recommendation.objects.filter(user=self.user)
+                 .values_list('candidate', flat=True)),
+            [self.colleague.id])
+
+    def test_recommendations_on_follow_index(self):
+        """Рекомендации выводятся в ленте подписок одним запросом"""
+        recommendations.refresh()
+        with self.assertNumQueries(1):
+            recommendations.for_user(self.user)
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertContains(response, 'Кого почитать')
+        self.assertEqual(len(response.context['recommendations']), 2)
+
+    def test_follow_drops_recommendation(self):
+        """После подписки автор пропадает из рекомендаций"""
+        recommendations.refresh()
+        self.client.get(reverse('posts:profile_follow',
+                                kwargs={'username': 'fof'}))
+        self.assertFalse(Recommendation.objects.filter(
+            user=self.user, candidate=self.friend_of_friend).exists())
@@ -0,0 +1,118 @@
+import json
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import publishing, stream
+from ..models import FeedEvent, Follow, Group, Post
+
+User = get_user_model()
+
+
+def parse(chunk):
+    """Поля сообщения SSE."""
+    fields = dict(line.split(': ', 1)
+                  for line in chunk.decode().strip().splitlines())
+    fields['data'] = json.loads(fields['data'])
+    return fields
+
+
+class FeedStreamTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_published_posts_logged(self):
+        """Журнал пишется при выходе поста, а не при черновике и правке"""
+        post = Post.objects.create(author=self.author, group=self.group,
+                                   text='Пост')
+        draft = Post.objects.create(author=self.author, text='Черновик',
+                                    status=Post.DRAFT)
+        post.text = 'Правка'
+        post.save()
+        Post.objects.create(
+            author=self.reader, text='Отложенный', status=Post.SCHEDULED,
+            publish_at=timezone.now() - timedelta(minutes=1))
+        publishing.publish_due()
+        draft.status = Post.PUBLISHED
+        draft.save()
+        self.assertEqual(
+            list(FeedEvent.objects.order_by('pk').values_list(
+                'post__text', 'author', 'group')),
+            [('Правка', self.author.pk, self.group.pk),
+             ('Отложенный', self.reader.pk, None),
+             ('Черновик', self.author.pk, None)])
+
+    def test_fetch_and_render(self):
+        """Лента получает счёт и карточки только своих постов"""
+        before = stream.head()
+        Post.objects.create(author=self.author, group=self.group,
+                            text='В группе')
+        Post.objects.create(author=self.reader, text='Без группы')
+        events = stream.fetch(before)
+        self.assertEqual([event.id for event in events],
+                         list(FeedEvent.objects.order_by(
+                             'pk').values_list('pk', flat=True)))
+        self.assertEqual(stream.head(), events[-1].id)
+        self.assertIn('В группе', events[0].html)
+        feeds = (
+            (stream.renderer(), 2),
+            (stream.renderer(group_id=self.group.pk), 1),
+            (stream.renderer(authors={self.author.pk}), 1),
+        )
+        for render, count in feeds:
+            with self.subTest(count=count):
+                message = parse(render(events))
+                self.assertEqual(message['event'], 'posts')
+                self.assertEqual(message['id'], str(events[-1].id))
+                self.assertEqual(message['data'], {'count': count})
+        cards = parse(stream.renderer(self.group.pk, cards=True)(events))
+        self.assertEqual(cards['data']['cards'], [events[0].html])
+        self.assertEqual(stream.renderer(authors=set())(events), b'')
+
+    def test_feed_pages_carry_cursor(self):
+        """Под ASGI страницы лент передают потоку id последней записи"""
+        Post.objects.create(author=self.author, group=self.group,
+                            text='Пост')
+        self.client.force_login(self.reader)
+        for url in (reverse('posts:index'),
+                    reverse('posts:group_list', args=['group']),
+                    reverse('posts:follow_index')):
+            with self.subTest(url=url):
+                cache.clear()
+                response = self.client.get(url, **{'core.asgi': True})
+                self.assertEqual(response.context['stream_after'],
+                                 stream.head())
+                self.assertContains(response, reverse('posts:feed_stream'))
+
+    def test_wsgi_pages_without_stream(self):
+        """Под WSGI страницы лент не открывают поток"""
+        response = self.client.get(reverse('posts:index'))
+        self.assertIsNone(response.context['stream_after'])
+        self.assertNotContains(response, reverse('posts:feed_stream'))
+
+    def test_stream_response(self):
+        """Поток отдаётся как text/event-stream без кэширования"""
+        # Ответ не читается: итерация запустила бы поток-читатель.
+        url = reverse('posts:feed_stream')
+        response = self.client.get(url, {'group': 'group', 'after': 0})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        self.assertEqual(response.event_stream.cursor, 0)
+        response = self.client.get(url, HTTP_LAST_EVENT_ID='5')
+        self.assertEqual(response.event_stream.cursor, 5)
+        self.assertEqual(
+            self.client.get(url, {'group': 'missing'}).status_code, 404)
+        self.assertEqual(
+            self.client.get(url, {'follow': 1}).status_code, 403)
@@ -0,0 +1,119 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .. import markup
+from ..models import Mention, Post, PostTag, Tag
+
+User = get_user_model()
+
+
+class TagsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.author)
+
+    def post_tags(self, post):
+        return set(PostTag.objects.filter(post=post).values_list(
+            'tag__name', flat=True))
+
+    def test_extraction(self):
+        """Теги приводятся к нижнему регистру, адреса и почта не путаются"""
+        text = ('#Django и #django, page#top, /#anchor, &#39; '
+                'пишите @reader или на user@example.com')
+        self.assertEqual(markup.tags(text), {'django'})
+        self.assertEqual(markup.mentions(text), {'reader'})
+
+    def test_indexed_on_save(self):
+        """Сохранение поста индексирует теги и упоминания"""
+        post = Post.objects.create(
+            author=self.author,
+            text='#Новости для @reader, @author и @nobody')
+        self.assertEqual(self.post_tags(post), {'новости'})
+        # Себя и несуществующих пользователей в индексе нет.
+        self.assertEqual(
+            list(Mention.objects.values_list('user', 'post')),
+            [(self.reader.pk, post.pk)])
+
+    def test_plain_post_no_queries(self):
+        """Пост без тегов и упоминаний не тратит запросов на индекс"""
+        # Пост и записи журналов изменений и ленты, без запросов к
+        # индексу тегов.
+        with self.assertNumQueries(3):
+            Post.objects.create(author=self.author, text='Просто текст')
+
+    def test_edit_reindexes(self):
+        """Редактирование заменяет теги и упоминания поста"""
+        post = Post.objects.create(author=self.author,
+                                   text='#старый @reader')
+        self.client.post(reverse('posts:post_edit', args=[post.id]),
+                         {'text': '#новый'})
+        self.assertEqual(self.post_tags(post), {'новый'})
+        self.assertFalse(Mention.objects.exists())
+
+    @override_settings(LIMIT_POSTS=2)
+    def test_tag_feed_cursor(self):
+        """Лента тега листается по ключу и не теряет посты"""
+        posts = [Post.objects.create(author=self.author, text=f'#тег {n}')
+                 for n in range(5)]
+        Post.objects.create(author=self.author, text='#другой')
+        url = reverse('posts:tag', args=['ТЕГ'])
+        seen = []
+        response = self.client.get(url)
+        while True:
+            seen += [post.id for post in response.context['posts']]
+            cursor = response.context['cursor']
+            if cursor is None:
+                break
+            response = self.client.get(url, {'after': cursor})
+        expected = sorted(posts, key=lambda post: (post.pub_date, post.id),
+                          reverse=True)
+        self.assertEqual(seen, [post.id for post in expected])
+
+    def test_unknown_tag(self):
+        """Несуществующий тег — 404"""
+        response = self.client.get(reverse('posts:tag', args=['нет']))
+        self.assertEqual(response.status_code, 404)
+
+    def test_mentions_page(self):
+        """На странице упоминаний — посты, где упомянут пользователь"""
+        post = Post.objects.create(author=self.author, text='Привет, @reader')
+        Post.objects.create(author=self.author, text='Без упоминаний')
+        self.client.force_login(self.reader)
+        response = self.client.get(reverse('posts:mentions'))
+        self.assertEqual([item.id for item in response.context['posts']],
+                         [post.id])
+
+    def test_links_rendered(self):
+        """Теги и упоминания известных пользователей становятся ссылками"""
+        post = Post.objects.create(author=self.author,
+                                   text='#Тег для @reader и @nobody')
+        self.assertInHTML(
+            f'<a href="{reverse("posts:tag", args=["тег"])}">#Тег</a>',
+            post.text_html)
+        self.assertInHTML(
+            f'<a href="{reverse("posts:profile", args=["reader"])}">'
+            '@reader</a>',
+            post.text_html)
+        self.assertNotIn('/profile/nobody/', post.text_html)
+
+    def test_backfill(self):
+        """Команда index_tags строит индекс для уже сохранённых постов"""
+        Post.objects.bulk_create([
+            Post(author=self.author, text=f'#пачка {n} @reader')
+            for n in range(5)
+        ])
+        self.assertFalse(PostTag.objects.exists())
+        call_command('index_tags', workers=1, chunk=2, stdout=StringIO())
+        self.assertEqual(Tag.objects.get().name, 'пачка')
+        self.assertEqual(PostTag.objects.count(), 5)
+        self.assertEqual(Mention.objects.count(), 5)
@@ -0,0 +1,114 @@
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DatabaseError
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import hits, trending
+from ..models import Comment, Group, Post, PostScore
+
+User = get_user_model()
+
+
+@override_settings(LIMIT_POSTS=2)
+class TrendingTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(title='group', slug='group')
+        cls.posts = [
+            Post.objects.create(author=cls.author, text=f'Пост {i}',
+                                group=cls.group if i % 2 else None)
+            for i in range(4)
+        ]
+        for weight, post in enumerate(cls.posts, start=1):
+            for _ in range(weight):
+                Comment.objects.create(post=post, author=cls.author,
+                                       text='комментарий')
+
+    def setUp(self):
+        cache.clear()
+
+    def ids(self, response):
+        return [post.id for post in response.context['posts']]
+
+    def test_comments_bump_score(self):
+        """Комментарии инкрементально увеличивают популярность"""
+        scores = dict(PostScore.objects.values_list('post', 'score'))
+        self.assertEqual(scores[self.posts[3].id], 4)
+        self.assertEqual(scores[self.posts[0].id], 1)
+
+    def test_keyset_pagination(self):
+        """Лента популярного листается по ключу без пропусков"""
+        response = self.client.get(reverse('posts:trending'))
+        self.assertEqual(self.ids(response), [self.posts[3].id,
+                                              self.posts[2].id])
+        response = self.client.get(
+            reverse('posts:trending'), {'after': response.context['cursor']})
+        self.assertEqual(self.ids(response), [self.posts[1].id,
+                                              self.posts[0].id])
+        self.assertIsNone(response.context['cursor'])
+
+    def test_group_trending(self):
+        """Популярное группы следует за сменой группы поста"""
+        post = self.posts[2]
+        post.group = self.group
+        post.save()
+        response = self.client.get(
+            reverse('posts:group_trending', kwargs={'slug': 'group'}))
+        self.assertEqual(self.ids(response), [self.posts[3].id,
+                                              self.posts[2].id])
+
+    def test_decay(self):
+        """Затухание делит веса и удаляет остывшие посты"""
+        with self.settings(TRENDING_MIN_SCORE=1):
+            trending.decay(settings.TRENDING_HALF_LIFE)
+        scores = dict(PostScore.objects.values_list('post', 'score'))
+        self.assertEqual(scores, {self.posts[3].id: 2,
+                                  self.posts[2].id: 1.5,
+                                  self.posts[1].id: 1})
+
+    def test_rebuild(self):
+        """Полный пересчёт совпадает с инкрементальными весами"""
+        before = dict(PostScore.objects.values_list('post', 'score'))
+        self.assertEqual(trending.rebuild(), len(before))
+        after = dict(PostScore.objects.values_list('post', 'score'))
+        for post_id, score in before.items():
+            self.assertAlmostEqual(after[post_id], score, places=3)
+
+    def test_rebuild_counts_views(self):
+        """Пересчёт учитывает сброшенные просмотры с их весом"""
+        # Буфер процесса может хранить просмотры других тестов.
+        hits.discard()
+        post = self.posts[0]
+        url = reverse('posts:post_detail', kwargs={'post_id': post.id})
+        with self.settings(POST_VIEWS_FLUSH_INTERVAL=3600,
+                           POST_VIEWS_FLUSH_SIZE=1000):
+            for visitor in range(3):
+                Client(HTTP_USER_AGENT=f'browser {visitor}').get(url)
+        hits.flush()
+        before = PostScore.objects.get(post=post).score
+        self.assertAlmostEqual(
+            before, 1 + 3 * settings.TRENDING_VIEW_WEIGHT, places=3)
+        trending.rebuild()
+        self.assertAlmostEqual(PostScore.objects.get(post=post).score,
+                               before, places=3)
+
+    def test_rebuild_counts_kept_posts(self):
+        """Пересчёт возвращает число постов выше порога"""
+        with self.settings(TRENDING_MIN_SCORE=2):
+            self.assertEqual(trending.rebuild(), PostScore.objects.count())
+        self.assertLess(PostScore.objects.count(), len(self.posts))
+
+    def test_failed_rebuild_keeps_scores(self):
+        """Ошибка при пересчёте не оставляет популярное пустым"""
+        before = PostScore.objects.count()
+        with mock.patch.object(PostScore.objects, 'bulk_create',
+                               side_effect=DatabaseError('сбой')):
+            with self.assertRaises(DatabaseError):
+                trending.rebuild()
+        self.assertEqual(PostScore.objects.count(), before)
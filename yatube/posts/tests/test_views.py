@@ -1,39 +1,22 @@
-import shutil
-import tempfile
-
 from django.contrib.auth import get_user_model
 from django.urls import reverse
-from django.conf import settings
 from django.core.cache import cache
-from django.core.files.uploadedfile import SimpleUploadedFile
 from django import forms
-from django.test import TestCase, Client, override_settings
+from django.test import TestCase, Client
+from core.testing import InMemoryMediaMixin
 from ..models import Post, Group, Follow
+from .factories import create_posts, small_gif
 
-TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 User = get_user_model()
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
-class TestPages(TestCase):
+class TestPages(InMemoryMediaMixin, TestCase):
     @classmethod
     def setUpClass(cls):
         super().setUpClass()
         cls.author = User.objects.create_user(username='author')
         cls.guest = User.objects.create_user(username='guest')
-        small_gif = (
-            b'\x47\x49\x46\x38\x39\x61\x02\x00'
-            b'\x01\x00\x80\x00\x00\x00\x00\x00'
-            b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
-            b'\x00\x00\x00\x2C\x00\x00\x00\x00'
-            b'\x02\x00\x01\x00\x00\x02\x02\x0C'
-            b'\x0A\x00\x3B'
-        )
-        uploaded = SimpleUploadedFile(
-            name='small.gif',
-            content=small_gif,
-            content_type='image/gif'
-        )
+        uploaded = small_gif()
         cls.group = Group.objects.create(
             title='test-group',
             slug='test-slug',
@@ -55,11 +38,6 @@ class TestPages(TestCase):
             image=uploaded
         )
 
-    @classmethod
-    def tearDownClass(cls):
-        super().tearDownClass()
-        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
-
     def setUp(self):
         cache.clear()
         self.guest_client = Client()
@@ -68,9 +46,9 @@ class TestPages(TestCase):
 
     def check_context(self, response, page_obj, post_position):
         obj = response.context[page_obj][post_position]
-        self.assertEqual(obj.author, self.author)
-        self.assertEqual(obj.group, self.group)
-        self.assertEqual(obj.text, 'Тестовый пост')
+        self.assertEqual(obj.author.id, self.author.id)
+        self.assertEqual(obj.group.id, self.group.id)
+        self.assertEqual(obj.excerpt, 'Тестовый пост')
         self.assertEqual(obj.image, 'posts/small.gif')
 
     def test_pages_uses_correct_template(self):
@@ -162,7 +140,7 @@ class TestPages(TestCase):
         response = self.authorized_author.get(
             reverse('posts:group_list', kwargs={'slug': 'test-slug'}))
         first_object = response.context['page_obj'][0]
-        self.assertNotEqual(first_object.text, self.post_2.text)
+        self.assertNotEqual(first_object.excerpt, self.post_2.excerpt)
 
     def test_cache_index(self):
         """Проверка хранения и очищения кэша для index"""
@@ -195,15 +173,7 @@ class PaginatorViewsTest(TestCase):
             group=cls.group,
             text='Тестовый пост 1',
         )
-        lst = [
-            Post(
-                author=cls.author,
-                group=cls.group,
-                text=f'Тестовый пост {i}'
-            )
-            for i in range(1, 13)
-        ]
-        Post.objects.bulk_create(lst)
+        create_posts(12, [cls.author], [cls.group])
 
     def setUp(self):
         cache.clear()
@@ -278,7 +248,7 @@ class FollowTest(TestCase):
             author=self.following
         )
         response = self.client_follower.get('/follow/')
-        post_text = response.context['page_obj'][0].text
+        post_text = response.context['page_obj'][0].excerpt
         self.assertEqual(post_text, 'Тестовый пост')
         response = self.client_following.get('/follow/')
         self.assertNotContains(response,
@@ -0,0 +1,130 @@
+"""Популярные посты: инкрементальные веса с затуханием.
+
+Запросы ленты не считают агрегаты: они читают таблицу PostScore по
+индексу (-score, -post) с постраничной навигацией по ключу.
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from core.db import insert_ignore
+
+from . import feed
+from .models import Comment, Post, PostScore
+
+
+def decay_factor(seconds):
+    return 0.5 ** (seconds / settings.TRENDING_HALF_LIFE)
+
+
+def bump(post_id, weight, group_id=None):
+    """Прибавляет вес посту одним UPDATE, при отсутствии строки создаёт её."""
+    scores = PostScore.objects.filter(post_id=post_id)
+    if scores.update(score=F('score') + weight):
+        return
+    if not insert_ignore(PostScore, post=post_id, group=group_id,
+                         score=weight):
+        # Строку успел создать параллельный запрос.
+        scores.update(score=F('score') + weight)
+
+
+def bump_many(weights):
+    """Пакетный вариант bump для {post_id: weight}.
+
+    Один UPDATE на каждое различное значение веса плюс вставка строк
+    для постов, которых ещё нет в таблице.
+    """
+    existing = set(PostScore.objects.filter(
+        post_id__in=list(weights)).order_by().values_list('pk', flat=True))
+    by_weight = defaultdict(list)
+    for post_id in existing:
+        by_weight[weights[post_id]].append(post_id)
+    for weight, post_ids in by_weight.items():
+        PostScore.objects.filter(post_id__in=post_ids).update(
+            score=F('score') + weight)
+    missing = set(weights) - existing
+    if missing:
+        PostScore.objects.bulk_create(
+            (PostScore(post_id=post_id, group_id=group_id,
+                       score=weights[post_id])
+             for post_id, group_id in Post.objects.filter(
+                 pk__in=missing).order_by().values_list('pk', 'group_id')),
+            ignore_conflicts=True,
+        )
+
+
+def decay(seconds=None):
+    """Затухание всех весов одним UPDATE; слабые строки удаляются."""
+    if seconds is None:
+        seconds = settings.TRENDING_DECAY_INTERVAL
+    PostScore.objects.update(score=F('score') * decay_factor(seconds))
+    deleted, _ = PostScore.objects.filter(
+        score__lt=settings.TRENDING_MIN_SCORE).delete()
+    return deleted
+
+
+def rebuild():
+    """Полный пересчёт по комментариям и просмотрам — для первичного
+    заполнения.
+
+    Просмотры — сброшенные в Post.views: несброшенные из буферов
+    процессов прибавит bump_many при сбросе. Время просмотров не
+    хранится, их вес затухает от публикации поста.
+
+    Возвращает число постов, попавших в популярное.
+    """
+    now = timezone.now()
+    scores = defaultdict(float)
+    groups = {}
+    for post_id, group_id, created in Comment.objects.values_list(
+        'post_id', 'post__group_id', 'created'
+    ).iterator():
+        age = (now - created).total_seconds()
+        scores[post_id] += (settings.TRENDING_COMMENT_WEIGHT
+                            * decay_factor(age))
+        groups[post_id] = group_id
+    for post_id, group_id, published, views in Post.objects.filter(
+        views__gt=0
+    ).values_list('pk', 'group_id', 'pub_date', 'views').iterator():
+        age = (now - published).total_seconds()
+        scores[post_id] += (views * settings.TRENDING_VIEW_WEIGHT
+                            * decay_factor(age))
+        groups[post_id] = group_id
+    # Ленты не должны увидеть пустую таблицу, а ошибка — оставить её.
+    with transaction.atomic():
+        PostScore.objects.all().delete()
+        created = PostScore.objects.bulk_create(
+            PostScore(post_id=post_id, group_id=groups[post_id], score=score)
+            for post_id, score in scores.items()
+            if score >= settings.TRENDING_MIN_SCORE
+        )
+    return len(created)
+
+
+def get_page(request, group=None):
+    """Страница популярного по ключу (score, post_id) из ?after=.
+
+    Возвращает посты страницы и курсор следующей страницы или None.
+    """
+    scores = PostScore.objects.all()
+    if group is not None:
+        scores = scores.filter(group=group)
+    after = request.GET.get('after', '')
+    score, _, post_id = after.partition('_')
+    try:
+        score, post_id = float(score), int(post_id)
+    except ValueError:
+        pass
+    else:
+        scores = scores.filter(
+            Q(score__lt=score) | Q(score=score, post_id__lt=post_id))
+    page = list(scores.values_list('score', *feed.columns('post__'))[
+        :settings.LIMIT_POSTS + 1])
+    cursor = None
+    if len(page) > settings.LIMIT_POSTS:
+        page = page[:settings.LIMIT_POSTS]
+        cursor = f'{page[-1][0]!r}_{page[-1][1]}'
+    return feed.rows(row[1:] for row in page), cursor
@@ -7,13 +7,24 @@ app_name = 'posts'
 urlpatterns = [
     path('', views.index, name='index'),
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
+    path('group/<slug:slug>/trending/', views.group_trending,
+         name='group_trending'),
+    path('trending/', views.trending_posts, name='trending'),
+    path('tags/<str:name>/', views.tag_posts, name='tag'),
+    path('mentions/', views.mentions, name='mentions'),
     path('profile/<str:username>/', views.profile, name='profile'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
     path('create/', views.post_create, name='post_create'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
+    path('posts/<int:post_id>/history/', views.post_history,
+         name='post_history'),
     path('posts/<int:post_id>/comment/', views.add_comment,
          name='add_comment'),
+    path('drafts/', views.drafts, name='drafts'),
+    path('stream/', views.feed_stream, name='feed_stream'),
     path('follow/', views.follow_index, name='follow_index'),
+    path('notifications/', views.notifications_index,
+         name='notifications'),
     path(
         'profile/<str:username>/follow/',
         views.profile_follow,
@@ -1,46 +1,104 @@
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.db.models.fields.files import ImageFieldFile
+from django.http import Http404, HttpResponseForbidden
 from django.shortcuts import get_object_or_404, redirect, render
 from django.views.decorators.cache import cache_page
 
-from .forms import PostForm, CommentForm
-from .models import Group, Post, User, Comment, Follow
+from core.paginator import CachedCountPaginator
+from core.sse import EventStream, EventStreamResponse
+
+from . import (feed, history, hits, notifications, recommendations,
+               stream, tags, trending)
+from .forms import PostForm, CommentForm, PublishForm
+from .models import (Group, Post, PostRevision, User, Comment, Follow,
+                     Mention, Notification, PostTag, Tag)
+from .signals import follow_created, follow_deleted
 
 
 def paginator_func(request, paginator_page):
-    paginator = Paginator(paginator_page, settings.LIMIT_POSTS)
+    paginator = CachedCountPaginator(paginator_page, settings.LIMIT_POSTS)
     page_number = request.GET.get('page')
     return paginator.get_page(page_number)
 
 
+def feed_page(request, posts):
+    """Страница ленты из строк FeedPost вместо экземпляров Post."""
+    page_obj = paginator_func(request, posts)
+    # Считаются строки исходной выборки, без соединений со столбцами
+    # автора и группы; столбцы ленты читаются только для страницы.
+    page_obj.object_list = feed.rows(feed.project(page_obj.object_list))
+    return page_obj
+
+
 @cache_page(20)
 def index(request):
-    posts_list = Post.objects.select_related("group", "author")
-    page_obj = paginator_func(request, posts_list)
+    page_obj = feed_page(request, Post.objects.published())
     context = {
         'page_obj': page_obj,
+        'stream_after': stream.page_cursor(request),
     }
     return render(request, 'posts/index.html', context)
 
 
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts_list = group.posts.select_related("group",
-                                            "author")
-    page_obj = paginator_func(request, posts_list)
+    page_obj = feed_page(request, group.posts.published())
     context = {
         'group': group,
         'page_obj': page_obj,
+        'stream_after': stream.page_cursor(request),
     }
     return render(request, 'posts/group_list.html', context)
 
 
+def trending_posts(request):
+    posts, cursor = trending.get_page(request)
+    context = {
+        'posts': posts,
+        'cursor': cursor,
+    }
+    return render(request, 'posts/trending.html', context)
+
+
+def group_trending(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    posts, cursor = trending.get_page(request, group)
+    context = {
+        'group': group,
+        'posts': posts,
+        'cursor': cursor,
+    }
+    return render(request, 'posts/trending.html', context)
+
+
+def tag_posts(request, name):
+    tag = get_object_or_404(Tag, name=name.lower())
+    posts, cursor = tags.get_page(request, PostTag.objects.filter(tag=tag))
+    context = {
+        'tag': tag,
+        'posts': posts,
+        'cursor': cursor,
+    }
+    return render(request, 'posts/tag.html', context)
+
+
+@login_required
+def mentions(request):
+    posts, cursor = tags.get_page(
+        request, Mention.objects.filter(user=request.user))
+    context = {
+        'posts': posts,
+        'cursor': cursor,
+    }
+    return render(request, 'posts/mentions.html', context)
+
+
 def profile(request, username):
     author = get_object_or_404(User, username=username)
-    count_posts = author.posts.count()
-    posts = author.posts.select_related("group", "author")
-    page_obj = paginator_func(request, posts)
+    count_posts = author.posts.published().count()
+    posts = author.posts.published()
+    page_obj = feed_page(request, posts)
     following = (request.user.
                  is_authenticated and (Follow.objects.
                                        filter(user=request.user,
@@ -51,14 +109,27 @@ def profile(request, username):
         'posts': posts,
         'author': author,
         'page_obj': page_obj,
+        'recommendations': recommendations.for_user(request.user),
     }
     return render(request, 'posts/profile.html', context)
 
 
-def post_detail(request, post_id):
+def get_visible_post(request, post_id):
+    """Пост, если он опубликован или принадлежит пользователю."""
     post = get_object_or_404(Post, id=post_id)
-    count_posts = post.author.posts.count()
-    comments = Comment.objects.filter(post=post_id)
+    if not post.is_published and post.author_id != request.user.id:
+        raise Http404
+    return post
+
+
+def post_detail(request, post_id):
+    post = get_visible_post(request, post_id)
+    # Просмотры из буфера процесса ещё не попали в post.views.
+    post.views += hits.pending(post.pk)
+    if hits.record(request, post.pk):
+        post.views += 1
+    count_posts = post.author.posts.published().count()
+    comments = Comment.objects.filter(post=post_id).select_related('author')
     form = CommentForm()
     if form.is_valid():
         comment = form.save(commit=False)
@@ -76,16 +147,43 @@ def post_detail(request, post_id):
     return render(request, 'posts/post_detail.html', context)
 
 
+def post_history(request, post_id):
+    post = get_visible_post(request, post_id)
+    try:
+        version = int(request.GET.get('version', post.version))
+        text, group_id, image = history.get_version(post, version)
+    except (ValueError, PostRevision.DoesNotExist):
+        raise Http404
+    context = {
+        'post': post,
+        'versions': history.versions(post),
+        'version': version,
+        'text': text,
+        'group': Group.objects.filter(pk=group_id).first()
+        if group_id else None,
+        'image': ImageFieldFile(None, Post._meta.get_field('image'), image),
+    }
+    return render(request, 'posts/post_history.html', context)
+
+
 @login_required
 def post_create(request):
     form = PostForm(request.POST or None,
                     files=request.FILES or None)
-    if form.is_valid():
+    publish_form = PublishForm(request.POST or None, prefix='publish')
+    if form.is_valid() and publish_form.is_valid():
         post = form.save(commit=False)
         post.author = request.user
+        publish_form.apply(post)
         post.save()
+        if not post.is_published:
+            return redirect('posts:drafts')
         return redirect('posts:profile', request.user)
-    return render(request, 'posts/create_post.html', {'form': form})
+    context = {
+        'form': form,
+        'publish_form': publish_form,
+    }
+    return render(request, 'posts/create_post.html', context)
 
 
 @login_required
@@ -97,13 +195,24 @@ def post_edit(request, post_id):
     form = PostForm(request.POST or None,
                     files=request.FILES or None,
                     instance=post)
-    if form.is_valid():
-        form.save()
+    # Время выхода меняется, пока пост не опубликован.
+    publish_form = None
+    if not post.is_published:
+        publish_form = PublishForm(
+            request.POST or None, prefix='publish',
+            initial={'status': post.status, 'publish_at': post.publish_at})
+    if form.is_valid() and (publish_form is None
+                            or publish_form.is_valid()):
+        post = form.save(commit=False)
+        if publish_form is not None:
+            publish_form.apply(post)
+        post.save()
         return redirect('posts:post_detail', post_id)
 
     context = {
         'post_id': post_id,
         'form': form,
+        'publish_form': publish_form,
         'is_edit': True,
     }
     return render(request, 'posts/create_post.html', context)
@@ -111,7 +220,7 @@ def post_edit(request, post_id):
 
 @login_required
 def add_comment(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    post = get_object_or_404(Post.objects.published(), id=post_id)
     form = CommentForm(request.POST or None)
     if form.is_valid():
         comment = form.save(commit=False)
@@ -121,30 +230,78 @@ def add_comment(request, post_id):
     return redirect('posts:post_detail', post_id=post_id)
 
 
+@login_required
+def drafts(request):
+    """Черновики и запланированные посты автора."""
+    posts = request.user.posts.exclude(status=Post.PUBLISHED)
+    context = {
+        'page_obj': feed_page(request, posts),
+    }
+    return render(request, 'posts/drafts.html', context)
+
+
 @login_required
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user)
-    page_obj = paginator_func(request, posts)
+    posts = Post.objects.published().filter(
+        author__following__user=request.user)
+    page_obj = feed_page(request, posts)
     context = {
         'page_obj': page_obj,
+        'recommendations': recommendations.for_user(request.user),
+        'stream_after': stream.page_cursor(request),
     }
     return render(request, 'posts/follow.html', context)
 
 
+def feed_stream(request):
+    """SSE: новые посты главной ленты, группы (?group=) или подписок.
+
+    Счёт идёт от записи журнала ?after=, которую страница ленты
+    получила при выводе, а после переподключения — от Last-Event-ID.
+    """
+    group_id = authors = None
+    if request.GET.get('group'):
+        group_id = get_object_or_404(Group, slug=request.GET['group']).pk
+    if request.GET.get('follow'):
+        if not request.user.is_authenticated:
+            return HttpResponseForbidden()
+        authors = frozenset(Follow.objects.filter(
+            user=request.user).values_list('author_id', flat=True))
+    try:
+        cursor = int(request.META.get('HTTP_LAST_EVENT_ID')
+                     or request.GET['after'])
+    except (KeyError, ValueError):
+        cursor = stream.head()
+    render = stream.renderer(group_id, authors,
+                             cards=bool(request.GET.get('cards')))
+    return EventStreamResponse(EventStream(stream.hub, cursor, render))
+
+
 @login_required
 def profile_follow(request, username):
-    user = request.user
-    author = User.objects.get(username=username)
-    following = Follow.objects.filter(user=user, author=author)
-    if not following.exists() and user != author:
-        Follow.objects.create(user=user, author=author)
+    author = get_object_or_404(User, username=username)
+    if Follow.objects.follow(request.user, author):
+        follow_created.send(sender=Follow, user=request.user, author=author)
     return redirect('posts:profile', username=username)
 
 
 @login_required
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
-    following = Follow.objects.filter(user=request.user, author=author)
-    if following.exists():
-        following.delete()
+    if Follow.objects.unfollow(request.user, author):
+        follow_deleted.send(sender=Follow, user=request.user, author=author)
     return redirect('posts:profile', username=username)
+
+
+@login_required
+def notifications_index(request):
+    page_obj = paginator_func(
+        request,
+        Notification.objects.filter(recipient=request.user).select_related(
+            'actor', 'post'),
+    )
+    # Страница читается до отметки: непрочитанные выделяются в шаблоне.
+    page_obj.object_list = list(page_obj.object_list)
+    notifications.mark_read(request.user)
+    return render(request, 'posts/notifications.html',
+                  {'page_obj': page_obj})
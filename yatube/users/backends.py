@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+# Кэши, которые другой процесс не видит и не может сбросить.
+PROCESS_LOCAL_CACHES = (LocMemCache, DummyCache)
+
+
+def user_cache_key(user_id):
+    return f'auth_user:{user_id}'
+
+
+def user_cache():
+    """Кэш пользователей или None, если он живёт в памяти процесса."""
+    cache = caches[settings.USER_CACHE]
+    return None if isinstance(cache, PROCESS_LOCAL_CACHES) else cache
+
+
+def forget_users(user_ids):
+    """Сбросить кэш после изменения пользователей в обход save()."""
+    cache = user_cache()
+    if cache is not None:
+        cache.delete_many([user_cache_key(user_id) for user_id in user_ids])
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend, берущий пользователя сессии из кэша.
+
+    Запись сбрасывается при любом сохранении пользователя — смене
+    пароля, блокировке, входе (last_login) — и живёт не дольше
+    USER_CACHE_TIMEOUT. Кэш должен быть общим для всех процессов:
+    с кэшем в памяти процесса пользователь читается из БД.
+    """
+
+    def get_user(self, user_id):
+        cache = user_cache()
+        if cache is None:
+            return super().get_user(user_id)
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(key, user, settings.USER_CACHE_TIMEOUT)
+        return user if self.user_can_authenticate(user) else None
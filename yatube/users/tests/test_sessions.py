@@ -0,0 +1,66 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts import jobs
+from ..backends import user_cache_key
+
+User = get_user_model()
+
+
+class SessionQueriesTest(TestCase):
+    """Пользователь сессии в общем кэше USER_CACHE."""
+
+    def setUp(self):
+        cache.clear()
+        caches[settings.USER_CACHE].clear()
+        self.user = User.objects.create_user('reader', password='old-pass-1')
+        self.url = reverse('about:author')
+
+    def test_anonymous_request_without_queries(self):
+        """Анонимный запрос не обращается к БД за сессией"""
+        self.client.cookies.load({'sessionid': 'stale-session-key'})
+        with self.assertNumQueries(0):
+            self.client.get(self.url)
+
+    def test_user_cached_between_requests(self):
+        """Пользователь сессии читается из БД один раз, потом из кэша"""
+        self.client.force_login(self.user)
+        # Пользователь и счётчик уведомлений в шапке.
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+        self.assertEqual(response.context['user'].pk, self.user.pk)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.context['user'].pk, self.user.pk)
+
+    def test_password_change_logs_out_other_sessions(self):
+        """Смена пароля сбрасывает кэш и старые сессии"""
+        self.client.force_login(self.user)
+        self.client.get(self.url)
+        self.user.set_password('new-pass-2')
+        self.user.save()
+        self.assertIsNone(
+            caches[settings.USER_CACHE].get(user_cache_key(self.user.pk)))
+        response = self.client.get(self.url)
+        self.assertFalse(response.context['user'].is_authenticated)
+
+    def test_ban_logs_out(self):
+        """Блокировка из админки действует сразу, несмотря на кэш"""
+        self.client.force_login(self.user)
+        self.client.get(self.url)
+        jobs.ban_users([self.user.pk])
+        response = self.client.get(self.url)
+        self.assertFalse(response.context['user'].is_authenticated)
+
+    @override_settings(USER_CACHE='default')
+    def test_process_cache_not_used(self):
+        """Кэш в памяти процесса не хранит пользователя"""
+        self.client.force_login(self.user)
+        self.client.get(self.url)
+        self.assertIsNone(cache.get(user_cache_key(self.user.pk)))
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(response.context['user'].pk, self.user.pk)
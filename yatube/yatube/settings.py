@@ -50,13 +50,16 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.ratelimit.RateLimitMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.profiling.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
@@ -74,6 +77,7 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'core.context_processors.year.year',
+                'core.context_processors.notifications.notifications',
             ],
         },
     },
@@ -132,16 +136,72 @@ USE_TZ = True
 STATIC_URL = '/static/'
 STATICFILES_DIRS = (os.path.join(BASE_DIR, 'static'),)
 
+# Сессия — в подписанной cookie, пользователь сессии — в кэше USER_CACHE
+# (алиас из CACHES): запрос не читает из БД ни сессию, ни пользователя.
+# Кэш должен быть общим для процессов manage.py serve, иначе сброс после
+# смены пароля или блокировки до них не дойдёт; с кэшем в памяти процесса
+# пользователь читается из БД на каждый запрос.
+SESSION_ENGINE = 'django.contrib.sessions.backends.signed_cookies'
+AUTHENTICATION_BACKENDS = ['users.backends.CachedModelBackend']
+USER_CACHE = 'shared'
+USER_CACHE_TIMEOUT = 5 * 60
+
+# Сколько секунд шапка показывает число непрочитанных уведомлений из
+# кэша; в своём процессе кэш сбрасывается сразу
+NOTIFICATIONS_CACHE_TIMEOUT = 60
+
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
 
 
+# Письма пишутся в очередь в транзакции запроса, отправляет их
+# manage.py deliver_outbox через OUTBOX_EMAIL_BACKEND
+EMAIL_BACKEND = 'core.outbox.OutboxBackend'
 #  подключаем движок filebased.EmailBackend
-EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+OUTBOX_EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 # указываем директорию, в которую будут складываться файлы писем
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
+OUTBOX_BATCH_SIZE = 100
+OUTBOX_MAX_ATTEMPTS = 8
+# Задержка повтора удваивается с каждой попыткой: 1, 2, 4 минуты...
+OUTBOX_RETRY_DELAY = 60
+OUTBOX_RETRY_MAX_DELAY = 60 * 60
+# На сколько секунд рабочий забирает пачку себе
+OUTBOX_LEASE = 5 * 60
 
 LIMIT_POSTS = 10
+# Длина отрывка поста в ленте, символов
+POST_EXCERPT_LENGTH = 300
+# Сколько запланированных постов manage.py publish_scheduled выпускает
+# за одну транзакцию
+PUBLISH_BATCH_SIZE = 100
+# Каждая такая версия поста хранится целиком, остальные — разностью
+POST_REVISION_SNAPSHOT_EVERY = 10
+# Сколько последних версий поста оставляет manage.py prune_revisions
+POST_REVISIONS_KEEP = 50
+# Журнал изменений (posts.changes): размер пачки потребителя и
+# manage.py compact_changes
+CHANGE_LOG_BATCH_SIZE = 500
+# События старше стольких дней сжимаются, даже если потребитель их
+# ещё не прочитал
+CHANGE_LOG_RETENTION_DAYS = 30
+# Сколько секунд число строк большой ленты (больше EXACT_COUNT_LIMIT)
+# берётся из кэша без пересчёта
+PAGINATOR_COUNT_TTL = 5 * 60
+
+# Поток новых постов (core.sse): журнал опрашивается раз в
+# SSE_POLL_INTERVAL секунд одним потоком на процесс, в памяти лежат
+# SSE_BUFFER_SIZE последних записей
+SSE_POLL_INTERVAL = 1
+SSE_BUFFER_SIZE = 1000
+# Комментарий-пинг, чтобы прокси не закрывали молчащее соединение
+SSE_HEARTBEAT = 15
+# Под WSGI поток событий занимает поток сервера, поэтому страницы лент
+# подключаются к нему только под core.asgi, а прямой клиент WSGI
+# получает ответ не дольше стольких секунд и переподключается через
+# SSE_RETRY миллисекунд
+SSE_MAX_DURATION = 10
+SSE_RETRY = 3000
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
@@ -150,6 +210,80 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'BACKEND': 'core.cache.InstrumentedLocMemCache',
+    },
+    # Общий для процессов manage.py serve одной машины, с атомарными
+    # add() и incr(). На нескольких машинах — memcached.
+    'shared': {
+        'BACKEND': 'core.cache.SharedFileCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache'),
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
 }
+
+LIMIT_RECOMMENDATIONS = 5
+# вес общей группы относительно одного общего знакомого
+RECOMMENDATIONS_GROUP_WEIGHT = 0.5
+
+# Популярное: веса событий и затухание (секунды)
+TRENDING_COMMENT_WEIGHT = 1.0
+TRENDING_VIEW_WEIGHT = 0.1
+TRENDING_HALF_LIFE = 6 * 60 * 60
+TRENDING_DECAY_INTERVAL = 60 * 60
+TRENDING_MIN_SCORE = 0.01
+
+# Счётчик просмотров: буфер в памяти процесса сбрасывается в БД пачкой
+POST_VIEWS_FLUSH_INTERVAL = 30
+POST_VIEWS_FLUSH_SIZE = 500
+POST_VIEWS_DEDUP_WINDOW = 30 * 60
+
+# Массовые действия админки: больше этого числа строк — задача для
+# manage.py run_bulk_jobs
+BULK_ACTION_SYNC_LIMIT = 1000
+BULK_ACTION_CHUNK = 500
+# На сколько секунд рабочий забирает задачу себе; продлевается с каждой
+# порцией, после падения рабочего задачу продолжит другой
+BULK_JOB_LEASE = 5 * 60
+
+# Профилирование запросов: доля случайной выборки (0 — только по
+# заголовку X-Profile или ?profile от сотрудника) и хранилище профилей
+PROFILING_SAMPLE_RATE = 0
+PROFILING_DIR = os.path.join(BASE_DIR, 'profiles')
+PROFILING_MAX_FILES = 200
+
+# Метрики: файлы процессов и токен, с которым Prometheus читает /metrics
+# (заголовок Authorization: Bearer <токен>, bearer_token в scrape_config).
+# Без токена /metrics открыт только сотрудникам; адресу клиента не
+# верим — за прокси все запросы приходят с 127.0.0.1.
+METRICS_DIR = os.path.join(BASE_DIR, 'metrics')
+METRICS_TOKEN = None
+
+# ASGI: потоков для представлений Django (БД, шаблоны, миниатюры)
+ASGI_THREADS = min(32, (os.cpu_count() or 1) + 4)
+
+# Адреса своих обратных прокси: только от них читается X-Forwarded-For.
+# За nginx на этой же машине — ('127.0.0.1', '::1'); иначе все анонимы
+# делили бы один лимит адреса прокси.
+TRUSTED_PROXIES = ()
+
+# Ограничение частоты: счётчики в кэше RATELIMIT_CACHE, имя
+# представления (app_name:name) → (N запросов/период, методы, которые
+# расходуют лимит)
+RATELIMIT_ENABLED = True
+RATELIMIT_CACHE = 'shared'
+RATELIMITS = {
+    'posts:post_create': ('20/h', ('POST',)),
+    'posts:post_edit': ('60/h', ('POST',)),
+    'posts:add_comment': ('30/10m', ('POST',)),
+    'posts:profile_follow': ('60/h', ('GET', 'POST')),
+    'users:signup': ('5/h', ('POST',)),
+    'users:login': ('10/10m', ('POST',)),
+}
+
+# Цель для времени от загрузки wsgi.py до ответа на первый запрос
+# (manage.py startup_profile --check), секунды
+STARTUP_FIRST_REQUEST_BUDGET = 1.0
+
+THUMBNAIL_BACKEND = 'core.thumbnails.TimedThumbnailBackend'
+
+TEST_RUNNER = 'core.testing.FastTestRunner'